@@ -37,10 +37,18 @@ Adafruit_ADXL345_Unified accel = Adafruit_ADXL345_Unified(12345);
 Adafruit_SSD1306 display(128, 64, &Wire, -1);
 
 // === Timing Variables ===
+// The server replies to every POST with the interval and batch size to use next
 unsigned long previousMillis = 0;
-const long interval = 2000; // Interval for all tasks: 2 seconds
+unsigned long interval = 2000; // Starts at 2 seconds until the server says otherwise
+int batchSize = 1;
 int oledState = 0;
 
+// === Batched Readings (sent as a JSON array, each with its age) ===
+const int MAX_BATCH = 5;
+String batchReadings[MAX_BATCH];
+unsigned long batchTakenAt[MAX_BATCH];
+int batchCount = 0;
+
 // === Helper Function to Center Text ===
 void printCentered(const String &text, int y) {
   int16_t x1, y1;
@@ -81,7 +89,7 @@ void setup() {
 void loop() {
   unsigned long currentMillis = millis();
 
-  // Check if 2 seconds have passed
+  // Check if the reporting interval has passed
   if (currentMillis - previousMillis >= interval) {
     previousMillis = currentMillis;
 
@@ -123,30 +131,67 @@ void loop() {
     accelObj["y"] = ay;
     accelObj["z"] = az;
 
-    // --- Serialize JSON to a String for sending ---
+    // --- Serialize JSON to a String and add it to the batch ---
     String jsonString;
     serializeJson(doc, jsonString);
+    batchReadings[batchCount] = jsonString;
+    batchTakenAt[batchCount] = currentMillis;
+    batchCount++;
+
+    // Past a warning threshold the batch goes out right away
+    bool urgent = mq4 > 300 || mq7 > 200 || fire_d || vib_d;
 
     // --- Send Data to Server ---
-    if (WiFi.status() == WL_CONNECTED) {
-      HTTPClient http;
-      http.begin(serverName);
-      http.addHeader("Content-Type", "application/json");
-
-      Serial.print("Sending POST request from ");
-      Serial.println(nodeId);
-      int httpResponseCode = http.POST(jsonString);
-
-      if (httpResponseCode > 0) {
-        Serial.print("HTTP Response code: ");
-        Serial.println(httpResponseCode);
+    if (batchCount >= batchSize || batchCount >= MAX_BATCH || urgent) {
+      if (WiFi.status() == WL_CONNECTED) {
+        String payload = "[";
+        for (int i = 0; i < batchCount; i++) {
+          // Append the reading's age so the server can timestamp it correctly
+          String reading = batchReadings[i];
+          reading.remove(reading.length() - 1);
+          payload += reading + ",\"age_ms\":" + String(millis() - batchTakenAt[i]) + "}";
+          if (i < batchCount - 1) payload += ",";
+        }
+        payload += "]";
+
+        HTTPClient http;
+        http.begin(serverName);
+        http.addHeader("Content-Type", "application/json");
+
+        Serial.print("Sending POST request from ");
+        Serial.print(nodeId);
+        Serial.print(" with ");
+        Serial.print(batchCount);
+        Serial.println(" reading(s)");
+        int httpResponseCode = http.POST(payload);
+
+        if (httpResponseCode > 0) {
+          Serial.print("HTTP Response code: ");
+          Serial.println(httpResponseCode);
+
+          // --- Apply the server's sampling advice ---
+          StaticJsonDocument<256> reply;
+          if (!deserializeJson(reply, http.getString())) {
+            if (reply.containsKey("interval_ms")) interval = reply["interval_ms"].as<unsigned long>();
+            if (reply.containsKey("batch_size")) batchSize = constrain(reply["batch_size"].as<int>(), 1, MAX_BATCH);
+            Serial.print("Next reading in ");
+            Serial.print(interval);
+            Serial.print(" ms, batch size ");
+            Serial.println(batchSize);
+          }
+          // 200 stores the batch; 429 means the server is over budget, drop it and slow down
+          batchCount = 0;
+        } else {
+          Serial.print("Error code: ");
+          Serial.println(httpResponseCode);
+          // Keep the readings for the next attempt unless the buffer is full
+          if (batchCount >= MAX_BATCH) batchCount = 0;
+        }
+        http.end();
       } else {
-        Serial.print("Error code: ");
-        Serial.println(httpResponseCode);
+        Serial.println("WiFi Disconnected");
+        if (batchCount >= MAX_BATCH) batchCount = 0;
       }
-      http.end();
-    } else {
-      Serial.println("WiFi Disconnected");
     }
 
     // --- Update OLED Display ---
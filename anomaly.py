@@ -0,0 +1,384 @@
+"""
+Per-node sensor anomaly detection for ResQSense
+Scores every node reading on the ingest path, before it is stored, so each
+sensor_data row carries its own anomaly_score and anomaly_flags.
+
+For each node and channel the detector keeps:
+  - a short-term level and a robust scale (EWMA of clipped absolute
+    residuals), so one spike can't inflate the baseline: flags `jump`
+  - a long-term reference level and the long-term spread of readings
+    around it, to catch slow `drift` of the short-term level away from
+    where the sensor normally sits
+  - for the ADC channels, the last value, how many readings it has
+    repeated and how long its plateaus normally last: flags `stuck` when a
+    run is far longer than usual. A channel that has never varied (an
+    unwired sensor) is never stuck. Temperature and humidity come from a
+    coarse digital sensor that sits on one value for minutes in a steady
+    drift, so repeats there say nothing
+ADC channels pinned at 0 or 4095 (a dead input or saturation) carry no level
+information: they are neither scored nor folded into the baselines.
+
+The state is a few NumPy arrays indexed by node and channel, so a reading is
+O(1). It is snapshotted to anomaly_state every SNAPSHOT_S seconds and on
+shutdown, and reloaded on first use, so a restart keeps the baselines.
+
+score_history() is the batch counterpart for stored data. It computes
+rolling-median/MAD robust z-scores, drift and stuck runs for a whole history
+in a few vectorized NumPy passes, with the same rail and stuck rules.
+"""
+
+import json
+import threading
+import time
+
+import numpy as np
+from flask import Blueprint, request, jsonify
+from numpy.lib.stride_tricks import sliding_window_view
+
+import archive
+from realtime import socketio
+from storage import get_storage, timestamp_now
+
+anomaly_bp = Blueprint('anomaly', __name__)
+
+# sensor_data column -> payload key
+CHANNELS = {
+    'mq4': 'MQ4', 'mq5': 'MQ5', 'mq135': 'MQ135', 'mq7': 'MQ7',
+    'temperature': 'Temperature', 'humidity': 'Humidity',
+    'sound': 'Sound', 'pressure': 'Pressure',
+}
+# Smallest scale per channel, so near-constant channels don't divide by ~0
+SCALE_FLOOR = np.array([2.0, 2.0, 2.0, 2.0, 0.2, 0.5, 1.0, 0.1])
+
+LEVEL_ALPHA = 0.05        # Short-term level (~20 readings)
+REFERENCE_ALPHA = 0.002   # Long-term reference (~500 readings)
+SCALE_ALPHA = 0.02
+CLIP_Z = 3.0              # Residuals are clipped here before updating the baseline
+JUMP_Z = 6.0
+DRIFT_Z = 4.0
+STUCK_READINGS = 30       # Minimum run of identical values before a channel is stuck
+STUCK_FACTOR = 10         # ...and the run must be this many times the channel's usual plateau
+PLATEAU_ALPHA = 0.05
+ADC_RAILS = (0.0, 4095.0) # 12-bit ADC limits: pinned there is saturation or a dead input, not a level
+ADC_CHANNELS = ('mq4', 'mq5', 'mq135', 'mq7', 'sound')
+WARMUP_READINGS = 20
+SNAPSHOT_S = 30.0
+
+STATE_FIELDS = ('level', 'reference', 'spread', 'scale', 'last', 'run', 'plateau', 'count')
+
+
+def as_float(value):
+    """float(value), or NaN for None, non-numeric text and infinities"""
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return np.nan
+    return value if np.isfinite(value) else np.nan
+
+
+def init_schema(conn):
+    """Add the anomaly columns to sensor_data and create the snapshot table"""
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(sensor_data)")]
+    if 'anomaly_score' not in columns:
+        conn.execute('ALTER TABLE sensor_data ADD COLUMN anomaly_score REAL')
+    if 'anomaly_flags' not in columns:
+        conn.execute('ALTER TABLE sensor_data ADD COLUMN anomaly_flags TEXT')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS anomaly_state (
+            node_id TEXT PRIMARY KEY,
+            state TEXT NOT NULL,
+            updated_at DATETIME
+        )
+    ''')
+
+
+class AnomalyDetector:
+    """Online robust z-score, drift and stuck-value detection for all nodes"""
+
+    def __init__(self, channels=CHANNELS, capacity=16):
+        self.channels = list(channels)
+        self.keys = [channels[c] for c in self.channels]
+        self.node_index = {}
+        self.node_ids = []
+        self.activity = {}        # node_id -> share of recent readings flagged (EWMA, 0..1)
+        self.loaded = False
+        self.last_snapshot = time.monotonic()
+        self._lock = threading.Lock()
+        shape = (capacity, len(self.channels))
+        self.level = np.zeros(shape)
+        self.reference = np.zeros(shape)
+        self.spread = np.zeros(shape)     # Long-term deviation of readings around the reference
+        self.scale = np.zeros(shape)
+        self.last = np.zeros(shape)
+        self.run = np.zeros(shape, dtype=np.int64)
+        self.plateau = np.zeros(shape)    # Usual length of a run of identical values (0 = never varied)
+        self.count = np.zeros(shape, dtype=np.int64)   # Usable readings per channel
+        self.adc = np.isin(self.channels, ADC_CHANNELS)
+
+    def _slot(self, node_id):
+        slot = self.node_index.get(node_id)
+        if slot is None:
+            slot = self.node_index[node_id] = len(self.node_ids)
+            self.node_ids.append(node_id)
+            if slot >= len(self.count):
+                for name in STATE_FIELDS:
+                    array = getattr(self, name)
+                    setattr(self, name, np.concatenate([array, np.zeros_like(array)]))
+        return slot
+
+    def values(self, data):
+        out = np.empty(len(self.keys))
+        for i, key in enumerate(self.keys):
+            out[i] = as_float(data.get(key, 0) or 0)
+        return out
+
+    def update(self, node_id, x):
+        """Score one reading and fold it into the node's baselines.
+
+        Returns (score, flags) where flags is a list of 'channel:kind'.
+        """
+        with self._lock:
+            n = self._slot(node_id)
+            # Missing values and ADC channels pinned at a rail carry no level information
+            valid = ~np.isnan(x) & ~(self.adc & np.isin(x, ADC_RAILS))
+            first = valid & (self.count[n] == 0)
+            self.level[n][first] = self.reference[n][first] = x[first]
+            self.scale[n][first] = self.spread[n][first] = SCALE_FLOOR[first]
+
+            same = ~np.isnan(x) & (x == self.last[n])
+            ended = ~np.isnan(x) & ~same & (self.count[n] > 0)
+            length = self.run[n] + 1.0
+            self.plateau[n] = np.where(ended, np.where(self.plateau[n] > 0, self.plateau[n] + PLATEAU_ALPHA
+                                                       * (length - self.plateau[n]), length), self.plateau[n])
+            self.run[n] = np.where(same, self.run[n] + 1, 0)
+            self.last[n] = np.where(np.isnan(x), self.last[n], x)
+            stuck = (self.run[n] >= stuck_threshold(self.plateau[n])) & valid & self.adc
+
+            x = np.where(valid, x, self.level[n])
+            scale = np.maximum(self.scale[n], SCALE_FLOOR)
+            resid = x - self.level[n]
+            jump_z = np.where(valid, resid / scale, 0.0)
+            # Drift is judged against how far this channel normally wanders, not its short-term noise
+            drift_z = (self.level[n] - self.reference[n]) / np.maximum(self.spread[n], SCALE_FLOOR)
+
+            # Plain running means while warming up, so the first readings set the baselines
+            warm = self.count[n] > WARMUP_READINGS
+            step = 1.0 / (self.count[n] + 1)
+            clipped = np.where(warm, np.clip(resid, -CLIP_Z * scale, CLIP_Z * scale), resid)
+            self.level[n] += np.where(valid, np.maximum(LEVEL_ALPHA, step), 0.0) * clipped
+            slow = np.where(valid, np.maximum(REFERENCE_ALPHA, step), 0.0)
+            self.reference[n] += slow * (self.level[n] - self.reference[n])
+            self.spread[n] += slow * (1.25 * np.abs(x - self.reference[n]) - self.spread[n])
+            # Mean absolute deviation * 1.25 approximates the standard deviation
+            self.scale[n] += np.where(valid, np.maximum(SCALE_ALPHA, step), 0.0) * (1.25 * np.abs(clipped) - self.scale[n])
+            self.count[n] += valid
+
+            jump_z = np.where(warm, jump_z, 0.0)
+            drift_z = np.where(warm, drift_z, 0.0)
+            jump = np.abs(jump_z) >= JUMP_Z
+            drift = np.abs(drift_z) >= DRIFT_Z
+            stuck &= warm
+            flags = ([f'{self.channels[c]}:jump' for c in np.flatnonzero(jump)]
+                     + [f'{self.channels[c]}:drift' for c in np.flatnonzero(drift)]
+                     + [f'{self.channels[c]}:stuck' for c in np.flatnonzero(stuck)])
+            score = float(np.max(np.maximum(np.abs(jump_z), np.abs(drift_z))))
+            self.activity[node_id] = 0.8 * self.activity.get(node_id, 0.0) + 0.2 * bool(flags)
+            return round(score, 2), flags
+
+    def state_of(self, node_id):
+        n = self.node_index[node_id]
+        state = {name: getattr(self, name)[n].tolist() for name in STATE_FIELDS}
+        state['channels'] = self.channels
+        return state
+
+    def load(self, storage):
+        """Restore snapshotted baselines (once, on first use)"""
+        rows = storage.query('SELECT node_id, state FROM anomaly_state')
+        with self._lock:
+            for row in rows:
+                state = json.loads(row['state'])
+                if state.get('channels') != self.channels or any(name not in state for name in STATE_FIELDS):
+                    continue
+                n = self._slot(row['node_id'])
+                for name in STATE_FIELDS:
+                    getattr(self, name)[n] = state[name]
+            self.loaded = True
+        return len(rows)
+
+    def snapshot(self, storage):
+        """Queue an upsert of every node's state; returns the write futures"""
+        with self._lock:
+            states = [(node_id, json.dumps(self.state_of(node_id))) for node_id in self.node_ids]
+            self.last_snapshot = time.monotonic()
+        now = timestamp_now()
+        return [storage.execute(
+            'INSERT OR REPLACE INTO anomaly_state (node_id, state, updated_at) VALUES (?, ?, ?)',
+            (node_id, state, now)) for node_id, state in states]
+
+    def status(self):
+        with self._lock:
+            return {node_id: {'readings': int(self.count[n].max()),
+                              'level': dict(zip(self.channels, np.round(self.level[n], 2).tolist())),
+                              'scale': dict(zip(self.channels, np.round(self.scale[n], 3).tolist())),
+                              'stuck_run': dict(zip(self.channels, self.run[n].tolist()))}
+                    for node_id, n in self.node_index.items()}
+
+
+def stuck_threshold(plateau):
+    """Run length at which identical readings mean a stuck sensor
+
+    Channels that have never varied (plateau 0) have no threshold.
+    """
+    return np.where(plateau > 0, np.maximum(STUCK_FACTOR * plateau, STUCK_READINGS), np.inf)
+
+
+detector = AnomalyDetector()
+
+
+def rolling_median(values, window, step):
+    """Median of the `window` readings before each reading from `window` on.
+
+    Evaluated every `step` readings and held in between, which keeps long
+    histories cheap while staying fully vectorized. Returns the median, the
+    MAD and the mean absolute deviation around the median.
+    """
+    trailing = sliding_window_view(values[:-1], window, axis=0)[::step]   # (blocks, channels, window)
+    median = np.median(trailing, axis=-1)
+    deviation = np.abs(trailing - median[..., None])
+    count = len(values) - window
+    return tuple(np.repeat(stat, step, axis=0)[:count]
+                 for stat in (median, np.median(deviation, axis=-1), deviation.mean(axis=-1)))
+
+
+def score_history(values, window=60, drift_window=300, adc=None):
+    """Vectorized batch scoring of a (readings, channels) history.
+
+    Each reading is compared with the median/MAD of the `window` readings
+    before it; drift compares that median with the one over `drift_window`,
+    scaled by the long window's mean deviation (its spread, as online). `adc` marks the columns whose
+    rail values (0, 4095) carry no level. Returns (jump_z, drift_z, stuck),
+    each shaped like `values`; the first `window` readings have no baseline
+    and score 0.
+    """
+    values = np.asarray(values, dtype=float)
+    count, width = values.shape
+    adc = np.zeros(width, dtype=bool) if adc is None else np.asarray(adc, dtype=bool)
+    idx = np.arange(count)[:, None]
+
+    # Rail readings are replaced by the last usable value so they don't move the medians;
+    # rails before the first usable value take the channel's median
+    railed = adc & np.isin(values, ADC_RAILS)
+    fill = np.where(railed, 0, idx)
+    np.maximum.accumulate(fill, axis=0, out=fill)
+    levels = np.take_along_axis(values, fill, axis=0)
+    leading = np.take_along_axis(railed, fill, axis=0)
+    if leading.any():
+        usable = np.where(railed, np.nan, values)
+        usable[:, np.isnan(usable).all(axis=0)] = 0.0
+        levels = np.where(leading, np.nanmedian(usable, axis=0), levels)
+
+    jump_z = np.zeros_like(values)
+    drift_z = np.zeros_like(values)
+    if count > window:
+        median, mad, deviation = rolling_median(levels, window, max(1, window // 10))
+        # The larger of the two keeps quantized, mostly-flat channels from scoring every step
+        scale = np.maximum(np.maximum(1.4826 * mad, 1.25 * deviation), SCALE_FLOOR[:width])
+        jump_z[window:] = np.where(railed[window:], 0.0, (levels[window:] - median) / scale)
+        if count > drift_window:
+            long_median, _, long_deviation = rolling_median(levels, drift_window, max(1, drift_window // 10))
+            offset = drift_window - window
+            spread = np.maximum(1.25 * long_deviation, SCALE_FLOOR[:width])
+            drift_z[drift_window:] = (median[offset:] - long_median) / spread
+
+    # Length of the run of identical values ending at each reading
+    same = np.vstack([np.zeros((1, width), dtype=bool), values[1:] == values[:-1]])
+    reset = np.where(~same, idx, 0)
+    np.maximum.accumulate(reset, axis=0, out=reset)
+    run = idx - reset
+    # Average plateau so far: readings before this run over the value changes among them
+    changes = np.cumsum(~same, axis=0) - 1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        plateau = np.where(changes > 0, (idx - run) / changes, 0.0)
+    stuck = (run >= stuck_threshold(plateau)) & adc & ~railed
+    return jump_z, drift_z, stuck
+
+
+def score_reading(storage, data):
+    """Reading enricher: anomaly columns for the sensor_data row"""
+    if not detector.loaded:
+        detector.load(storage)
+    node_id = data.get('node_id', 'unknown')
+    score, flags = detector.update(node_id, detector.values(data))
+    if time.monotonic() - detector.last_snapshot >= SNAPSHOT_S:
+        detector.snapshot(storage)
+    if flags:
+        socketio.emit('sensor_anomaly', {'node_id': node_id, 'score': score, 'flags': flags})
+    return {'anomaly_score': score, 'anomaly_flags': ','.join(flags) or None}
+
+
+@anomaly_bp.route('/api/anomaly/status', methods=['GET'])
+def get_anomaly_status():
+    """Per-node baselines, plus recent flagged readings"""
+    node_id = request.args.get('node')
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 200)
+    except ValueError:
+        limit = 20
+    try:
+        if node_id:
+            rows = get_storage().query('''
+                SELECT id, node_id, timestamp, anomaly_score, anomaly_flags FROM sensor_data
+                WHERE node_id = ? AND anomaly_flags IS NOT NULL
+                ORDER BY id DESC LIMIT ?
+            ''', (node_id, limit))
+        else:
+            rows = get_storage().query('''
+                SELECT id, node_id, timestamp, anomaly_score, anomaly_flags FROM sensor_data
+                WHERE anomaly_flags IS NOT NULL
+                ORDER BY id DESC LIMIT ?
+            ''', (limit,))
+        baselines = detector.status()
+        if node_id:
+            baselines = {node_id: baselines.get(node_id)}
+        return jsonify({"status": "success", "baselines": baselines,
+                        "recent": [dict(row) for row in rows]}), 200
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@anomaly_bp.route('/api/anomaly/history', methods=['GET'])
+def get_anomaly_history():
+    """Batch-score a node's stored history: /api/anomaly/history?node=node_1&limit=2000"""
+    node_id = request.args.get('node')
+    if not node_id:
+        return jsonify({"status": "error", "message": "A 'node' query parameter is required (e.g., /api/anomaly/history?node=node_1)"}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 2000)), 1), 50000)
+        window = min(max(int(request.args.get('window', 60)), 5), 1000)
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit and window must be integers"}), 400
+
+    try:
+        rows = archive.history(get_storage(), archive.get_archive(), node_id,
+                               limit=limit, columns=detector.channels)
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+    rows = rows[::-1]
+    if not rows:
+        return jsonify({"status": "success", "data": []}), 200
+
+    # Columns keep whatever a node posted, so a stray string must not break the batch
+    values = np.array([[as_float(row[c]) for c in detector.channels] for row in rows], dtype=float)
+    values = np.where(np.isnan(values), np.nanmedian(values, axis=0), values)
+    jump_z, drift_z, stuck = score_history(values, window=window, drift_window=window * 5, adc=detector.adc)
+    score = np.max(np.maximum(np.abs(jump_z), np.abs(drift_z)), axis=1)
+
+    data = []
+    for i in np.flatnonzero((score >= min(JUMP_Z, DRIFT_Z)) | stuck.any(axis=1)):
+        flags = ([f'{c}:jump' for c, z in zip(detector.channels, jump_z[i]) if abs(z) >= JUMP_Z]
+                 + [f'{c}:drift' for c, z in zip(detector.channels, drift_z[i]) if abs(z) >= DRIFT_Z]
+                 + [f'{c}:stuck' for c, flag in zip(detector.channels, stuck[i]) if flag])
+        if flags:
+            data.append({'id': rows[i]['id'], 'timestamp': rows[i]['timestamp'],
+                         'score': round(float(score[i]), 2), 'flags': flags})
+    return jsonify({"status": "success", "scored": len(rows), "data": data}), 200
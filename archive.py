@@ -0,0 +1,598 @@
+#!/usr/bin/env python3
+"""
+Columnar cold-data archive for ResQSense
+sensor_data rows older than ARCHIVE_AFTER_DAYS are moved out of SQLite into
+one file per node per day (<archive>/<node_id>/<YYYY-MM-DD>.rqa). Every
+column is stored separately, so reading one channel over a month only reads
+that channel's bytes:
+
+  - timestamps (ms) and ids: delta-of-delta, zigzag, bit-packed
+  - float channels (gases, temperature, pressure, ...): XOR with the previous
+    value, bit-packed in blocks without the zero bits the block shares
+  - fire/vibration and other low-cardinality integers: run-length encoded
+  - anomaly_flags and other text: sparse (row, text) pairs
+
+When sensor_data is partitioned by time (storage.py), a partition whose
+days have all been archived is dropped as a whole file. Partitions are read
+from their own files, so ones too old for the reader views are archived too,
+and the threshold is capped so that the partitions kept live always fit in
+those views.
+
+Files are memory-mapped for reads. history() and iter_range() merge the
+archive with the live table, so GET /data, GET /api/export and the anomaly
+history serve a reading the same way wherever it lives.
+
+    python archive.py --db sensor_data.db --older-than 7
+    python archive.py --db sensor_data.db --stats
+"""
+
+import argparse
+import json
+import mmap
+import os
+import sqlite3
+import struct
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from urllib.parse import quote, unquote
+
+import numpy as np
+from flask import current_app
+
+from storage import MAX_ATTACHED, PartitionsNotAttached, database_path
+
+MAGIC = b'RQA1'
+BLOCK = 128                  # Values per bit-packing block (each has its own shift/width)
+NULL_INT = -2 ** 63          # NULL in run-length encoded integer columns
+ARCHIVE_AFTER_DAYS = float(os.environ.get('RESQSENSE_ARCHIVE_AFTER_DAYS', '7'))   # 0 disables
+ARCHIVE_INTERVAL_S = 3600.0
+
+_U64 = np.uint64
+
+
+# --- Bit packing ---
+
+def pack_uints(values):
+    """Bit-pack uint64s in blocks, dropping the high and low zero bits each block shares"""
+    values = np.ascontiguousarray(values, dtype=_U64)
+    out = [struct.pack('<I', len(values))]
+    for start in range(0, len(values), BLOCK):
+        block = values[start:start + BLOCK]
+        combined = int(np.bitwise_or.reduce(block))
+        if combined == 0:
+            out.append(b'\x00\x00')
+            continue
+        shift = (combined & -combined).bit_length() - 1
+        block = block >> _U64(shift)
+        width = int(block.max()).bit_length()
+        bits = (block[:, None] >> np.arange(width - 1, -1, -1, dtype=_U64)) & _U64(1)
+        out.append(bytes((shift, width)))
+        out.append(np.packbits(bits.astype(np.uint8)).tobytes())
+    return b''.join(out)
+
+
+def unpack_uints(buf, pos=0):
+    """Inverse of pack_uints; returns (values, position after them)"""
+    (count,) = struct.unpack_from('<I', buf, pos)
+    pos += 4
+    values = np.zeros(count, dtype=_U64)
+    for start in range(0, count, BLOCK):
+        n = min(BLOCK, count - start)
+        shift, width = buf[pos], buf[pos + 1]
+        pos += 2
+        if width == 0:
+            continue
+        size = (n * width + 7) // 8
+        bits = np.unpackbits(np.frombuffer(buf, np.uint8, size, pos), count=n * width)
+        pos += size
+        weights = _U64(1) << np.arange(width - 1, -1, -1, dtype=_U64)
+        values[start:start + n] = (bits.reshape(n, width).astype(_U64) * weights).sum(axis=1) << _U64(shift)
+    return values, pos
+
+
+def zigzag(values):
+    values = np.asarray(values, dtype=np.int64)
+    return ((values << 1) ^ (values >> 63)).view(_U64)
+
+
+def unzigzag(values):
+    return ((values >> _U64(1)).astype(np.int64)) ^ -((values & _U64(1)).astype(np.int64))
+
+
+# --- Column codecs: encode(values) -> bytes, decode(buf) -> list ---
+
+def encode_dod(values):
+    """Delta-of-delta integers (timestamps in ms, row ids)"""
+    values = np.asarray(values, dtype=np.int64)
+    head = [int(values[0]) if len(values) else 0, int(values[1] - values[0]) if len(values) > 1 else 0]
+    return struct.pack('<Iqq', len(values), *head) + pack_uints(zigzag(np.diff(values, n=2)))
+
+
+def decode_dod(buf):
+    count, first, delta = struct.unpack_from('<Iqq', buf, 0)
+    dod, _ = unpack_uints(buf, 20)
+    if count < 2:
+        return np.array([first][:count], dtype=np.int64)
+    deltas = np.concatenate(([delta], delta + np.cumsum(unzigzag(dod))))
+    return first + np.concatenate(([0], np.cumsum(deltas)))
+
+
+def encode_xor(values):
+    """Floats XORed with their predecessor; NULL is stored as NaN"""
+    bits = np.array([np.nan if v is None else v for v in values], dtype=np.float64).view(_U64)
+    first = int(bits[0]) if len(bits) else 0
+    return struct.pack('<IQ', len(bits), first) + pack_uints(bits[1:] ^ bits[:-1])
+
+
+def decode_xor(buf):
+    count, first = struct.unpack_from('<IQ', buf, 0)
+    xors, _ = unpack_uints(buf, 12)
+    bits = np.bitwise_xor.accumulate(np.concatenate(([_U64(first)], xors)))
+    return bits[:count].view(np.float64)
+
+
+def encode_rle(values):
+    """Integers as (value, run length) pairs"""
+    values = np.array([NULL_INT if v is None else v for v in values], dtype=np.int64)
+    starts = np.flatnonzero(np.concatenate(([True], values[1:] != values[:-1])))
+    lengths = np.diff(np.append(starts, len(values)))
+    return pack_uints(zigzag(values[starts])) + pack_uints(lengths)
+
+
+def decode_rle(buf):
+    runs, pos = unpack_uints(buf, 0)
+    lengths, _ = unpack_uints(buf, pos)
+    return np.repeat(unzigzag(runs), lengths.astype(np.int64))
+
+
+def encode_text(values):
+    """Mostly-NULL text as sparse [row, value] pairs"""
+    return json.dumps([len(values), [[i, v] for i, v in enumerate(values) if v is not None]]).encode()
+
+
+def decode_text(buf):
+    count, entries = json.loads(bytes(buf))
+    values = [None] * count
+    for i, v in entries:
+        values[i] = v
+    return values
+
+
+def encode_json(values):
+    """Anything else, verbatim"""
+    return json.dumps(values).encode()
+
+
+def decode_json(buf):
+    return json.loads(bytes(buf))
+
+
+CODECS = {
+    'dod': (encode_dod, decode_dod),
+    'xor': (encode_xor, decode_xor),
+    'rle': (encode_rle, decode_rle),
+    'text': (encode_text, decode_text),
+    'json': (encode_json, decode_json),
+}
+
+
+def choose_codec(values):
+    kinds = {type(v) for v in values if v is not None}
+    if kinds <= {int, bool}:
+        if None not in values and len(values) > 1:
+            ints = np.asarray(values, dtype=np.int64)
+            if np.count_nonzero(np.diff(ints)) > len(ints) // 2:
+                return 'dod'
+        return 'rle'
+    if kinds <= {int, float}:
+        return 'xor'
+    if kinds <= {str}:
+        return 'text'
+    return 'json'
+
+
+def to_python(codec, values):
+    """Decoded column -> list of Python values with NULLs restored"""
+    if codec == 'xor':
+        values = values.astype(object)
+        values[np.isnan(values.astype(np.float64))] = None
+        return values.tolist()
+    if codec == 'rle':
+        values = values.astype(object)
+        values[values == NULL_INT] = None
+        return values.tolist()
+    if codec == 'dod':
+        return values.tolist()
+    return values
+
+
+# --- Timestamps ---
+
+def timestamp_ms(value):
+    """'YYYY-MM-DD HH:MM:SS[.fff]' (UTC) -> epoch milliseconds"""
+    return int(np.datetime64(value.replace(' ', 'T'), 'ms').astype(np.int64))
+
+
+def format_timestamps(ms, seconds_only=False):
+    stamps = np.datetime_as_string(np.asarray(ms, dtype='datetime64[ms]'), unit='s' if seconds_only else 'ms')
+    return np.char.replace(stamps, 'T', ' ').tolist()
+
+
+def next_day(day):
+    return (datetime.strptime(day, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+
+
+# --- Files ---
+
+def write_file(path, rows):
+    """Write rows (dicts with 'id' and 'timestamp') as one columnar file"""
+    rows = sorted(rows, key=lambda row: (row['timestamp'], row['id']))
+    names = [name for name in rows[0].keys() if name != 'node_id']
+    stamps = [row['timestamp'] for row in rows]
+    columns = []
+    blobs = []
+    offset = 0
+    for name in names:
+        if name == 'timestamp':
+            codec = 'dod'
+            values = np.array([s.replace(' ', 'T') for s in stamps], dtype='datetime64[ms]').astype(np.int64)
+        else:
+            values = [row[name] for row in rows]
+            codec = choose_codec(values)
+        blob = CODECS[codec][0](values)
+        columns.append({'name': name, 'codec': codec, 'offset': offset, 'length': len(blob)})
+        blobs.append(blob)
+        offset += len(blob)
+
+    header = json.dumps({
+        'rows': len(rows),
+        'seconds_only': all(len(s) == 19 for s in stamps),
+        'first': stamps[0], 'last': stamps[-1],
+        'columns': columns,
+    }).encode()
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(MAGIC + struct.pack('<I', len(header)) + header)
+        for blob in blobs:
+            f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def read_file(path, names=None):
+    """Decode the named columns (default all) of one file via mmap.
+
+    Returns (header, {name: list}); the timestamp column stays in epoch ms.
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if mm[:4] != MAGIC:
+            raise ValueError(f"{path} is not an archive file")
+        (header_len,) = struct.unpack_from('<I', mm, 4)
+        header = json.loads(mm[8:8 + header_len])
+        base = 8 + header_len
+        data = {}
+        for column in header['columns']:
+            if names is not None and column['name'] not in names:
+                continue
+            start = base + column['offset']
+            view = memoryview(mm)[start:start + column['length']]
+            try:
+                values = CODECS[column['codec']][1](view)
+                if column['name'] != 'timestamp':
+                    values = to_python(column['codec'], values)
+                data[column['name']] = values
+            finally:
+                view.release()
+    return header, data
+
+
+class ColumnArchive:
+    """Directory of per-node, per-day columnar files"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.extensions['archive'] = self
+
+    def path(self, node_id, day):
+        return os.path.join(self.directory, quote(node_id, safe=''), f'{day}.rqa')
+
+    def nodes(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(unquote(name) for name in os.listdir(self.directory))
+
+    def days(self, node_id, since=None, until=None):
+        """Archived days for a node overlapping [since, until)"""
+        folder = os.path.join(self.directory, quote(node_id, safe=''))
+        if not os.path.isdir(folder):
+            return []
+        days = sorted(name[:-4] for name in os.listdir(folder) if name.endswith('.rqa'))
+        return [day for day in days
+                if (since is None or next_day(day) > since[:10]) and (until is None or day < until)]
+
+    def write(self, node_id, day, rows):
+        """Add rows to a node's day file, merging with what is already archived"""
+        path = self.path(node_id, day)
+        with self._lock:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path):
+                merged = {row['id']: row for row in self.rows(node_id, day, newest_first=False)}
+                for row in rows:
+                    merged[row['id']] = dict(row)
+                rows = list(merged.values())
+                names = {name for row in rows for name in row}
+                rows = [{name: row.get(name) for name in names} for row in rows]
+            else:
+                rows = [dict(row) for row in rows]
+            write_file(path, rows)
+
+    def rows(self, node_id, day, columns=None, since=None, until=None, newest_first=True):
+        """One day's rows as dicts, optionally only some columns and a time range"""
+        path = self.path(node_id, day)
+        if not os.path.exists(path):
+            return []
+        names = None if columns is None else set(columns) | {'id', 'timestamp'}
+        header, data = read_file(path, names)
+        ms = data['timestamp']
+        lo = 0 if since is None else int(np.searchsorted(ms, timestamp_ms(since), 'left'))
+        hi = len(ms) if until is None else int(np.searchsorted(ms, timestamp_ms(until), 'left'))
+        if lo >= hi:
+            return []
+        data['timestamp'] = format_timestamps(ms[lo:hi], header['seconds_only'])
+        for name in data:
+            if name != 'timestamp':
+                data[name] = data[name][lo:hi]
+        names = columns or list(data)
+        rows = [dict(zip(names, values)) for values in zip(*(data.get(name, [None] * (hi - lo)) for name in names))]
+        if columns is None or 'node_id' in columns:
+            for row in rows:
+                row['node_id'] = node_id
+        return rows[::-1] if newest_first else rows
+
+    def stats(self):
+        files = size = rows = 0
+        for node_id in self.nodes():
+            for day in self.days(node_id):
+                path = self.path(node_id, day)
+                with open(path, 'rb') as f:
+                    f.seek(4)
+                    (header_len,) = struct.unpack('<I', f.read(4))
+                    rows += json.loads(f.read(header_len))['rows']
+                files += 1
+                size += os.path.getsize(path)
+        return {'directory': self.directory, 'files': files, 'rows': rows, 'bytes': size,
+                'bytes_per_row': round(size / rows, 1) if rows else None}
+
+
+def archive_directory(database):
+    """Where the archive of `database` lives: RESQSENSE_ARCHIVE, else <database>_archive"""
+    return os.environ.get('RESQSENSE_ARCHIVE') or os.path.splitext(database)[0] + '_archive'
+
+
+def get_archive():
+    """Return the archive attached to the current Flask app"""
+    return current_app.extensions['archive']
+
+
+# --- Moving rows out of sensor_data ---
+
+class Archiver:
+    """Periodically moves whole days older than after_days into the archive"""
+
+    def __init__(self, storage, archive, after_days=ARCHIVE_AFTER_DAYS, interval=ARCHIVE_INTERVAL_S):
+        self.storage = storage
+        self.archive = archive
+        self.after_days = after_days
+        partitions = storage.partitioned.get('sensor_data')
+        if partitions:
+            # Live partitions (cutoff to today) must fit in the MAX_ATTACHED - 1 the views cover
+            limit = (MAX_ATTACHED - 3) * partitions.period_days
+            if after_days <= 0:
+                print(f"⚠️ Archiving is off; reads reaching past the newest {MAX_ATTACHED - 1} "
+                      f"sensor_data partitions will fail")
+            elif after_days > limit:
+                print(f"⚠️ Archiving after {limit:g} days instead of {after_days:g}: with "
+                      f"{partitions.period_days}-day partitions only {MAX_ATTACHED - 1} stay readable")
+                self.after_days = limit
+        self.interval = interval
+        self.archived_rows = 0
+        self.last_run = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self, now=None):
+        """Archive every node-day before the cutoff; returns {node_id: rows moved}"""
+        now = now or datetime.now(timezone.utc)
+        cutoff = (now - timedelta(days=self.after_days)).strftime('%Y-%m-%d')
+        moved = {}
+        partitions = self.storage.partitioned.get('sensor_data')
+        table = 'sensor_data'
+        if partitions:
+            # Only whole partitions, so nothing archived stays behind in a live file.
+            # Partitions are read file by file below; the view only adds the main
+            # table's rows from before partitioning.
+            cutoff = partitions.key_for(cutoff)
+            table = 'main.sensor_data'
+        nodes = [row['node_id'] for row in self.storage.query(f'SELECT DISTINCT node_id FROM {table}')]
+        for node_id in nodes:
+            days = self.storage.query(f'''
+                SELECT substr(timestamp, 1, 10) AS day, MAX(id) AS max_id FROM {table}
+                WHERE node_id = ? AND timestamp < ? GROUP BY day
+            ''', (node_id, cutoff))
+            for day in days:
+                # Rows that arrive while this runs have higher ids and stay for the next pass
+                params = (node_id, day['day'], next_day(day['day']), day['max_id'])
+                rows = self.storage.query(f'''
+                    SELECT * FROM {table}
+                    WHERE node_id = ? AND timestamp >= ? AND timestamp < ? AND id <= ?
+                ''', params)
+                if not rows:
+                    continue
+                self.archive.write(node_id, day['day'], rows)
+                self.storage.execute('''
+                    DELETE FROM sensor_data
+                    WHERE node_id = ? AND timestamp >= ? AND timestamp < ? AND id <= ?
+                ''', params).result(timeout=60)
+                moved[node_id] = moved.get(node_id, 0) + len(rows)
+
+        # Retention for partitioned storage is a file unlink. A partition that
+        # took new rows meanwhile is kept, and those rows go on the next pass.
+        if partitions:
+            for key, end in self.storage.partitions('sensor_data'):
+                if end <= cutoff:
+                    max_id = self.archive_partition(partitions, key, moved)
+                    self.storage.drop_partition('sensor_data', key, max_id).result(timeout=60)
+        self.archived_rows += sum(moved.values())
+        self.last_run = time.time()
+        return moved
+
+    def archive_partition(self, partitions, key, moved):
+        """Archive every row of one partition file; returns the highest id archived"""
+        conn = sqlite3.connect(f'file:{partitions.path(key)}?mode=ro', uri=True)
+        conn.row_factory = sqlite3.Row
+        try:
+            rows = conn.execute('SELECT * FROM sensor_data ORDER BY node_id, timestamp, id').fetchall()
+        finally:
+            conn.close()
+        groups = {}
+        for row in rows:
+            groups.setdefault((row['node_id'], row['timestamp'][:10]), []).append(row)
+        for (node_id, day), group in groups.items():
+            self.archive.write(node_id, day, group)
+            moved[node_id] = moved.get(node_id, 0) + len(group)
+        return max((row['id'] for row in rows), default=0)
+
+    def start(self):
+        if self.after_days <= 0:
+            return
+        self._thread = threading.Thread(target=self._run, name='archiver', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                moved = self.run_once()
+                if moved:
+                    print(f"🗄️ Archived {sum(moved.values())} readings older than {self.after_days:g} days: {moved}")
+            except Exception as e:
+                print(f"Error archiving sensor data: {e}")
+            self._stop.wait(self.interval)
+
+
+# --- Reads across the live table and the archive ---
+
+def live_columns(storage):
+    return [row['name'] for row in storage.query('PRAGMA table_info(sensor_data)')]
+
+
+def require_attached(storage, since, until):
+    """Refuse a range that reaches partitions the reader views don't cover"""
+    hidden = storage.hidden_partitions('sensor_data', since, until)
+    if hidden:
+        raise PartitionsNotAttached(
+            f"sensor_data partitions {hidden[0]}..{hidden[-1]} are not attached yet; they are "
+            f"readable once archived (python archive.py), or narrow the range")
+
+
+def history(storage, archive, node_id, since=None, until=None, limit=None, columns=None):
+    """Newest-first rows for one node in [since, until), from both sources"""
+    columns = list(columns or live_columns(storage))
+    select = list(dict.fromkeys(['id', 'timestamp'] + columns))
+    sql = f"SELECT {', '.join(select)} FROM sensor_data WHERE node_id = ?"
+    params = [node_id]
+    if since:
+        sql += ' AND timestamp >= ?'
+        params.append(since)
+    if until:
+        sql += ' AND timestamp < ?'
+        params.append(until)
+    sql += ' ORDER BY timestamp DESC, id DESC'
+    if limit:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    live = [dict(row) for row in storage.query(sql, params)]
+
+    # A full page from the live table only needs archived rows newer than its oldest row
+    lower = since
+    if limit and len(live) >= limit:
+        lower = max(since or '', live[-1]['timestamp'])
+    require_attached(storage, lower, until)
+    archived = []
+    for day in reversed(archive.days(node_id, lower, until)):
+        archived.extend(archive.rows(node_id, day, select, lower, until))
+        if limit and len(archived) >= limit:
+            break
+    if not archived:
+        return live
+
+    merged = {row['id']: row for row in archived}
+    merged.update((row['id'], row) for row in live)
+    rows = sorted(merged.values(), key=lambda row: (row['timestamp'], row['id']), reverse=True)
+    return rows[:limit] if limit else rows
+
+
+def iter_range(storage, archive, node_id, since=None, until=None, columns=None):
+    """Oldest-first rows for one node in [since, until), one day at a time"""
+    require_attached(storage, since, until)
+    columns = list(columns or live_columns(storage))
+    select = list(dict.fromkeys(['id', 'timestamp'] + columns))
+    bounds = storage.query_one('''
+        SELECT MIN(timestamp) AS first, MAX(timestamp) AS last FROM sensor_data
+        WHERE node_id = ? AND timestamp >= ? AND timestamp < ?
+    ''', (node_id, since or '', until or '9999-12-31'))  # not '9999': numeric affinity
+    days = set(archive.days(node_id, since, until))
+    if bounds['first']:
+        day = bounds['first'][:10]
+        while day <= bounds['last'][:10]:
+            days.add(day)
+            day = next_day(day)
+
+    for day in sorted(days):
+        lo = max(since or day, day)
+        hi = min(until or next_day(day), next_day(day))
+        rows = {row['id']: row for row in archive.rows(node_id, day, select, lo, hi, newest_first=False)}
+        live = storage.query(f'''
+            SELECT {', '.join(select)} FROM sensor_data
+            WHERE node_id = ? AND timestamp >= ? AND timestamp < ?
+        ''', (node_id, lo, hi))
+        rows.update((row['id'], dict(row)) for row in live)
+        yield from sorted(rows.values(), key=lambda row: (row['timestamp'], row['id']))
+
+
+def main():
+    from storage import StorageEngine, partition_directory
+
+    parser = argparse.ArgumentParser(description='Move old sensor_data rows into the columnar archive')
+    parser.add_argument('--db', default=database_path())
+    parser.add_argument('--dir', help='Archive directory (default: <db name>_archive)')
+    parser.add_argument('--older-than', type=float, default=ARCHIVE_AFTER_DAYS,
+                        help='Archive whole days older than this many days')
+    parser.add_argument('--stats', action='store_true', help='Only print archive statistics')
+    args = parser.parse_args()
+
+    directory = args.dir or archive_directory(args.db)
+    archive = ColumnArchive(directory)
+    if not args.stats:
+        storage = StorageEngine(args.db)
+        partition_days = int(os.environ.get('RESQSENSE_PARTITION_DAYS', '1'))
+        if partition_days > 0 and os.path.isdir(partition_directory(args.db)):
+            storage.partition('sensor_data', partition_directory(args.db), partition_days)
+        try:
+            started = time.perf_counter()
+            moved = Archiver(storage, archive, args.older_than).run_once()
+            print(f"🗄️ Archived {sum(moved.values())} readings in {time.perf_counter() - started:.1f}s: {moved}")
+        finally:
+            storage.close()
+    print(f"📊 {archive.stats()}")
+
+
+if __name__ == "__main__":
+    main()
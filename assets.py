@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+"""
+Static asset pipeline for the dashboards
+Page styles and scripts live in static/css and static/js, third-party
+libraries in static/vendor. The libraries are fetched once with `python
+assets.py vendor` and committed together with their SHA-256 digests in
+static/vendor/SHA256SUMS, so the mine network never needs a CDN. Until a
+library is vendored, pages load it from its pinned CDN URL, with a
+Subresource Integrity hash whenever SHA256SUMS pins its digest. `python
+assets.py build` refuses to run if a vendored library doesn't match its
+digest. It then copies everything into static/dist under content-hash
+names, precompresses .gz (and .br when the brotli module is installed) next
+to each file and writes a manifest. Building is a deploy step; the server
+only reads the manifest.
+
+Templates reference assets as {{ asset('js/index.js') }} and libraries as
+{{ vendor_script('vendor/chart.umd.js') }}. Hashed files are
+served from /assets/ with a one-year immutable Cache-Control and an ETag, and
+each dashboard is rendered once per build and revalidated with a 304, so a
+reload costs one small conditional request.
+
+    python assets.py vendor
+    python assets.py build
+"""
+
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import sys
+import urllib.request
+
+from flask import Blueprint, abort, current_app, make_response, render_template, request, send_file, url_for
+from markupsafe import Markup, escape
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST = os.path.join(DIST_DIR, 'manifest.json')
+SOURCES = ('css', 'js', 'vendor')
+VENDOR_LOCK = 'vendor/SHA256SUMS'
+ONE_YEAR = 365 * 24 * 3600
+
+# Pinned third-party libraries, vendored from the CDNs the dashboards used to load
+VENDOR = {
+    'vendor/chart.umd.js': 'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.js',
+    'vendor/chartjs-plugin-annotation.min.js':
+        'https://cdn.jsdelivr.net/npm/chartjs-plugin-annotation@3.0.1/dist/chartjs-plugin-annotation.min.js',
+    'vendor/three.min.js': 'https://cdnjs.cloudflare.com/ajax/libs/three.js/r128/three.min.js',
+    'vendor/socket.io.min.js': 'https://cdn.socket.io/4.7.5/socket.io.min.js',
+}
+
+assets_bp = Blueprint('assets', __name__)
+
+
+class AssetError(Exception):
+    """Raised when vendored libraries don't match their pinned digests"""
+
+
+manifest = {}
+vendored = set()      # Libraries present in static/vendor and matching SHA256SUMS
+_pages = {}
+
+
+# --- Build ---
+
+def source_files(static_dir=STATIC_DIR):
+    """Yield (logical name, path) for every asset under the source folders"""
+    for folder in SOURCES:
+        root = os.path.join(static_dir, folder)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in sorted(filenames):
+                path = os.path.join(dirpath, filename)
+                name = os.path.relpath(path, static_dir).replace(os.sep, '/')
+                if name != VENDOR_LOCK:
+                    yield name, path
+
+
+def write_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build(static_dir=STATIC_DIR, dist_dir=DIST_DIR):
+    """Write content-hashed, precompressed copies of every asset; returns the manifest
+
+    Raises AssetError if a vendored library is unpinned or modified.
+    """
+    check_vendor(static_dir)
+    built = {}
+    keep = {'manifest.json'}
+    for name, path in source_files(static_dir):
+        with open(path, 'rb') as f:
+            data = f.read()
+        stem, ext = os.path.splitext(name)
+        hashed = f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+        target = os.path.join(dist_dir, hashed)
+        variants = [(target, data), (target + '.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append((target + '.br', brotli.compress(data, quality=11)))
+        for variant, content in variants:
+            # A variant that doesn't shrink the file is never worth sending
+            if variant != target and len(content) >= len(data):
+                continue
+            keep.add(os.path.relpath(variant, dist_dir))
+            if not os.path.exists(variant):
+                write_atomic(variant, content)
+        built[name] = hashed
+
+    # Old builds are unreachable once the manifest moves on
+    for dirpath, _, filenames in os.walk(dist_dir, topdown=False):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            if os.path.relpath(path, dist_dir) not in keep:
+                os.remove(path)
+        if dirpath != dist_dir and not os.listdir(dirpath):
+            os.rmdir(dirpath)
+    write_atomic(os.path.join(dist_dir, 'manifest.json'), json.dumps(built, indent=2, sort_keys=True).encode())
+    return built
+
+
+def is_stale(static_dir=STATIC_DIR, dist_dir=DIST_DIR):
+    """True if sources were added, removed or changed since the last build"""
+    path = os.path.join(dist_dir, 'manifest.json')
+    try:
+        with open(path) as f:
+            built = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return True
+    built_at = os.path.getmtime(path)
+    sources = dict(source_files(static_dir))
+    return set(sources) != set(built) or any(os.path.getmtime(p) > built_at for p in sources.values())
+
+
+def sha256_file(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def read_lock(static_dir=STATIC_DIR):
+    """{name: sha256} pinned in static/vendor/SHA256SUMS (sha256sum format)"""
+    try:
+        with open(os.path.join(static_dir, VENDOR_LOCK)) as f:
+            return {name: digest for digest, name in (line.split() for line in f if line.strip())}
+    except FileNotFoundError:
+        return {}
+
+
+def check_vendor(static_dir=STATIC_DIR):
+    """Names of the libraries vendored and matching their pinned digests
+
+    Missing libraries are left to their CDN URLs; one that is present but
+    unpinned or modified raises AssetError.
+    """
+    lock = read_lock(static_dir)
+    verified, problems = set(), []
+    for name in VENDOR:
+        path = os.path.join(static_dir, name)
+        if not os.path.exists(path):
+            continue
+        if name not in lock:
+            problems.append(f"{name} has no digest in {VENDOR_LOCK}")
+        elif sha256_file(path) != lock[name]:
+            problems.append(f"{name} does not match its digest in {VENDOR_LOCK}")
+        else:
+            verified.add(name)
+    if problems:
+        raise AssetError('; '.join(problems) + ' (run: python assets.py vendor --force, then commit static/vendor)')
+    return verified
+
+
+def vendor(static_dir=STATIC_DIR, force=False):
+    """Download the pinned libraries into static/vendor; returns {name: sha256}
+
+    A download that doesn't match a digest already in SHA256SUMS raises
+    AssetError and is not written.
+    """
+    lock = read_lock(static_dir)
+    fetched = {}
+    for name, url in VENDOR.items():
+        path = os.path.join(static_dir, name)
+        if os.path.exists(path) and not force:
+            lock.setdefault(name, sha256_file(path))
+            continue
+        with urllib.request.urlopen(url, timeout=30) as response:
+            data = response.read()
+        digest = hashlib.sha256(data).hexdigest()
+        if lock.get(name, digest) != digest:
+            raise AssetError(f"{url} has sha256 {digest}, but {lock[name]} is pinned for {name}")
+        write_atomic(path, data)
+        fetched[name] = lock[name] = digest
+    write_atomic(os.path.join(static_dir, VENDOR_LOCK),
+                 ''.join(f"{lock[name]}  {name}\n" for name in sorted(lock)).encode())
+    return fetched
+
+
+# --- Serving ---
+
+def load_manifest():
+    global manifest
+    try:
+        with open(MANIFEST) as f:
+            manifest = json.load(f)
+    except FileNotFoundError:
+        manifest = {}
+    _pages.clear()
+    return manifest
+
+
+def asset(name):
+    """URL for a logical asset name
+
+    Prefers the hashed build and falls back to the unbuilt file under /static,
+    or to the pinned CDN URL of a library that isn't vendored yet.
+    """
+    if name in VENDOR and name not in vendored:
+        return VENDOR[name]
+    if name in manifest:
+        return url_for('assets.serve', filename=manifest[name])
+    return url_for('static', filename=name)
+
+
+def vendor_script(name):
+    """<script> tag for a library; CDN loads carry the SRI hash pinned in SHA256SUMS"""
+    attrs = f' src="{escape(asset(name))}"'
+    digest = read_lock().get(name)
+    if name not in vendored and digest:
+        sri = base64.b64encode(bytes.fromhex(digest)).decode()
+        attrs += f' integrity="sha256-{sri}" crossorigin="anonymous"'
+    return Markup(f'<script{attrs}></script>')
+
+
+def negotiate(path):
+    """Pick the best precompressed variant the client accepts: (path, encoding)"""
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[encoding] and os.path.isfile(path + suffix):
+            return path + suffix, encoding
+    return path, None
+
+
+@assets_bp.route('/assets/<path:filename>')
+def serve(filename):
+    """Content-hashed asset: cache forever, the name changes with the content"""
+    path = safe_join(DIST_DIR, filename)
+    if path is None or filename == 'manifest.json' or not os.path.isfile(path):
+        abort(404)
+    path, encoding = negotiate(path)
+    response = send_file(path, mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream',
+                         etag=os.path.basename(filename) + (f'.{encoding}' if encoding else ''),
+                         conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = f'public, max-age={ONE_YEAR}, immutable'
+    return response
+
+
+def render_page(template):
+    """Render a dashboard once per build and answer unchanged reloads with 304"""
+    page = _pages.get(template)
+    if page is None or current_app.debug:
+        html = render_template(template).encode()
+        page = _pages[template] = (html, gzip.compress(html, compresslevel=9, mtime=0),
+                                   hashlib.sha256(html).hexdigest()[:16])
+    html, compressed, tag = page
+    if request.accept_encodings['gzip']:
+        response = make_response(compressed)
+        response.headers['Content-Encoding'] = 'gzip'
+        response.set_etag(tag + '.gzip')
+    else:
+        response = make_response(html)
+        response.set_etag(tag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    # The page itself must be revalidated so it can pick up new asset names
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+
+def init_app(app):
+    """Serve /assets and expose asset() to templates; never builds"""
+    load_manifest()
+    if not manifest:
+        print("⚠️ No asset build, serving unhashed files from /static (run: python assets.py build)")
+    elif is_stale():
+        print("⚠️ static/dist is older than static/ (run: python assets.py build)")
+    vendored.clear()
+    try:
+        vendored.update(check_vendor())
+    except AssetError as e:
+        print(f"❌ Vendored libraries rejected, loading them from the CDN: {e}")
+    missing = [name for name in VENDOR if name not in vendored]
+    if missing:
+        print(f"⚠️ Not vendored yet, loading from CDN: {', '.join(missing)} (run: python assets.py vendor)")
+    app.register_blueprint(assets_bp)
+    app.jinja_env.globals['asset'] = asset
+    app.jinja_env.globals['vendor_script'] = vendor_script
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Vendor and build the ResQSense dashboard assets')
+    parser.add_argument('command', choices=('vendor', 'build'))
+    parser.add_argument('--force', action='store_true', help='Re-download libraries that are already vendored')
+    args = parser.parse_args()
+
+    if args.command == 'vendor':
+        try:
+            fetched = vendor(force=args.force)
+        except (OSError, AssetError) as e:
+            print(f"❌ Could not vendor libraries: {e}")
+            return 1
+        for name, digest in fetched.items():
+            print(f"⬇️ {name}  sha256={digest}")
+        print(f"✅ {len(fetched)} libraries vendored into {os.path.join(STATIC_DIR, 'vendor')}")
+
+    try:
+        built = build()
+    except AssetError as e:
+        print(f"❌ Build failed: {e}")
+        return 1
+    compressed = 'gzip + brotli' if brotli is not None else 'gzip (pip install brotli for .br)'
+    print(f"✅ Built {len(built)} assets into {DIST_DIR} ({compressed})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Store-and-forward gateway for ResQSense
+Runs near the nodes (e.g. at a level station) and accepts the same POST /data
+payloads as the server. Each reading is appended to a local log before the
+node gets its reply. One forwarder thread sends the log upstream in order as
+gzipped batches, retrying with backoff until the server acknowledges them, so
+readings taken while the underground link is down are delayed, not lost.
+
+Forwarded readings carry gateway_id/gateway_seq so the server can drop a batch
+that is re-sent after a lost reply. Their age_ms is extended by the time spent
+in the log, so they keep their original timestamps. Disk use is bounded: past
+--max-disk-mb the oldest segments are dropped, and the dropped readings are
+counted.
+
+    python gateway.py --upstream http://10.109.8.198:5000 --port 5080
+    python test_multi_node_client.py --url http://localhost:5080/data
+"""
+
+import argparse
+import gzip
+import json
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+
+from flask import Flask, request, jsonify
+
+SEGMENT_BYTES = 1024 * 1024      # Roll to a new segment file past this size
+MAX_DISK_BYTES = 256 * 1024 * 1024
+BATCH_READINGS = 100             # Per upstream POST (stays under the server's burst budget)
+BATCH_BYTES = 256 * 1024         # Uncompressed JSON per upstream POST
+LINGER_S = 0.05                  # Wait this long after a wake-up so readings can coalesce
+FSYNC_INTERVAL = 1.0             # Appends are flushed at once and fsynced at least this often
+BACKOFF_MIN = 0.5
+BACKOFF_MAX = 30.0
+UPSTREAM_TIMEOUT = 15
+
+
+class SegmentLog:
+    """Append-only log of JSON lines, split into segment files named by first seq.
+
+    `acked` is the last sequence number the server has confirmed. Segments
+    holding only acked records are deleted, so the log holds only the
+    backlog plus the segment being written.
+    """
+
+    def __init__(self, directory, segment_bytes=SEGMENT_BYTES, max_bytes=MAX_DISK_BYTES):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.segments = []            # [first_seq, path, size], oldest first
+        self.dropped = 0
+        self._writer = None
+        self._dirty = False
+        self._synced = time.monotonic()
+        self._position = None         # (seq, path, offset) where the next unacked record starts
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.epoch = self._read_epoch()
+        self.acked = self._read_cursor()
+        self._recover()
+
+    # --- Startup ---
+
+    def _read_epoch(self):
+        """Random id created with the log; a wiped log starts a new sequence"""
+        path = os.path.join(self.directory, 'epoch')
+        if not os.path.exists(path):
+            self._write_atomic(path, uuid.uuid4().hex[:8])
+        with open(path) as f:
+            return f.read().strip()
+
+    def _read_cursor(self):
+        try:
+            with open(os.path.join(self.directory, 'cursor')) as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _write_atomic(self, path, text):
+        tmp = path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+
+    def _recover(self):
+        """Find the segments, cut a torn last line and work out the next seq"""
+        for name in sorted(os.listdir(self.directory)):
+            if name.startswith('segment-') and name.endswith('.log'):
+                path = os.path.join(self.directory, name)
+                self.segments.append([int(name[8:-4]), path, os.path.getsize(path)])
+
+        self.next_seq = self.acked + 1
+        if self.segments:
+            first, path, _ = self.segments[-1]
+            with open(path, 'rb+') as f:
+                data = f.read()
+                end = data.rfind(b'\n') + 1
+                if end < len(data):
+                    print(f"⚠️ Truncating torn record at the end of {path}")
+                    f.truncate(end)
+            self.segments[-1][2] = end
+            lines = data[:end].count(b'\n')
+            self.next_seq = max(self.next_seq, first + lines)
+            self._writer = open(path, 'ab')
+        self._compact()
+
+    # --- Writing ---
+
+    def append(self, readings, now=None):
+        """Log readings with their arrival time; returns the last seq assigned"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if self._writer is None or self.segments[-1][2] >= self.segment_bytes:
+                self._roll()
+            lines = []
+            for reading in readings:
+                lines.append(json.dumps({'seq': self.next_seq, 't': round(now, 3), 'r': reading},
+                                        separators=(',', ':')).encode() + b'\n')
+                self.next_seq += 1
+            data = b''.join(lines)
+            self._writer.write(data)
+            self._writer.flush()
+            self.segments[-1][2] += len(data)
+            self._dirty = True
+            self._enforce_limit()
+            return self.next_seq - 1
+
+    def _roll(self):
+        if self._writer is not None:
+            os.fsync(self._writer.fileno())
+            self._writer.close()
+        path = os.path.join(self.directory, f'segment-{self.next_seq:020d}.log')
+        self._writer = open(path, 'ab')
+        self.segments.append([self.next_seq, path, 0])
+
+    def sync(self, force=False):
+        """fsync pending appends if FSYNC_INTERVAL has passed (or force)"""
+        with self._lock:
+            if self._dirty and (force or time.monotonic() - self._synced >= FSYNC_INTERVAL):
+                os.fsync(self._writer.fileno())
+                self._dirty = False
+                self._synced = time.monotonic()
+
+    def _enforce_limit(self):
+        """Drop the oldest segments, forwarded or not, until under max_bytes"""
+        while self.disk_bytes() > self.max_bytes and len(self.segments) > 1:
+            first, path, _ = self.segments.pop(0)
+            end = self.segments[0][0] - 1
+            lost = end - max(self.acked, first - 1)
+            if lost > 0:
+                self.dropped += lost
+                print(f"🗑️ Log over {self.max_bytes / (1024 * 1024):g} MB: dropped {lost} unforwarded readings")
+            os.remove(path)
+            if end > self.acked:
+                self.acked = end
+                self._write_atomic(os.path.join(self.directory, 'cursor'), str(self.acked))
+
+    # --- Forwarding ---
+
+    def read(self, max_records=BATCH_READINGS, max_bytes=BATCH_BYTES):
+        """The oldest unacked records, plus the position to pass to ack()"""
+        with self._lock:
+            seq = self.acked + 1
+            if seq >= self.next_seq:
+                return [], None
+            if self._position and self._position[0] == seq and os.path.exists(self._position[1]):
+                _, path, offset = self._position
+                index = next(i for i, segment in enumerate(self.segments) if segment[1] == path)
+            else:
+                index = max(i for i, segment in enumerate(self.segments) if segment[0] <= seq)
+                path, offset = self.segments[index][1], 0
+                with open(path, 'rb') as f:
+                    for _ in range(seq - self.segments[index][0]):
+                        offset += len(f.readline())
+
+            records = []
+            size = 0
+            while len(records) < max_records and size < max_bytes:
+                with open(path, 'rb') as f:
+                    f.seek(offset)
+                    for line in f:
+                        records.append(json.loads(line))
+                        offset += len(line)
+                        size += len(line)
+                        if len(records) >= max_records or size >= max_bytes:
+                            break
+                if len(records) >= max_records or size >= max_bytes or index + 1 >= len(self.segments):
+                    break
+                index += 1
+                path, offset = self.segments[index][1], 0
+            return records, (seq + len(records), path, offset)
+
+    def ack(self, last_seq, position):
+        """Mark records up to last_seq as delivered and delete spent segments"""
+        with self._lock:
+            if last_seq <= self.acked:
+                return
+            self.acked = last_seq
+            self._position = position
+            self._write_atomic(os.path.join(self.directory, 'cursor'), str(self.acked))
+            self._compact()
+
+    def _compact(self):
+        while len(self.segments) > 1 and self.segments[1][0] <= self.acked + 1:
+            os.remove(self.segments.pop(0)[1])
+
+    # --- Introspection ---
+
+    def disk_bytes(self):
+        return sum(segment[2] for segment in self.segments)
+
+    def backlog(self):
+        return self.next_seq - 1 - self.acked
+
+    def close(self):
+        with self._lock:
+            if self._writer is not None:
+                self._writer.flush()
+                os.fsync(self._writer.fileno())
+                self._writer.close()
+                self._writer = None
+
+
+class Forwarder:
+    """Ships the log upstream in order, one gzipped batch at a time"""
+
+    def __init__(self, log, upstream, gateway_id, batch_readings=BATCH_READINGS):
+        import requests
+        self.log = log
+        self.url = upstream.rstrip('/') + '/data'
+        self.gateway_id = gateway_id
+        self.batch_readings = batch_readings
+        self.session = requests.Session()
+        self.advice = {}              # node_id -> latest server reporting advice
+        self.link_up = None
+        self.last_success = None
+        self.oldest_pending = None    # Arrival time of the oldest unforwarded reading
+        self.counters = {
+            'forwarded_readings': 0, 'forwarded_batches': 0, 'duplicates': 0,
+            'raw_bytes': 0, 'compressed_bytes': 0,
+            'failed_attempts': 0, 'throttled': 0, 'rejected_readings': 0,
+        }
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='gateway-forwarder', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        backoff = BACKOFF_MIN
+        while not self._stop.is_set():
+            self.log.sync()
+            records, position = self.log.read(self.batch_readings)
+            if not records:
+                self.oldest_pending = None
+                self._wake.wait(FSYNC_INTERVAL)
+                if self._wake.is_set():
+                    self._wake.clear()
+                    time.sleep(LINGER_S)
+                continue
+
+            self.oldest_pending = records[0]['t']
+            delay = self._forward(records, position)
+            if delay is None:
+                backoff = BACKOFF_MIN
+                continue
+            if delay == 'backoff':
+                delay = backoff * random.uniform(0.5, 1.0)
+                backoff = min(backoff * 2, BACKOFF_MAX)
+            self._stop.wait(delay)
+        self.log.sync(force=True)
+
+    def _forward(self, records, position):
+        """POST one batch; returns None on progress, else seconds or 'backoff' to wait"""
+        now = time.time()
+        batch = []
+        for record in records:
+            reading = dict(record['r'])
+            age_ms = float(reading.get('age_ms', 0) or 0) + (now - record['t']) * 1000
+            reading.update(age_ms=int(age_ms), gateway_id=self.gateway_id, gateway_seq=record['seq'])
+            batch.append(reading)
+        raw = json.dumps(batch, separators=(',', ':')).encode()
+        body = gzip.compress(raw, compresslevel=6)
+
+        try:
+            response = self.session.post(self.url, data=body, timeout=UPSTREAM_TIMEOUT, headers={
+                'Content-Type': 'application/json', 'Content-Encoding': 'gzip'})
+        except Exception as e:
+            self.counters['failed_attempts'] += 1
+            if self.link_up is not False:
+                print(f"📴 Upstream unreachable ({type(e).__name__}), buffering {self.log.backlog()} readings")
+            self.link_up = False
+            return 'backoff'
+
+        if response.status_code == 429:
+            # Over the server's ingest budget: keep the batch and come back later
+            self.counters['throttled'] += 1
+            self._remember_advice(batch, response)
+            return float(response.headers.get('Retry-After', 1))
+        if response.status_code >= 500 or response.status_code == 408:
+            self.counters['failed_attempts'] += 1
+            print(f"⚠️ Upstream returned {response.status_code}, retrying")
+            return 'backoff'
+
+        if self.link_up is False:
+            print(f"📶 Upstream reachable again, {self.log.backlog()} readings to forward")
+        self.link_up = True
+        if response.status_code == 200:
+            reply = self._remember_advice(batch, response)
+            self.counters['forwarded_readings'] += len(batch)
+            self.counters['forwarded_batches'] += 1
+            self.counters['duplicates'] += reply.get('duplicates', 0)
+            self.counters['raw_bytes'] += len(raw)
+            self.counters['compressed_bytes'] += len(body)
+            self.last_success = now
+        else:
+            # Any other 4xx will fail again on retry; skip it rather than stall the log
+            self.counters['rejected_readings'] += len(batch)
+            print(f"❌ Upstream rejected {len(batch)} readings ({response.status_code}): {response.text[:200]}")
+        self.log.ack(records[-1]['seq'], position)
+        return None
+
+    def _remember_advice(self, batch, response):
+        try:
+            reply = response.json()
+        except ValueError:
+            return {}
+        nodes = reply.get('nodes')
+        if not nodes and 'interval_ms' in reply:
+            nodes = {batch[-1].get('node_id', 'unknown'): reply}
+        for node_id, advice in (nodes or {}).items():
+            self.advice[node_id] = {key: advice[key] for key in ('interval_ms', 'batch_size') if key in advice}
+        return reply
+
+
+class Gateway:
+    """The log, the forwarder and the intake counters"""
+
+    def __init__(self, upstream, log_dir='gateway_log', name=None,
+                 max_bytes=MAX_DISK_BYTES, segment_bytes=SEGMENT_BYTES):
+        self.log = SegmentLog(log_dir, segment_bytes, max_bytes)
+        self.gateway_id = f"{name or socket.gethostname()}-{self.log.epoch}"
+        self.forwarder = Forwarder(self.log, upstream, self.gateway_id)
+        self.received_readings = 0
+        self.received_requests = 0
+        self.started = time.time()
+        self._lock = threading.Lock()
+
+    def start(self):
+        self.forwarder.start()
+
+    def close(self):
+        self.forwarder.stop()
+        self.log.close()
+
+    def receive(self, readings):
+        """Log readings and return the reporting advice for their node"""
+        self.log.append(readings)
+        with self._lock:
+            self.received_readings += len(readings)
+            self.received_requests += 1
+        self.forwarder.wake()
+        return self.forwarder.advice.get(readings[-1].get('node_id'), {})
+
+    def stats(self):
+        now = time.time()
+        uptime = max(now - self.started, 1e-9)
+        counters = dict(self.forwarder.counters)
+        raw = counters['raw_bytes']
+        oldest = self.forwarder.oldest_pending
+        return {
+            'gateway_id': self.gateway_id,
+            'upstream': self.forwarder.url,
+            'link_up': self.forwarder.link_up,
+            'uptime_s': round(uptime, 1),
+            'received_readings': self.received_readings,
+            'received_requests': self.received_requests,
+            **counters,
+            'dropped_readings': self.log.dropped,
+            'backlog': self.log.backlog(),
+            'oldest_pending_s': round(now - oldest, 1) if oldest else 0,
+            'disk_bytes': self.log.disk_bytes(),
+            'segments': len(self.log.segments),
+            'received_per_s': round(self.received_readings / uptime, 2),
+            'forwarded_per_s': round(counters['forwarded_readings'] / uptime, 2),
+            'compression_ratio': round(raw / counters['compressed_bytes'], 2) if raw else None,
+            'last_success': self.forwarder.last_success,
+        }
+
+
+def create_app(gateway):
+    app = Flask(__name__)
+
+    @app.route('/data', methods=['POST'])
+    def receive_data():
+        data = request.get_json(silent=True)
+        readings = data if isinstance(data, list) else [data]
+        if not readings or not all(isinstance(reading, dict) and 'node_id' in reading for reading in readings):
+            return jsonify({"status": "error", "message": "Invalid data format: node readings with a node_id are required."}), 400
+        try:
+            advice = gateway.receive(readings)
+        except OSError as e:
+            print(f"❌ Could not log readings: {e}")
+            return jsonify({"status": "error", "message": "Gateway could not store the data"}), 500
+        return jsonify({"status": "success", "message": "Data queued for forwarding", **advice}), 200
+
+    @app.route('/stats', methods=['GET'])
+    def get_stats():
+        return jsonify({"status": "success", "stats": gateway.stats()}), 200
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ResQSense store-and-forward gateway')
+    parser.add_argument('--upstream', default='http://localhost:5000', help='ResQSense server base URL')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5080)
+    parser.add_argument('--log-dir', default='gateway_log', help='Directory for the local log')
+    parser.add_argument('--name', help='Gateway name sent upstream (default: hostname)')
+    parser.add_argument('--max-disk-mb', type=float, default=MAX_DISK_BYTES / (1024 * 1024),
+                        help='Drop the oldest readings beyond this much log on disk')
+    args = parser.parse_args()
+
+    gateway = Gateway(args.upstream, args.log_dir, args.name, int(args.max_disk_mb * 1024 * 1024))
+    gateway.start()
+    print(f"🚀 ResQSense gateway {gateway.gateway_id} on port {args.port}")
+    print(f"📡 Forwarding to {args.upstream} ({gateway.log.backlog()} readings in backlog)")
+    try:
+        create_app(gateway).run(host=args.host, port=args.port, threaded=True)
+    finally:
+        gateway.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,447 @@
+"""
+Mining node blueprint for ResQSense
+Ingest and query endpoints for the ESP32 sensor nodes (`4_noderes.ino`).
+"""
+
+import csv
+import io
+import json
+import threading
+import zlib
+
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+
+import archive
+import assets
+import ranging
+import sampling
+from realtime import socketio
+from storage import PartitionsNotAttached, get_storage, reading_time, timestamp_at
+
+nodes_bp = Blueprint('nodes', __name__)
+
+# Called with (storage, data) before a reading is stored; each returns extra
+# sensor_data columns for the row
+reading_enrichers = []
+
+# Streaming analytics called with (storage, data) for every stored reading
+reading_listeners = []
+
+# Largest request body accepted after gzip decoding (gateway batches)
+MAX_DECODED_BYTES = 16 * 1024 * 1024
+
+
+def init_schema(conn):
+    """Create the sensor_data table if it doesn't exist, migrating old layouts"""
+    cursor = conn.cursor()
+
+    # Check if the table exists and has the correct structure
+    cursor.execute("PRAGMA table_info(sensor_data)")
+    columns = [column[1] for column in cursor.fetchall()]
+
+    if not columns:
+        # Create new table with correct structure
+        cursor.execute('''
+            CREATE TABLE sensor_data (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                node_id TEXT NOT NULL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                mq4 REAL, mq5 REAL, mq135 REAL, mq7 REAL,
+                temperature REAL, humidity REAL, sound REAL,
+                fire INTEGER, vibration INTEGER, pressure REAL,
+                acceleration_x REAL, acceleration_y REAL, acceleration_z REAL
+            )
+        ''')
+        print("Created new sensor_data table with node_id support")
+    elif 'node_id' not in columns:
+        # Add node_id column to existing table
+        cursor.execute('ALTER TABLE sensor_data ADD COLUMN node_id TEXT DEFAULT "node1"')
+        print("Added node_id column to existing sensor_data table")
+
+    # Per-node history and "latest per node" both filter on (node_id, timestamp)
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_sensor_data_node_time
+        ON sensor_data (node_id, timestamp)
+    ''')
+
+    # Highest reading sequence number stored from each store-and-forward gateway
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS gateway_progress (
+            gateway_id TEXT PRIMARY KEY,
+            last_seq INTEGER NOT NULL,
+            updated DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def sensor_row(data):
+    """Map a node JSON payload onto sensor_data columns"""
+    acceleration = data.get('Acceleration', {})
+    return {
+        'node_id': data.get('node_id', 'unknown'),
+        'timestamp': timestamp_at(reading_time(data)),
+        'mq4': data.get('MQ4', 0), 'mq5': data.get('MQ5', 0),
+        'mq135': data.get('MQ135', 0), 'mq7': data.get('MQ7', 0),
+        'temperature': data.get('Temperature', 0), 'humidity': data.get('Humidity', 0),
+        'sound': data.get('Sound', 0), 'fire': data.get('Fire', 0),
+        'vibration': data.get('Vibration', 0), 'pressure': data.get('Pressure', 0),
+        'acceleration_x': acceleration.get('x', 0),
+        'acceleration_y': acceleration.get('y', 0),
+        'acceleration_z': acceleration.get('z', 0),
+    }
+
+
+def insert_sensor_data(readings, storage=None):
+    """Queue a batch of readings as one write and wait for it to commit
+
+    The rows go in as a single insert, so a batch is stored entirely or not
+    at all.
+    """
+    try:
+        storage = storage or get_storage()
+        rows = []
+        for data in readings:
+            row = sensor_row(data)
+            for enricher in reading_enrichers:
+                try:
+                    row.update(enricher(storage, data))
+                except Exception as e:
+                    print(f"Error in reading enricher {enricher}: {e}")
+            rows.append(row)
+        storage.insert_many('sensor_data', rows).result(timeout=10)
+        return True
+    except Exception as e:
+        print(f"Error inserting data: {e}")
+        return False
+
+
+def broadcast_sensor_data(data):
+    """Push a stored reading to connected dashboards"""
+    socketio.emit('new_sensor_data', data)
+
+
+def ingest_readings(storage, readings):
+    """Store and broadcast a batch of readings; the path POST /data and in-process producers share"""
+    if not insert_sensor_data(readings, storage):
+        return False
+    for data in readings:
+        for listener in reading_listeners:
+            try:
+                listener(storage, data)
+            except Exception as e:
+                print(f"Error in reading listener {listener}: {e}")
+        broadcast_sensor_data(data)
+    return True
+
+
+def ingest_reading(storage, data):
+    return ingest_readings(storage, [data])
+
+
+class GatewayProgress:
+    """Per-gateway high-water marks for gateway.py batches.
+
+    A gateway forwards its log in sequence order and re-sends a batch whenever
+    it misses the reply, so any reading at or below the last stored sequence
+    number is a duplicate. Sequence numbers are claimed when a batch arrives,
+    so a re-send that overlaps the original request is dropped as well.
+    """
+
+    def __init__(self):
+        self.last = None              # gateway_id -> last claimed seq
+        self.duplicates = 0
+        self._lock = threading.Lock()
+
+    def load(self, storage):
+        if self.last is None:
+            self.last = {row['gateway_id']: row['last_seq']
+                         for row in storage.query('SELECT gateway_id, last_seq FROM gateway_progress')}
+
+    def claim(self, storage, readings):
+        """Readings not stored yet, plus {gateway_id: previous seq} for settle()"""
+        with self._lock:
+            self.load(storage)
+            fresh = []
+            previous = {}
+            for reading in readings:
+                gateway_id = reading.get('gateway_id')
+                if gateway_id is None:
+                    fresh.append(reading)
+                    continue
+                seq = int(reading.get('gateway_seq', 0))
+                last = self.last.get(gateway_id, 0)
+                if seq <= last:
+                    self.duplicates += 1
+                    continue
+                previous.setdefault(gateway_id, last)
+                self.last[gateway_id] = seq
+                fresh.append(reading)
+            return fresh, previous
+
+    def settle(self, storage, readings, stored, previous):
+        """Persist the marks, or roll them back if the batch wasn't stored
+
+        The batch is written in one transaction, so it is either all stored
+        or not at all and no reading can be stored twice.
+        """
+        with self._lock:
+            for gateway_id, last in previous.items():
+                if stored:
+                    last = max(int(reading['gateway_seq']) for reading in readings
+                               if reading.get('gateway_id') == gateway_id)
+                self.last[gateway_id] = last
+                storage.execute('''
+                    INSERT INTO gateway_progress (gateway_id, last_seq, updated)
+                    VALUES (?, ?, CURRENT_TIMESTAMP)
+                    ON CONFLICT(gateway_id) DO UPDATE SET
+                        last_seq = excluded.last_seq, updated = excluded.updated
+                ''', (gateway_id, last))
+
+
+gateway_progress = GatewayProgress()
+
+
+def valid_gateway_fields(reading):
+    """True unless a gateway reading has a malformed gateway_id/gateway_seq"""
+    if reading.get('gateway_id') is None:
+        return True
+    seq = reading.get('gateway_seq')
+    return (isinstance(reading['gateway_id'], str) and isinstance(seq, int)
+            and not isinstance(seq, bool) and seq > 0)
+
+
+def request_payload():
+    """JSON body of the current request, gunzipped if the sender compressed it"""
+    if request.headers.get('Content-Encoding', '').lower() != 'gzip':
+        return request.get_json()
+    decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    body = decoder.decompress(request.get_data(), MAX_DECODED_BYTES)
+    if decoder.unconsumed_tail:
+        raise ValueError('Decompressed body too large')
+    return json.loads(body)
+
+
+def format_reading(row):
+    """Format a sensor_data row to match frontend expectations"""
+    return {
+        'id': row['id'],
+        'node_id': row['node_id'],
+        'timestamp': row['timestamp'],
+        'MQ4': row['mq4'],
+        'MQ5': row['mq5'],
+        'MQ135': row['mq135'],
+        'MQ7': row['mq7'],
+        'Temperature': row['temperature'],
+        'Humidity': row['humidity'],
+        'Sound': row['sound'],
+        'Fire': row['fire'],
+        'Vibration': row['vibration'],
+        'Pressure': row['pressure'],
+        'Acceleration': {
+            'x': row['acceleration_x'],
+            'y': row['acceleration_y'],
+            'z': row['acceleration_z']
+        },
+        'AnomalyScore': row['anomaly_score'],
+        'AnomalyFlags': row['anomaly_flags'].split(',') if row['anomaly_flags'] else []
+    }
+
+
+@nodes_bp.route('/data', methods=['POST'])
+def receive_data():
+    if not request.is_json:
+        return jsonify({"status": "error", "message": "Invalid data format: JSON required."}), 400
+
+    try:
+        data = request_payload()
+    except (OSError, ValueError, zlib.error) as e:
+        return jsonify({"status": "error", "message": f"Invalid data format: {e}"}), 400
+
+    # The ranging rig posts {front, right, back, left} to /data as well
+    if isinstance(data, dict) and ranging.is_ranging_payload(data):
+        return ranging.receive_reading(data)
+
+    # Nodes told to batch post a list of readings, each with its age in ms
+    readings = data if isinstance(data, list) else [data]
+    if not readings or not all(isinstance(reading, dict) for reading in readings):
+        return jsonify({"status": "error", "message": "Invalid data format: a reading object or a list of them is required."}), 400
+    if not all(valid_gateway_fields(reading) for reading in readings):
+        return jsonify({"status": "error", "message": "Invalid data format: gateway_id must be a string and gateway_seq a positive integer."}), 400
+
+    # Capture time comes from age_ms alone; never trust one a sender supplied
+    for reading in readings:
+        reading.pop('captured_at', None)
+
+    # Log which node sent the data
+    print(f"Received {len(readings)} reading(s) from {readings[-1].get('node_id', 'Unknown Node')}:")
+    print(data)
+
+    hazard = max(sampling.node_hazard(reading.get('node_id', 'unknown'), reading) for reading in readings)
+    retry_after = sampling.controller.admit(hazard, len(readings))
+    if retry_after is not None:
+        advice = sampling.advise_reading(readings[-1])
+        response = jsonify({"status": "error", "message": "Ingest budget exceeded, slow down", **advice})
+        response.headers['Retry-After'] = str(max(1, round(retry_after)))
+        return response, 429
+
+    # Gateway batches carry sequence numbers; drop what an earlier attempt stored
+    storage = get_storage()
+    fresh, previous = gateway_progress.claim(storage, readings)
+    stored = ingest_readings(storage, fresh) if fresh else True
+    if previous:
+        gateway_progress.settle(storage, fresh, stored, previous)
+
+    advice = sampling.advise_reading(readings[-1])
+    reply = {"duplicates": len(readings) - len(fresh)} if previous or len(fresh) < len(readings) else {}
+    # A gateway relays for several nodes, so it gets every node's advice
+    if len({reading.get('node_id') for reading in readings}) > 1:
+        latest = {reading.get('node_id', 'unknown'): reading for reading in readings}
+        reply['nodes'] = {node_id: sampling.advise_reading(reading) for node_id, reading in latest.items()}
+
+    if stored:
+        print("Data stored successfully in database")
+        return jsonify({"status": "success", "message": "Data received and stored successfully!", **advice, **reply}), 200
+    else:
+        print("Failed to store data in database")
+        return jsonify({"status": "error", "message": "Data received but failed to store", **advice, **reply}), 500
+
+
+@nodes_bp.route('/data', methods=['GET'])
+def get_data():
+    """Retrieve stored sensor data for a specific node with optional limit.
+
+    With ?since=/&until= (UTC, e.g. 2025-09-01 or 2025-09-01 12:00:00) the
+    range is served from the live table and the cold archive alike.
+    """
+    node_id = request.args.get('node')
+    if not node_id:
+        return jsonify({"status": "error", "message": "A 'node' query parameter is required (e.g., /data?node=node_1)"}), 400
+    since = request.args.get('since')
+    until = request.args.get('until')
+
+    # Get limit parameter with default
+    ranged = bool(since or until)
+    limit = request.args.get('limit', 1000 if ranged else 50)
+    try:
+        limit = int(limit)
+        limit = min(max(limit, 1), 10000 if ranged else 100)  # Clamp between 1 and 100 (10000 for ranges)
+    except ValueError:
+        limit = 50
+
+    try:
+        rows = archive.history(get_storage(), archive.get_archive(), node_id, since, until, limit)
+        data = [format_reading(row) for row in rows]
+        return jsonify({"status": "success", "data": data}), 200
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@nodes_bp.route('/api/export', methods=['GET'])
+def export_data():
+    """Stream a node's readings oldest first: /api/export?node=node_1&since=2025-09-01&until=2025-10-01
+
+    ?channels=mq4,temperature limits the columns; ?format=csv (default) or ndjson.
+    """
+    node_id = request.args.get('node')
+    if not node_id:
+        return jsonify({"status": "error", "message": "A 'node' query parameter is required (e.g., /api/export?node=node_1)"}), 400
+    storage = get_storage()
+    available = archive.live_columns(storage)
+    columns = ['id', 'node_id', 'timestamp']
+    if request.args.get('channels'):
+        requested = [c.strip().lower() for c in request.args['channels'].split(',') if c.strip()]
+        unknown = [c for c in requested if c not in available]
+        if unknown:
+            return jsonify({"status": "error", "message": f"Unknown channels: {', '.join(unknown)}"}), 400
+        columns += [c for c in requested if c not in columns]
+    else:
+        columns += [c for c in available if c not in columns]
+    fmt = request.args.get('format', 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({"status": "error", "message": "format must be csv or ndjson"}), 400
+
+    # Checked up front: once streaming has started an error can only truncate the file
+    try:
+        archive.require_attached(storage, request.args.get('since'), request.args.get('until'))
+    except PartitionsNotAttached as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+    rows = archive.iter_range(storage, archive.get_archive(), node_id,
+                              request.args.get('since'), request.args.get('until'), columns)
+
+    def generate():
+        if fmt == 'ndjson':
+            for row in rows:
+                yield json.dumps({c: row[c] for c in columns}) + '\n'
+            return
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator='\n')
+        writer.writerow(columns)
+        for count, row in enumerate(rows, 1):
+            writer.writerow([row[c] for c in columns])
+            if count % 1000 == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    filename = f"{node_id}.{fmt}"
+    return Response(stream_with_context(generate()),
+                    mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
+
+
+@nodes_bp.route('/api/latest_data_all_nodes', methods=['GET'])
+def get_latest_data_all_nodes():
+    """Get the single most recent data entry for each node."""
+    try:
+        # This advanced SQL query gets the latest record for each node_id
+        rows = get_storage().query('''
+            SELECT t1.*
+            FROM sensor_data t1
+            INNER JOIN (
+                SELECT node_id, MAX(timestamp) as max_timestamp
+                FROM sensor_data
+                GROUP BY node_id
+            ) t2 ON t1.node_id = t2.node_id AND t1.timestamp = t2.max_timestamp;
+        ''')
+
+        # Create a dictionary where keys are node_ids
+        data = {row['node_id']: dict(row) for row in rows}
+        return jsonify({"status": "success", "data": data}), 200
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@nodes_bp.route('/')
+def dashboard():
+    """Serve the dashboard HTML page"""
+    return assets.render_page('index.html')
+
+
+@nodes_bp.route('/stats')
+def get_stats():
+    """Get basic statistics about the stored data"""
+    try:
+        storage = get_storage()
+        row = storage.query_one('''
+            SELECT COUNT(*) as total,
+                   AVG(temperature) as avg_temp,
+                   AVG(humidity) as avg_humidity,
+                   MAX(timestamp) as latest
+            FROM sensor_data
+        ''')
+
+        stats = {
+            'total_records': row['total'],
+            'average_temperature': round(row['avg_temp'] or 0, 1),
+            'average_humidity': round(row['avg_humidity'] or 0, 1),
+            'latest_timestamp': row['latest'],
+            'storage': storage.stats(),
+            'sampling': sampling.controller.stats(),
+            'gateway_duplicates': gateway_progress.duplicates
+        }
+
+        return jsonify({"status": "success", "stats": stats}), 200
+
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
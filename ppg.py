@@ -0,0 +1,238 @@
+"""
+Raw PPG ingest and heart rate / SpO2 estimation for ResQSense
+The watch streams raw MAX30102 red/IR samples in compact binary batches instead
+of running the Maxim algorithm on the microcontroller. The server keeps a
+rolling window per wearer and estimates heart rate and SpO2 for all wearers in
+one batched NumPy pass: FFT band-pass, peak detection and ratio-of-ratios.
+
+Batch format (little-endian):
+    header   4s magic b'PPG1', B version, B id_len, H sample_rate_hz,
+             H sample_count, I first_sample_millis
+    watch id id_len bytes of UTF-8
+    samples  sample_count x (uint32 red, uint32 ir), interleaved
+"""
+
+import struct
+import threading
+
+import numpy as np
+
+MAGIC = b'PPG1'
+VERSION = 1
+HEADER = struct.Struct('<4sBBHHI')
+
+# Below this IR DC level there is no finger/wrist on the sensor
+MIN_IR_DC = 50000
+
+# A batch starting further than this from where the previous one ended means
+# samples were lost (or the watch restarted); the window starts over there.
+# first_sample_millis is stamped when the watch drains the MAX30102 FIFO, and
+# samples can wait in it (32 deep, 320 ms at 100 Hz) while the watch is busy
+# posting, so stamps jitter by up to the FIFO depth without any sample lost.
+MAX_GAP_MS = 400
+
+
+class PPGFormatError(ValueError):
+    """Raised when an uploaded batch cannot be decoded"""
+
+
+def decode_batch(payload):
+    """Decode a binary batch into (watch_id, sample_rate, t0_ms, samples[n, 2])"""
+    if len(payload) < HEADER.size:
+        raise PPGFormatError('Batch shorter than header')
+    magic, version, id_len, sample_rate, count, t0_ms = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION:
+        raise PPGFormatError('Unknown batch magic/version')
+    if sample_rate == 0:
+        raise PPGFormatError('Sample rate must be positive')
+
+    offset = HEADER.size + id_len
+    expected = offset + count * 8
+    if len(payload) != expected:
+        raise PPGFormatError(f'Expected {expected} bytes, got {len(payload)}')
+
+    watch_id = payload[HEADER.size:offset].decode('utf-8', errors='replace')
+    samples = np.frombuffer(payload, dtype='<u4', count=count * 2, offset=offset)
+    return watch_id, sample_rate, t0_ms, samples.reshape(count, 2)
+
+
+def encode_batch(watch_id, sample_rate, t0_ms, red, ir):
+    """Build a binary batch (used by simulators and tests of the ingest path)"""
+    watch_id = watch_id.encode('utf-8')
+    samples = np.empty((len(red), 2), dtype='<u4')
+    samples[:, 0] = red
+    samples[:, 1] = ir
+    header = HEADER.pack(MAGIC, VERSION, len(watch_id), sample_rate, len(red), t0_ms)
+    return header + watch_id + samples.tobytes()
+
+
+def bandpass(signals, fs, low=0.5, high=4.0):
+    """Zero-phase FFT band-pass along the last axis of a 2-D array"""
+    n = signals.shape[-1]
+    spectrum = np.fft.rfft(signals - signals.mean(axis=-1, keepdims=True), axis=-1)
+    freqs = np.fft.rfftfreq(n, d=1.0 / fs)
+    spectrum[..., (freqs < low) | (freqs > high)] = 0
+    return np.fft.irfft(spectrum, n=n, axis=-1)
+
+
+def peak_mask(filtered, fs, min_interval=0.3):
+    """Boolean mask of beat peaks for each row of a filtered 2-D array
+
+    Candidates are local maxima above 0.3 standard deviations; a peak is kept
+    only if it is the largest sample within +/- min_interval/2 seconds, which
+    enforces a refractory period without a per-peak loop.
+    """
+    threshold = 0.3 * filtered.std(axis=-1, keepdims=True)
+    local_max = np.zeros_like(filtered, dtype=bool)
+    local_max[:, 1:-1] = ((filtered[:, 1:-1] > filtered[:, :-2])
+                          & (filtered[:, 1:-1] >= filtered[:, 2:])
+                          & (filtered[:, 1:-1] > threshold))
+
+    half = max(int(min_interval * fs / 2), 1)
+    padded = np.pad(filtered, ((0, 0), (half, half)), mode='constant',
+                    constant_values=-np.inf)
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * half + 1, axis=-1)
+    return local_max & (filtered >= windows.max(axis=-1))
+
+
+def estimate(red, ir, fs):
+    """Estimate heart rate and SpO2 for a batch of equal-length windows
+
+    red and ir are arrays of shape (wearers, samples). Returns
+    (heart_rate, spo2, valid) arrays of shape (wearers,); invalid entries are -1.
+    """
+    red = np.asarray(red, dtype=float)
+    ir = np.asarray(ir, dtype=float)
+    wearers = red.shape[0]
+    heart_rate = np.full(wearers, -1.0)
+    spo2 = np.full(wearers, -1.0)
+
+    dc_red = red.mean(axis=-1)
+    dc_ir = ir.mean(axis=-1)
+    ac_red = bandpass(red, fs)
+    ac_ir = bandpass(ir, fs)
+
+    # Heart rate from median beat interval on the IR channel
+    peaks = peak_mask(ac_ir, fs)
+    for i in range(wearers):
+        beats = np.flatnonzero(peaks[i])
+        if beats.size >= 3:
+            heart_rate[i] = 60.0 * fs / np.median(np.diff(beats))
+
+    # SpO2 from ratio of ratios using RMS of the pulsatile component
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = ((ac_red.std(axis=-1) / dc_red) / (ac_ir.std(axis=-1) / dc_ir))
+    # Maxim reference calibration curve
+    curve = -45.060 * ratio ** 2 + 30.354 * ratio + 94.845
+    ratio_ok = np.isfinite(ratio) & (ratio > 0.2) & (ratio < 1.8)
+    spo2[ratio_ok] = np.clip(curve[ratio_ok], 70, 100)
+
+    contact = dc_ir > MIN_IR_DC
+    hr_ok = contact & (heart_rate >= 30) & (heart_rate <= 220)
+    heart_rate[~hr_ok] = -1
+    spo2[~contact] = -1
+    return heart_rate, spo2, hr_ok & (spo2 > 0)
+
+
+class PPGEstimator:
+    """Rolling raw windows per wearer, estimated together on a fixed interval
+
+    A window only ever holds contiguous samples: when a batch's first_sample_ms
+    doesn't follow on from the previous batch, the window is restarted rather
+    than splicing the two together, which would put a false beat at the seam.
+    """
+
+    def __init__(self, window_s=8.0, interval_s=1.0, max_gap_ms=MAX_GAP_MS):
+        self.window_s = window_s
+        self.interval_s = interval_s
+        self.max_gap_ms = max_gap_ms
+        self.dropped = {}             # watch_id -> samples lost in gaps so far
+        self.resets = {}              # watch_id -> windows restarted
+        self._buffers = {}
+        self._next_ms = {}
+        self._latest = {}
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def add_samples(self, watch_id, sample_rate, t0_ms, samples):
+        """Append a decoded batch to the wearer's rolling window
+
+        Returns the number of samples missing between this batch and the
+        previous one (0 when they are contiguous).
+        """
+        size = int(self.window_s * sample_rate)
+        dropped = 0
+        with self._lock:
+            rate, window = self._buffers.get(watch_id, (sample_rate, None))
+            expected = self._next_ms.get(watch_id)
+            if window is not None and expected is not None:
+                # millis() wraps every ~49 days; take the gap modulo 2**32, signed
+                gap_ms = (t0_ms - expected + 2 ** 31) % 2 ** 32 - 2 ** 31
+                if rate != sample_rate or abs(gap_ms) > self.max_gap_ms:
+                    dropped = max(round(gap_ms * rate / 1000.0), 0) if rate == sample_rate else 0
+                    self.dropped[watch_id] = self.dropped.get(watch_id, 0) + dropped
+                    self.resets[watch_id] = self.resets.get(watch_id, 0) + 1
+                    window = None
+            if window is None or rate != sample_rate:
+                window = np.empty((0, 2), dtype=np.uint32)
+            window = np.concatenate((window, samples))[-size:]
+            self._buffers[watch_id] = (sample_rate, window)
+            self._next_ms[watch_id] = (t0_ms + round(len(samples) * 1000.0 / sample_rate)) % 2 ** 32
+            self._dirty.add(watch_id)
+        return dropped
+
+    def run_once(self):
+        """Estimate vitals for every wearer with new data
+
+        Wearers whose windows share a sample rate and length are stacked into
+        one array, so the FFT and peak search run once per group.
+        """
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            snapshot = {watch_id: self._buffers[watch_id] for watch_id in dirty}
+
+        groups = {}
+        for watch_id, (rate, window) in snapshot.items():
+            if len(window) >= int(self.window_s * rate):
+                groups.setdefault((rate, len(window)), []).append((watch_id, window))
+
+        results = {}
+        for (rate, _), members in groups.items():
+            stacked = np.stack([window for _, window in members])
+            heart_rate, spo2, valid = estimate(stacked[:, :, 0], stacked[:, :, 1], rate)
+            for i, (watch_id, _) in enumerate(members):
+                results[watch_id] = (round(float(heart_rate[i])), round(float(spo2[i])),
+                                     bool(valid[i]))
+        with self._lock:
+            self._latest.update(results)
+        return results
+
+    def latest(self, watch_id):
+        """Most recent (heart_rate, spo2, valid) for a wearer, or None"""
+        with self._lock:
+            return self._latest.get(watch_id)
+
+    def start(self, on_results):
+        """Run estimation in a background thread, passing results to on_results"""
+        with self._thread_lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, args=(on_results,),
+                                            name='ppg-estimator', daemon=True)
+            self._thread.start()
+
+    def _loop(self, on_results):
+        while not self._stop.wait(self.interval_s):
+            results = self.run_once()
+            if results:
+                try:
+                    on_results(results)
+                except Exception as e:
+                    print(f"Error publishing PPG estimates: {e}")
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,334 @@
+"""
+On-demand profiling for ResQSense
+Off by default and switched at runtime through /admin/profiling. While
+enabled, a share of requests is profiled (cProfile, or a stack sampler
+that is cheaper and sees time spent blocked), requests slower than a
+threshold are kept with every SQL statement they issued (EXPLAIN QUERY PLAN
+is added when they are viewed), and /admin/profiling/stacks dumps collapsed
+stacks for a time window, ready for flamegraph.pl or speedscope. Disabled,
+the request hook returns after one attribute check and the storage engine
+has no tracer.
+
+The admin endpoints need an X-Admin-Token header matching
+RESQSENSE_ADMIN_TOKEN; without that variable they only answer localhost.
+
+    curl -X POST localhost:5000/admin/profiling -H 'Content-Type: application/json' \\
+         -d '{"enabled": true, "mode": "stack", "sample_rate": 0.05, "slow_ms": 250}'
+    curl localhost:5000/admin/profiling/slow
+    curl 'localhost:5000/admin/profiling/stacks?seconds=10' > stacks.txt
+"""
+
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+
+from flask import Blueprint, Response, jsonify, request
+
+from storage import timestamp_now
+
+MODES = ('cprofile', 'stack')
+MAX_STATEMENTS = 200     # SQL statements kept per captured request
+MAX_STACK_SECONDS = 60
+
+profiling_bp = Blueprint('profiling', __name__, url_prefix='/admin/profiling')
+
+
+def collapse(frame):
+    """One thread's stack, root first, in collapsed (flamegraph) form"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}")
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def sample_stacks(seconds, interval, skip=()):
+    """Sample every thread's stack for a wall-clock window; returns Counter of collapsed stacks"""
+    stacks = Counter()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        for ident, frame in sys._current_frames().items():
+            if ident not in skip:
+                stacks[collapse(frame)] += 1
+        time.sleep(interval)
+    return stacks
+
+
+def format_stacks(stacks):
+    return ''.join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def plain(params):
+    """SQL parameters as JSON-safe values"""
+    if isinstance(params, dict):
+        return {key: plain([value])[0] for key, value in params.items()}
+    return [p if p is None or isinstance(p, (int, float, str)) else repr(p) for p in params]
+
+
+class Profiler:
+    """Sampled request profiling plus slow-request capture"""
+
+    def __init__(self, sample_rate=0.01, mode='cprofile', slow_ms=500, interval_ms=5, keep=50):
+        self.enabled = False
+        self.sample_rate = sample_rate
+        self.mode = mode
+        self.slow_ms = slow_ms
+        self.interval_ms = interval_ms
+        self.storage = None
+
+        self.slow = deque(maxlen=keep)
+        self.requests_seen = 0
+        self.requests_sampled = 0
+        self.samples_skipped = 0      # cProfile already busy on another request
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cprofile_lock = threading.Lock()   # One cProfile at a time (enforced from Python 3.12)
+        self._profile_stats = None
+        self._stacks = Counter()
+        self._active = {}             # Thread id -> endpoint, for requests the stack sampler follows
+        self._sampler = None
+
+    def init_app(self, app, storage):
+        self.storage = storage
+        app.extensions['profiler'] = self
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+        app.register_blueprint(profiling_bp)
+
+    def configure(self, enabled=None, sample_rate=None, mode=None, slow_ms=None, interval_ms=None):
+        """Change settings at runtime; raises ValueError on bad values"""
+        if mode is not None and mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        with self._lock:
+            if sample_rate is not None:
+                self.sample_rate = min(max(float(sample_rate), 0.0), 1.0)
+            if slow_ms is not None:
+                self.slow_ms = float(slow_ms)
+            if interval_ms is not None:
+                self.interval_ms = min(max(float(interval_ms), 1.0), 100.0)
+            if mode is not None:
+                self.mode = mode
+            if enabled is not None:
+                self.enabled = bool(enabled)
+            # Statements are only worth tracing while slow requests are being captured
+            if self.storage is not None:
+                self.storage.tracer = self._trace if self.enabled and self.slow_ms > 0 else None
+
+    def reset(self):
+        with self._lock:
+            self.slow.clear()
+            self.requests_seen = self.requests_sampled = self.samples_skipped = 0
+            self._profile_stats = None
+            self._stacks = Counter()
+
+    # --- Request hooks ---
+
+    def _before(self):
+        if not self.enabled or request.blueprint == 'profiling':
+            return
+        local = self._local
+        local.started = time.perf_counter()
+        local.statements = [] if self.slow_ms > 0 else None
+        local.status = 500
+        local.profile = None
+        local.sampled = False
+        self.requests_seen += 1
+        if random.random() >= self.sample_rate:
+            return
+        if self.mode == 'cprofile':
+            if not self._cprofile_lock.acquire(blocking=False):
+                self.samples_skipped += 1
+                return
+            local.profile = cProfile.Profile()
+            local.profile.enable()
+        else:
+            self._active[threading.get_ident()] = request.endpoint or request.path
+            self._ensure_sampler()
+        local.sampled = True
+        self.requests_sampled += 1
+
+    def _after(self, response):
+        if getattr(self._local, 'started', None) is not None:
+            self._local.status = response.status_code
+        return response
+
+    def _teardown(self, exc):
+        local = self._local
+        started = getattr(local, 'started', None)
+        if started is None:
+            return
+        local.started = None
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        statements, local.statements = local.statements, None
+
+        if local.profile is not None:
+            local.profile.disable()
+            self._cprofile_lock.release()
+            with self._lock:
+                if self._profile_stats is None:
+                    self._profile_stats = pstats.Stats(local.profile)
+                else:
+                    self._profile_stats.add(local.profile)
+            local.profile = None
+        self._active.pop(threading.get_ident(), None)
+
+        if statements is not None and elapsed_ms >= self.slow_ms:
+            self.slow.append({
+                'at': timestamp_now(),
+                'method': request.method,
+                'path': request.full_path.rstrip('?'),
+                'endpoint': request.endpoint,
+                'status': local.status,
+                'elapsed_ms': round(elapsed_ms, 2),
+                'sampled': local.sampled,
+                'statements': statements,
+            })
+
+    def _trace(self, sql, params, seconds):
+        statements = getattr(self._local, 'statements', None)
+        if statements is not None and len(statements) < MAX_STATEMENTS:
+            statements.append({'sql': ' '.join(sql.split()), 'params': plain(params),
+                               'ms': None if seconds is None else round(seconds * 1000, 3)})
+
+    # --- Stack sampling of profiled requests ---
+
+    def _ensure_sampler(self):
+        with self._lock:
+            if self._sampler is None or not self._sampler.is_alive():
+                self._sampler = threading.Thread(target=self._sample_loop, name='profiler-sampler', daemon=True)
+                self._sampler.start()
+
+    def _sample_loop(self):
+        while self.enabled and self.mode == 'stack':
+            if self._active:
+                frames = sys._current_frames()
+                with self._lock:
+                    for ident, endpoint in list(self._active.items()):
+                        frame = frames.get(ident)
+                        if frame is not None:
+                            self._stacks[f"{endpoint};{collapse(frame)}"] += 1
+            time.sleep(self.interval_ms / 1000.0)
+
+    # --- Reports ---
+
+    def explain(self, capture):
+        """Add EXPLAIN QUERY PLAN to a captured request's reads (once)"""
+        for statement in capture['statements']:
+            if 'plan' in statement or statement['ms'] is None:
+                continue
+            try:
+                rows = self.storage.query('EXPLAIN QUERY PLAN ' + statement['sql'], statement['params'])
+            except Exception as e:
+                statement['plan'] = [f"unavailable: {e}"]
+                continue
+            depth = {0: -1}
+            plan = []
+            for row in rows:
+                depth[row['id']] = depth.get(row['parent'], -1) + 1
+                plan.append('  ' * depth[row['id']] + row['detail'])
+            statement['plan'] = plan
+        return capture
+
+    def profile_report(self, sort='cumulative', limit=40):
+        with self._lock:
+            if self._profile_stats is None:
+                return ''
+            out = io.StringIO()
+            self._profile_stats.stream = out
+            self._profile_stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def stacks(self):
+        with self._lock:
+            return Counter(self._stacks)
+
+    def status(self):
+        return {
+            'enabled': self.enabled,
+            'mode': self.mode,
+            'sample_rate': self.sample_rate,
+            'slow_ms': self.slow_ms,
+            'interval_ms': self.interval_ms,
+            'requests_seen': self.requests_seen,
+            'requests_sampled': self.requests_sampled,
+            'samples_skipped': self.samples_skipped,
+            'slow_captured': len(self.slow),
+            'stack_samples': sum(self._stacks.values()),
+        }
+
+
+profiler = Profiler()
+
+
+# --- Admin endpoints ---
+
+@profiling_bp.before_request
+def require_admin():
+    token = os.environ.get('RESQSENSE_ADMIN_TOKEN')
+    if token:
+        if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), token):
+            return jsonify({"status": "error", "message": "X-Admin-Token required"}), 403
+    elif request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({"status": "error", "message": "Set RESQSENSE_ADMIN_TOKEN to profile remotely"}), 403
+
+
+@profiling_bp.route('', methods=['GET'])
+def get_status():
+    return jsonify(profiler.status())
+
+
+@profiling_bp.route('', methods=['POST'])
+def update_settings():
+    """Toggle profiling and change its settings without a restart"""
+    settings = request.get_json(silent=True) or {}
+    try:
+        profiler.configure(**{key: settings[key] for key in
+                              ('enabled', 'sample_rate', 'mode', 'slow_ms', 'interval_ms') if key in settings})
+    except (TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    return jsonify(profiler.status())
+
+
+@profiling_bp.route('', methods=['DELETE'])
+def reset():
+    profiler.reset()
+    return jsonify({"status": "success", "message": "Profiling data cleared"})
+
+
+@profiling_bp.route('/slow')
+def slow_requests():
+    """Captured slow requests, newest first, with their SQL and query plans"""
+    return jsonify([profiler.explain(capture) for capture in reversed(list(profiler.slow))])
+
+
+@profiling_bp.route('/profile')
+def profile_report():
+    """Aggregated cProfile statistics of the sampled requests"""
+    sort = request.args.get('sort', 'cumulative')
+    try:
+        report = profiler.profile_report(sort, request.args.get('limit', 40, type=int))
+    except KeyError:
+        return jsonify({"status": "error", "message": f"Unknown sort key: {sort}"}), 400
+    return Response(report or 'No cProfile samples yet\n', mimetype='text/plain')
+
+
+@profiling_bp.route('/stacks')
+def stacks():
+    """Collapsed stacks: of every thread for ?seconds=N, else of the sampled requests"""
+    seconds = request.args.get('seconds', type=float)
+    if seconds is None:
+        return Response(format_stacks(profiler.stacks()), mimetype='text/plain')
+    seconds = min(max(seconds, 0.1), MAX_STACK_SECONDS)
+    interval = request.args.get('interval_ms', profiler.interval_ms, type=float)
+    collected = sample_stacks(seconds, min(max(interval, 1.0), 100.0) / 1000.0, skip={threading.get_ident()})
+    return Response(format_stacks(collected), mimetype='text/plain')
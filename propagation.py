@@ -0,0 +1,285 @@
+"""
+Cross-node gas propagation analysis for ResQSense
+Estimates which way a methane (MQ4) or CO (MQ7) front is moving through the
+mine, and how fast, from lagged cross-correlation between node histories.
+
+Readings are binned onto a shared time grid (one ring buffer per gas and node)
+as they are ingested, so refreshing never re-reads sensor_data. Gaps between
+a node's readings are interpolated before coverage is judged, so nodes that
+report every few seconds are analysed too. The job correlates the rate of
+change rather than the raw levels, which turns a gas-front step into a sharp
+peak. All node pairs are correlated in one
+batched FFT: one rfft per node series, one product per pair, and a single
+irfft over the stacked pairs.
+"""
+
+import json
+import os
+import threading
+import time
+
+import numpy as np
+from flask import Blueprint, request, jsonify
+
+from realtime import socketio
+from storage import get_storage, reading_time, wall_time
+
+propagation_bp = Blueprint('propagation', __name__)
+
+GASES = ('mq4', 'mq7')
+BIN_S = 1.0               # Grid resolution in seconds
+WINDOW_BINS = 300         # Seconds of history correlated
+MAX_LAG_BINS = 90         # Longest delay considered between two nodes
+RATE_BINS = 10            # Rate of change is taken over this many bins to smooth noise
+MIN_COVERAGE = 0.5        # Fraction of the window a node needs to cover to be analysed
+MAX_GAP_S = 20.0          # Longest gap between readings that is interpolated (nodes report every 0.5-10 s)
+MIN_CORRELATION = 0.5     # Weaker peaks are not reported as fronts
+REFRESH_S = 5.0           # Minimum seconds of new data between recomputations
+
+# Node positions in metres along the workings, used to turn lags into speeds.
+# Defaults follow the dashboard map; override with RESQSENSE_NODE_POSITIONS,
+# e.g. '{"node_1": [0, 0], "node_2": [150, -40]}'.
+NODE_POSITIONS = {
+    'node_1': (0.0, 0.0),       # Main shaft, level 1
+    'node_2': (150.0, -40.0),   # East tunnel, level 2
+    'node_3': (-150.0, -80.0),  # West tunnel, level 3
+}
+NODE_POSITIONS.update({node: tuple(pos) for node, pos in
+                       json.loads(os.environ.get('RESQSENSE_NODE_POSITIONS', '{}')).items()})
+
+
+def correlate_pairs(series, max_lag):
+    """Normalised lagged cross-correlation of every row pair.
+
+    `series` is (..., nodes, bins). Returns (pairs_i, pairs_j, lags, coef),
+    where coef has shape (..., pairs, 2 * max_lag + 1) and coef[..., p, k] is
+    the correlation of series[i][t + lags[k]] with series[j][t]. A peak at a
+    positive lag means node j leads node i.
+    """
+    series = series - series.mean(axis=-1, keepdims=True)
+    bins = series.shape[-1]
+    nfft = 1 << int(np.ceil(np.log2(bins + max_lag)))
+    spectra = np.fft.rfft(series, n=nfft, axis=-1)
+
+    pairs_i, pairs_j = np.triu_indices(series.shape[-2], k=1)
+    cross = np.fft.irfft(spectra[..., pairs_i, :] * np.conj(spectra[..., pairs_j, :]),
+                         n=nfft, axis=-1)
+    cross = np.concatenate([cross[..., nfft - max_lag:], cross[..., :max_lag + 1]], axis=-1)
+
+    energy = np.sqrt((series ** 2).sum(axis=-1))
+    norm = energy[..., pairs_i] * energy[..., pairs_j]
+    coef = cross / np.where(norm > 0, norm, np.inf)[..., None]
+    return pairs_i, pairs_j, np.arange(-max_lag, max_lag + 1), coef
+
+
+class PropagationAnalyzer:
+    """Incrementally binned gas history plus cached propagation estimates"""
+
+    def __init__(self, gases=GASES, bin_s=BIN_S, window=WINDOW_BINS,
+                 max_lag=MAX_LAG_BINS, positions=None, capacity=16):
+        self.gases = gases
+        self.bin_s = bin_s
+        self.window = window
+        self.max_lag = max_lag
+        self.positions = NODE_POSITIONS if positions is None else positions
+        self.node_index = {}
+        self.node_ids = []
+        self.sums = np.zeros((len(gases), capacity, window))
+        self.counts = np.zeros((capacity, window), dtype=np.int32)
+        self.head = None            # Absolute index of the newest bin
+        self.loaded = False
+        self.computed_head = None
+        self.cache = {'fronts': [], 'pairs': [], 'nodes': [], 'computed_at': None}
+        self._lock = threading.Lock()
+
+    def _slot(self, node_id):
+        slot = self.node_index.get(node_id)
+        if slot is None:
+            slot = self.node_index[node_id] = len(self.node_ids)
+            self.node_ids.append(node_id)
+            if slot >= self.counts.shape[0]:
+                self.sums = np.concatenate([self.sums, np.zeros_like(self.sums)], axis=1)
+                self.counts = np.concatenate([self.counts, np.zeros_like(self.counts)])
+        return slot
+
+    def _advance(self, bin_index):
+        """Move the ring head forward, clearing the bins it passes over"""
+        if self.head is None:
+            self.head = bin_index
+            return
+        if bin_index <= self.head:
+            return
+        stale = np.arange(self.head + 1, min(bin_index, self.head + self.window) + 1) % self.window
+        self.sums[:, :, stale] = 0.0
+        self.counts[:, stale] = 0
+        self.head = bin_index
+
+    def add_many(self, node_ids, times, values):
+        """Bin readings; `values` is (len(times), len(gases))"""
+        if not len(times):
+            return
+        bins = np.floor(np.asarray(times, dtype=float) / self.bin_s).astype(np.int64)
+        values = np.asarray(values, dtype=float)
+        with self._lock:
+            self._advance(int(bins.max()))
+            keep = bins > self.head - self.window
+            slots = np.array([self._slot(node) for node in node_ids], dtype=np.int64)[keep]
+            cols = bins[keep] % self.window
+            for g in range(len(self.gases)):
+                np.add.at(self.sums[g], (slots, cols), values[keep, g])
+            np.add.at(self.counts, (slots, cols), 1)
+
+    def add(self, node_id, values, now=None):
+        self.add_many([node_id], [wall_time() if now is None else now], [values])
+
+    def load(self, storage, now=None):
+        """Backfill the window from sensor_data (once, on first use)"""
+        now = wall_time() if now is None else now
+        since = time.strftime('%Y-%m-%d %H:%M:%S',
+                              time.gmtime(now - self.window * self.bin_s))
+        rows = storage.query(
+            f"SELECT node_id, timestamp, {', '.join(self.gases)} FROM sensor_data "
+            "WHERE timestamp >= ? ORDER BY timestamp", (since,))
+        self.loaded = True
+        if not rows:
+            return 0
+        times = np.array([row['timestamp'] for row in rows],
+                         dtype='datetime64[ms]').astype(np.int64) / 1000.0
+        values = np.array([[row[gas] or 0 for gas in self.gases] for row in rows], dtype=float)
+        self.add_many([row['node_id'] for row in rows], times, values)
+        return len(rows)
+
+    def _snapshot(self):
+        """Time-ordered per-node means over the window, interpolated across report gaps
+
+        Nodes report every 0.5-10 s, so most 1 s bins of a slow node are
+        empty. A bin counts as covered when it holds a reading or lies in a
+        gap of at most MAX_GAP_S between two readings; those gaps are filled
+        linearly, and the ends of the window hold the nearest reading.
+        """
+        n = len(self.node_ids)
+        positions = np.arange(self.window)
+        order = (np.arange(self.head + 1, self.head + 1 + self.window)) % self.window
+        counts = self.counts[:n, order]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = self.sums[:, :n, order] / counts
+        present = counts > 0
+
+        # Nearest observed bin at or before (prev) and at or after (nxt) every position
+        prev = np.maximum.accumulate(np.where(present, positions, -1), axis=-1)
+        nxt = np.minimum.accumulate(np.where(present, positions, self.window)[:, ::-1], axis=-1)[:, ::-1]
+        inside = (prev >= 0) & (nxt < self.window)
+        covered = present | (inside & ((nxt - prev) * self.bin_s <= MAX_GAP_S))
+        coverage = covered.mean(axis=-1)
+
+        prev = np.where(prev >= 0, prev, nxt).clip(0, self.window - 1)
+        nxt = np.where(nxt < self.window, nxt, prev).clip(0, self.window - 1)
+        before = np.take_along_axis(means, np.broadcast_to(prev, means.shape), axis=-1)
+        after = np.take_along_axis(means, np.broadcast_to(nxt, means.shape), axis=-1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = np.where(nxt > prev, (positions - prev) / (nxt - prev), 0.0)
+        return before + weight * (after - before), coverage
+
+    def analyze(self):
+        """Recompute pairwise lags and fronts for all gases; returns the cache"""
+        with self._lock:
+            if self.head is None or not self.node_ids:
+                return self.cache
+            means, coverage = self._snapshot()
+            head = self.head
+            node_ids = list(self.node_ids)
+
+        usable = np.flatnonzero(coverage >= MIN_COVERAGE)
+        result = {'nodes': [node_ids[k] for k in usable], 'pairs': [], 'fronts': [],
+                  'computed_at': wall_time(), 'bin_s': self.bin_s,
+                  'window_s': self.window * self.bin_s}
+        if usable.size >= 2:
+            levels = means[:, usable]
+            rates = levels[..., RATE_BINS:] - levels[..., :-RATE_BINS]
+            pairs_i, pairs_j, lags, coef = correlate_pairs(rates, self.max_lag)
+            best = coef.argmax(axis=-1)
+            peak = np.take_along_axis(coef, best[..., None], axis=-1)[..., 0]
+            for g, gas in enumerate(self.gases):
+                for p in range(len(pairs_i)):
+                    entry = self._pair_entry(gas, node_ids[usable[pairs_i[p]]],
+                                             node_ids[usable[pairs_j[p]]],
+                                             int(lags[best[g, p]]), float(peak[g, p]))
+                    result['pairs'].append(entry)
+                    if entry['front']:
+                        result['fronts'].append(entry)
+            result['fronts'].sort(key=lambda entry: -entry['correlation'])
+
+        with self._lock:
+            self.cache = result
+            self.computed_head = head
+        return result
+
+    def _pair_entry(self, gas, node_a, node_b, lag, correlation):
+        # Positive lag: node_b leads, so the front travels node_b -> node_a
+        source, target = (node_b, node_a) if lag > 0 else (node_a, node_b)
+        lag_s = abs(lag) * self.bin_s
+        distance = speed = None
+        if source in self.positions and target in self.positions:
+            distance = float(np.hypot(*np.subtract(self.positions[target], self.positions[source])))
+            speed = round(distance / lag_s, 3) if lag_s else None
+        return {
+            'gas': gas, 'from': source, 'to': target,
+            'lag_s': lag_s, 'correlation': round(correlation, 3),
+            'distance_m': distance, 'speed_mps': speed,
+            'front': bool(lag != 0 and correlation >= MIN_CORRELATION),
+        }
+
+    def refresh(self, force=False):
+        """Recompute once the data has moved REFRESH_S past the last estimate
+
+        Paced by reading time rather than the wall clock, so a replay
+        recomputes at the same readings as the original run.
+        """
+        stale = self.head is not None and (
+            self.computed_head is None or (self.head - self.computed_head) * self.bin_s >= REFRESH_S)
+        if force or stale:
+            return self.analyze(), True
+        return self.cache, False
+
+
+analyzer = PropagationAnalyzer()
+
+
+def ensure_loaded(storage):
+    """Backfill the analyzer on first use; returns True if this call loaded it"""
+    if analyzer.loaded:
+        return False
+    analyzer.load(storage)
+    return True
+
+
+def on_reading(storage, data):
+    """Reading listener: bin the gas values and refresh the cached estimate"""
+    # Listeners run after the reading is stored, so a backfill already includes it
+    if not ensure_loaded(storage):
+        try:
+            values = [float(data.get(gas.upper(), 0) or 0) for gas in analyzer.gases]
+        except (TypeError, ValueError):
+            return
+        analyzer.add(data.get('node_id', 'unknown'), values, now=reading_time(data))
+    result, updated = analyzer.refresh()
+    if updated and result['fronts']:
+        socketio.emit('gas_propagation', {'fronts': result['fronts'],
+                                          'computed_at': result['computed_at']})
+
+
+@propagation_bp.route('/api/gas/propagation', methods=['GET'])
+def get_gas_propagation():
+    """Cached propagation estimate; ?gas=mq4 filters, ?refresh=1 forces a recompute"""
+    try:
+        ensure_loaded(get_storage())
+        result, _ = analyzer.refresh(force=request.args.get('refresh') == '1')
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+    gas = request.args.get('gas', '').lower()
+    if gas:
+        result = dict(result,
+                      pairs=[p for p in result['pairs'] if p['gas'] == gas],
+                      fronts=[f for f in result['fronts'] if f['gas'] == gas])
+    return jsonify({"status": "success", "data": result}), 200
@@ -0,0 +1,70 @@
+"""
+Ranging blueprint for ResQSense
+Front/right/back/left distance readings from the ranging rig (formerly the
+standalone `dept_estimation.py` app), rendered by `map.html`.
+"""
+
+from flask import Blueprint, request, jsonify
+
+import assets
+from storage import get_storage, timestamp_now
+
+ranging_bp = Blueprint('ranging', __name__)
+
+DIRECTIONS = ('front', 'right', 'back', 'left')
+
+
+def init_schema(conn):
+    """Create the readings table if it doesn't exist"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS readings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            front INTEGER NOT NULL,
+            right INTEGER NOT NULL,
+            back INTEGER NOT NULL,
+            left INTEGER NOT NULL
+        )
+    ''')
+
+
+def is_ranging_payload(data):
+    """Ranging payloads carry the four distances and no node_id"""
+    return 'node_id' not in data and all(key in data for key in DIRECTIONS)
+
+
+def receive_reading(data):
+    """Store one ranging reading through the shared writer"""
+    print(f"Received: {data}")
+
+    row = {key: data.get(key) for key in DIRECTIONS}
+    row['timestamp'] = timestamp_now()
+    try:
+        get_storage().insert('readings', row).result(timeout=10)
+    except Exception as e:
+        print(f"Error saving ranging reading: {e}")
+        return jsonify({"status": "error", "message": "Failed to save data"}), 500
+    return jsonify({"status": "ok"}), 200
+
+
+# --- API Routes ---
+
+@ranging_bp.route('/ranging/data', methods=['POST'])
+def receive_data():
+    if not request.is_json:
+        return jsonify({"status": "error", "message": "Invalid data format: JSON required."}), 400
+    return receive_reading(request.get_json())
+
+
+# Route to provide the last 20 readings to the frontend
+@ranging_bp.route('/get_data', methods=['GET'])
+def get_data():
+    readings = get_storage().query('SELECT * FROM readings ORDER BY id DESC LIMIT 20')
+    return jsonify([dict(row) for row in readings])
+
+
+# --- Frontend Route ---
+
+@ranging_bp.route('/map')
+def map_view():
+    return assets.render_page('map.html')
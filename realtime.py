@@ -0,0 +1,8 @@
+"""
+Shared Socket.IO instance for ResQSense
+Threading async mode keeps the server runnable on Windows without eventlet/gevent.
+"""
+
+from flask_socketio import SocketIO
+
+socketio = SocketIO(async_mode='threading', cors_allowed_origins='*')
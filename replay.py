@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Deterministic traffic replay for ResQSense
+Streams recorded requests, or historical sensor_data rows, back through the
+ingest path. Replays run in recorded order with the recorded spacing, at real
+time (--speed 1), N times faster (--speed N) or as fast as possible
+(--speed 0). Requests go through the in-process Flask test client (default)
+or over HTTP to a running server (--target).
+
+Recording: start the server with RESQSENSE_RECORD=traffic.jsonl and every
+POST is appended to that file as one JSON object per line:
+
+    {"t": 1760000000.123, "method": "POST", "path": "/data", "json": {...}}
+
+Binary bodies (e.g. /watchdata/ppg) are stored base64 encoded under "body"
+with their "content_type".
+
+    python replay.py traffic.jsonl --speed 10
+    python replay.py --history sensor_data.db --node node_1 --speed 0
+    python replay.py traffic.jsonl --target http://localhost:5000 --concurrency 8
+
+In-process replays write to replay.db (--into) rather than the live database.
+That database, its partitions and its archive are wiped at the start of every
+run and the in-memory analytics start from scratch. The server clock follows
+the recorded time, so readings are stamped and analysed as they were
+originally. A replay with --concurrency 1 therefore stores the same rows every
+time.
+"""
+
+import argparse
+import base64
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+
+# --- Recording ---
+
+def install_recorder(app, path):
+    """Append every POST the app receives to a JSONL recording"""
+    from flask import request
+
+    from nodes import request_payload
+
+    lock = threading.Lock()
+    recording = open(path, 'a', buffering=1)
+
+    @app.before_request
+    def record_request():
+        if request.method != 'POST':
+            return
+        entry = {'t': round(time.time(), 3), 'method': 'POST', 'path': request.full_path.rstrip('?')}
+        if request.is_json:
+            # Gateway batches arrive gzipped; record the decoded readings
+            try:
+                entry['json'] = request_payload()
+            except Exception:
+                entry['json'] = None
+        else:
+            entry['body'] = base64.b64encode(request.get_data()).decode('ascii')
+            entry['content_type'] = request.content_type
+        with lock:
+            recording.write(json.dumps(entry) + '\n')
+
+    return recording
+
+
+# --- Sources: each yields (t, method, path, json, body, content_type) in order ---
+
+def read_recording(path):
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    # Stable sort keeps the recorded order for identical timestamps
+    entries.sort(key=lambda entry: entry.get('t', 0))
+    for entry in entries:
+        body = base64.b64decode(entry['body']) if 'body' in entry else None
+        yield (entry.get('t', 0), entry.get('method', 'POST'), entry['path'],
+               entry.get('json'), body, entry.get('content_type'))
+
+
+def history_payload(row):
+    """Turn a sensor_data row back into the POST /data payload that produced it"""
+    return {
+        'node_id': row['node_id'],
+        'MQ4': row['mq4'], 'MQ5': row['mq5'], 'MQ135': row['mq135'], 'MQ7': row['mq7'],
+        'Temperature': row['temperature'], 'Humidity': row['humidity'],
+        'Sound': row['sound'], 'Fire': row['fire'], 'Vibration': row['vibration'],
+        'Pressure': row['pressure'],
+        'Acceleration': {'x': row['acceleration_x'], 'y': row['acceleration_y'],
+                         'z': row['acceleration_z']},
+    }
+
+
+def parse_timestamp(value):
+    for fmt in ('%Y-%m-%d %H:%M:%S.%f', '%Y-%m-%d %H:%M:%S'):
+        try:
+            return datetime.strptime(value, fmt).replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognized timestamp: {value}")
+
+
+def read_history(db_path, nodes=None, since=None, until=None, limit=None):
+    from storage import MAX_ATTACHED, TablePartitions, partition_directory
+
+    conn = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+    conn.row_factory = sqlite3.Row
+    # Partitioned databases keep readings in side files; read them through the same view
+    if os.path.isdir(partition_directory(db_path)):
+        partitions = TablePartitions('sensor_data', partition_directory(db_path),
+                                     int(os.environ.get('RESQSENSE_PARTITION_DAYS', '1')))
+        keys = partitions.overlapping(partitions.keys, since, until)
+        if len(keys) > MAX_ATTACHED - 1:
+            conn.close()
+            raise ValueError(f"{since or 'start'}..{until or 'end'} spans {len(keys)} partitions; "
+                             f"SQLite attaches at most {MAX_ATTACHED - 1}, narrow --since/--until")
+        partitions.read_layout(conn)
+        partitions.attach_view(conn, keys)
+    sql = 'SELECT * FROM sensor_data WHERE 1=1'
+    params = []
+    if nodes:
+        sql += f" AND node_id IN ({', '.join('?' for _ in nodes)})"
+        params += nodes
+    if since:
+        sql += ' AND timestamp >= ?'
+        params.append(since)
+    if until:
+        sql += ' AND timestamp < ?'
+        params.append(until)
+    sql += ' ORDER BY timestamp, id'
+    if limit:
+        sql += ' LIMIT ?'
+        params.append(limit)
+    try:
+        for row in conn.execute(sql, params):
+            yield parse_timestamp(row['timestamp']), 'POST', '/data', history_payload(row), None, None
+    finally:
+        conn.close()
+
+
+# --- Transports ---
+
+def wipe_database(path):
+    """Delete a SQLite database with its WAL, partitions and archive"""
+    from storage import partition_directory
+
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    for directory in (partition_directory(path), os.path.splitext(path)[0] + '_archive'):
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def reset_state():
+    """Fresh in-memory analytics, so nothing carries over from an earlier run"""
+    import anomaly
+    import nodes
+    import propagation
+    import sampling
+    import seismic
+    import watch
+
+    anomaly.detector = anomaly.AnomalyDetector()
+    seismic.detector = seismic.SeismicDetector()
+    propagation.analyzer = propagation.PropagationAnalyzer()
+    sampling.controller = sampling.SamplingController()
+    nodes.gateway_progress = nodes.GatewayProgress()
+    watch.pipeline = watch.WatchPipeline()
+
+
+class TestClientTransport:
+    """In-process: requests go straight into the Flask app, on a fresh database"""
+
+    def __init__(self, into, unlimited=False):
+        wipe_database(into)
+        os.environ['RESQSENSE_DATABASE'] = into
+        os.environ['RESQSENSE_ARCHIVE'] = os.path.splitext(into)[0] + '_archive'
+        os.environ.setdefault('RESQSENSE_THERMAL_ANALYSIS', '0')
+        import app as server
+        import sampling
+        import storage
+        reset_state()
+        if unlimited:
+            sampling.controller.budget = 1e9
+        server.init_db()
+        self.server = server
+        self.storage = storage
+        self._local = threading.local()
+
+    def send(self, t, method, path, payload, body, content_type):
+        # Rows and analytics see the recorded time, not when the replay runs
+        self.storage.clock = lambda: t
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.server.app.test_client()
+        if payload is not None:
+            response = client.open(path, method=method, json=payload)
+        else:
+            response = client.open(path, method=method, data=body, content_type=content_type)
+        return response.status_code
+
+    def close(self):
+        self.server.storage.flush()
+        self.server.storage.close()
+        self.storage.clock = time.time
+
+
+class HTTPTransport:
+    """Over the network to a running server"""
+
+    def __init__(self, target):
+        import requests
+        self._requests = requests
+        self.base = target.rstrip('/')
+        self._local = threading.local()
+        self._sessions = []
+
+    def send(self, t, method, path, payload, body, content_type):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = self._requests.Session()
+            self._sessions.append(session)
+        if payload is not None:
+            response = session.request(method, self.base + path, json=payload, timeout=10)
+        else:
+            response = session.request(method, self.base + path, data=body, timeout=10,
+                                       headers={'Content-Type': content_type or 'application/octet-stream'})
+        return response.status_code
+
+    def close(self):
+        for session in self._sessions:
+            session.close()
+
+
+# --- Replay ---
+
+def replay(events, transport, speed=1.0, concurrency=1, progress_every=1000):
+    """Send events on their recorded schedule; returns a summary dict
+
+    Events are always dispatched in recorded order. With concurrency > 1 up to
+    that many requests are in flight at once (for throughput runs), so they
+    may complete out of order.
+    """
+    statuses = Counter()
+    latencies = []
+    lock = threading.Lock()
+    slots = threading.BoundedSemaphore(concurrency)
+    pool = ThreadPoolExecutor(max_workers=concurrency) if concurrency > 1 else None
+    first_t = last_t = None
+    started = time.perf_counter()
+    behind = 0.0
+
+    def send(t, method, path, payload, body, content_type):
+        sent = time.perf_counter()
+        try:
+            status = transport.send(t, method, path, payload, body, content_type)
+        except Exception as e:
+            status = type(e).__name__
+        with lock:
+            statuses[status] += 1
+            latencies.append(time.perf_counter() - sent)
+        slots.release()
+
+    for count, (t, method, path, payload, body, content_type) in enumerate(events, 1):
+        if first_t is None:
+            first_t = t
+        last_t = t
+        if speed > 0:
+            due = started + (t - first_t) / speed
+            wait = due - time.perf_counter()
+            if wait > 0:
+                time.sleep(wait)
+            else:
+                behind = max(behind, -wait)
+
+        slots.acquire()
+        if pool:
+            pool.submit(send, t, method, path, payload, body, content_type)
+        else:
+            send(t, method, path, payload, body, content_type)
+
+        if progress_every and count % progress_every == 0:
+            print(f"   ↪ {count} requests, {count / (time.perf_counter() - started):.0f} req/s")
+
+    if pool:
+        pool.shutdown(wait=True)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def percentile(p):
+        return round(latencies[min(int(p * len(latencies)), len(latencies) - 1)] * 1000, 2) if latencies else None
+
+    return {
+        'requests': len(latencies),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_per_s': round(len(latencies) / elapsed, 1) if elapsed > 0 else None,
+        'recorded_span_s': round(last_t - first_t, 3) if latencies else 0,
+        'max_lag_s': round(behind, 3),
+        'latency_ms': {'p50': percentile(0.5), 'p99': percentile(0.99), 'max': percentile(1.0)},
+        'statuses': {str(k): v for k, v in statuses.items()},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded ResQSense traffic or sensor history')
+    parser.add_argument('recording', nargs='?', help='JSONL recording (from RESQSENSE_RECORD)')
+    parser.add_argument('--history', metavar='DB', help='Replay sensor_data rows from this database instead')
+    parser.add_argument('--node', action='append', help='Only replay these node ids (history mode; repeatable)')
+    parser.add_argument('--since', help="History start, e.g. '2025-09-01 12:00:00' (UTC)")
+    parser.add_argument('--until', help='History end (UTC, exclusive)')
+    parser.add_argument('--limit', type=int, help='Replay at most this many events')
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help='1 = real time, N = N times faster, 0 = as fast as possible')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='Requests in flight at once (default 1 keeps completion order too)')
+    parser.add_argument('--target', help='Server URL to replay over HTTP (default: in-process test client)')
+    parser.add_argument('--into', default='replay.db',
+                        help='Database for in-process replays, wiped first (default replay.db)')
+    parser.add_argument('--unlimited', action='store_true',
+                        help='Lift the ingest budget for in-process replays (no 429s)')
+    args = parser.parse_args()
+
+    if bool(args.recording) == bool(args.history):
+        parser.error('give either a recording file or --history DB')
+    protected = {os.path.abspath(path) for path in
+                 (args.history, os.environ.get('RESQSENSE_DATABASE', 'sensor_data.db')) if path}
+    if not args.target and os.path.abspath(args.into) in protected:
+        parser.error(f'--into {args.into} is wiped before replaying; give a scratch database')
+
+    if args.history:
+        events = read_history(args.history, args.node, args.since, args.until, args.limit)
+        source = f"sensor_data in {args.history}"
+    else:
+        events = read_recording(args.recording)
+        if args.limit:
+            events = (event for _, event in zip(range(args.limit), events))
+        source = args.recording
+
+    transport = HTTPTransport(args.target) if args.target else TestClientTransport(args.into, args.unlimited)
+    pace = 'as fast as possible' if args.speed <= 0 else f"{args.speed:g}x"
+    print(f"▶️ Replaying {source} → {args.target or 'in-process app (' + args.into + ')'} at {pace}")
+    try:
+        summary = replay(events, transport, args.speed, max(args.concurrency, 1))
+    except KeyboardInterrupt:
+        print("\n🛑 Replay stopped by user")
+        return
+    finally:
+        transport.close()
+
+    print(f"✅ {summary['requests']} requests in {summary['elapsed_s']}s "
+          f"({summary['throughput_per_s']} req/s, recorded span {summary['recorded_span_s']}s)")
+    print(f"   ⏱️ latency p50={summary['latency_ms']['p50']} ms  p99={summary['latency_ms']['p99']} ms  "
+          f"max lag behind schedule {summary['max_lag_s']}s")
+    print(f"   📊 status codes: {summary['statuses']}")
+
+
+if __name__ == "__main__":
+    main()
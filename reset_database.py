@@ -5,18 +5,33 @@ This script deletes the old database and allows the application to recreate it w
 """
 
 import os
-import sqlite3
+import shutil
 
-DATABASE = 'sensor_data.db'
+from archive import archive_directory
+from storage import database_path, partition_directory
+
+# Same locations the server uses (RESQSENSE_DATABASE / RESQSENSE_ARCHIVE)
+DATABASE = database_path()
+PARTITIONS = partition_directory(DATABASE)   # Per-day sensor_data files (see storage.py)
+ARCHIVE = archive_directory(DATABASE)        # Columnar history of older days (see archive.py)
 
 def reset_database():
-    """Delete the existing database file"""
+    """Delete the existing database file, its WAL side files, its partitions and its archive"""
     try:
         if os.path.exists(DATABASE):
             os.remove(DATABASE)
             print(f"✅ Deleted existing database: {DATABASE}")
         else:
             print(f"ℹ️ Database file {DATABASE} does not exist")
+        for suffix in ('-wal', '-shm'):
+            if os.path.exists(DATABASE + suffix):
+                os.remove(DATABASE + suffix)
+        if os.path.isdir(PARTITIONS):
+            shutil.rmtree(PARTITIONS)
+            print(f"✅ Deleted sensor_data partitions: {PARTITIONS}/")
+        if os.path.isdir(ARCHIVE):
+            shutil.rmtree(ARCHIVE)
+            print(f"✅ Deleted sensor_data archive: {ARCHIVE}/")
         
         print("🔄 Database will be recreated with correct schema when you restart the application")
         print("📝 Run 'python app.py' to restart the server")
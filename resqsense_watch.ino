@@ -4,7 +4,6 @@
 #include <Adafruit_SSD1306.h>
 #include <Adafruit_GFX.h>
 #include "MAX30105.h"
-#include "spo2_algorithm.h"
 #include <ArduinoJson.h>
 #include <ESP8266WiFi.h>
 #include <ESP8266HTTPClient.h>
@@ -15,6 +14,12 @@ const char* ssid = "Dontsmuggle";
 const char* password = "faisal123";
 // Example: "http://192.168.1.100:5000/data"
 const char* serverUrl = "http://10.109.8.52:5000/watchdata";
+// Raw red/IR batches; heart rate and SpO2 are estimated on the server
+const char* ppgServerUrl = "http://10.109.8.52:5000/watchdata/ppg";
+
+// === Wearer Identification ===
+// *** IMPORTANT: Change this for each watch ("watch_2", "watch_3", etc.) ***
+const char* watchId = "watch_1";
 
 
 #define SCREEN_WIDTH 128
@@ -33,15 +38,28 @@ MAX30105 particleSensor;
 #define BUZZER_PIN D5
 #define BUTTON_PIN D3
 
-// --- Buffer for SPO2 calculation ---
-#define SAMPLE_BUFFER 100
-uint32_t irBuffer[SAMPLE_BUFFER];
-uint32_t redBuffer[SAMPLE_BUFFER];
-int32_t bufferLength = SAMPLE_BUFFER;
-int32_t spo2;
-int8_t validSPO2;
-int32_t heartRate;
-int8_t validHeartRate;
+// --- Raw PPG batch (see ppg.py for the wire format) ---
+#define PPG_BATCH 100
+#define PPG_SAMPLE_RATE 100  // particleSensor.setup() default: 400 Hz / 4-sample average
+uint32_t irBuffer[PPG_BATCH];
+uint32_t redBuffer[PPG_BATCH];
+int ppgCount = 0;
+uint32_t ppgFirstSampleMillis = 0;
+uint8_t ppgPacket[16 + 16 + PPG_BATCH * 8];
+
+// --- Latest estimates returned by the server ---
+int32_t spo2 = -1;
+int32_t heartRate = -1;
+bool validSPO2 = false;
+bool validHeartRate = false;
+
+// --- Telemetry timer (accelerometer/button JSON) ---
+unsigned long lastTelemetry = 0;
+const unsigned long telemetryInterval = 500;
+
+// --- Peak |a| since the last telemetry post, so a short impact isn't missed ---
+float peakAccel = 0;
+unsigned long peakMillis = 0;
 
 // --- Buzzer timer ---
 bool buzzerActive = false;
@@ -79,6 +97,49 @@ void setupWiFi() {
 }
 
 
+void putU16(uint8_t* p, uint16_t v) { p[0] = v & 0xFF; p[1] = v >> 8; }
+void putU32(uint8_t* p, uint32_t v) { for (int i = 0; i < 4; i++) p[i] = (v >> (8 * i)) & 0xFF; }
+
+// Send one binary batch of raw samples and pick up the server's latest estimate
+void sendPPGBatch() {
+  if (WiFi.status() != WL_CONNECTED) return;
+
+  size_t idLen = strlen(watchId);
+  if (idLen > 16) idLen = 16;
+  memcpy(ppgPacket, "PPG1", 4);
+  ppgPacket[4] = 1;                          // version
+  ppgPacket[5] = idLen;
+  putU16(ppgPacket + 6, PPG_SAMPLE_RATE);
+  putU16(ppgPacket + 8, ppgCount);
+  putU32(ppgPacket + 10, ppgFirstSampleMillis);
+  memcpy(ppgPacket + 14, watchId, idLen);
+  uint8_t* p = ppgPacket + 14 + idLen;
+  for (int i = 0; i < ppgCount; i++) {
+    putU32(p, redBuffer[i]);
+    putU32(p + 4, irBuffer[i]);
+    p += 8;
+  }
+
+  WiFiClient client;
+  HTTPClient http;
+  http.begin(client, ppgServerUrl);
+  http.addHeader("Content-Type", "application/octet-stream");
+  int httpResponseCode = http.POST(ppgPacket, p - ppgPacket);
+  if (httpResponseCode == 201) {
+    StaticJsonDocument<128> reply;
+    if (!deserializeJson(reply, http.getString())) {
+      heartRate = reply["heart_rate"] | -1;
+      spo2 = reply["spo2"] | -1;
+      validHeartRate = heartRate > 0;
+      validSPO2 = spo2 > 0;
+    }
+  } else {
+    Serial.print("Error sending PPG batch: ");
+    Serial.println(httpResponseCode);
+  }
+  http.end();
+}
+
 void setup() {
   Serial.begin(115200);
   Wire.begin(D2, D1); // SDA, SCL
@@ -127,24 +188,28 @@ void loop() {
   // --- Read Accelerometer ---
   sensors_event_t event;
   accel.getEvent(&event);
+  float magnitude = sqrt(event.acceleration.x * event.acceleration.x +
+                         event.acceleration.y * event.acceleration.y +
+                         event.acceleration.z * event.acceleration.z);
+  if (magnitude >= peakAccel) {
+    peakAccel = magnitude;
+    peakMillis = now;
+  }
 
-  // --- Collect MAX30102 Samples (non-blocking) ---
-  for (int i = 0; i < bufferLength; i++) {
-    while (!particleSensor.available()) {
-      particleSensor.check();
-    }
-    redBuffer[i] = particleSensor.getRed();
-    irBuffer[i] = particleSensor.getIR();
+  // --- Drain whatever MAX30102 samples are ready (never waits) ---
+  particleSensor.check();
+  while (particleSensor.available() && ppgCount < PPG_BATCH) {
+    // Samples still queued were taken one sample period apart before now
+    if (ppgCount == 0) ppgFirstSampleMillis = now - (particleSensor.available() - 1) * (1000 / PPG_SAMPLE_RATE);
+    redBuffer[ppgCount] = particleSensor.getFIFORed();
+    irBuffer[ppgCount] = particleSensor.getFIFOIR();
     particleSensor.nextSample();
+    ppgCount++;
+  }
+  if (ppgCount == PPG_BATCH) {
+    sendPPGBatch();
+    ppgCount = 0;
   }
-
-  // --- Run SPO2 Algorithm ---
-  maxim_heart_rate_and_oxygen_saturation(
-    irBuffer, bufferLength,
-    redBuffer,
-    &spo2, &validSPO2,
-    &heartRate, &validHeartRate
-  );
 
   // --- Button handling ---
   if (digitalRead(BUTTON_PIN) == LOW && !buzzerActive) {
@@ -163,38 +228,45 @@ void loop() {
     }
   }
 
-  // --- Create JSON ---
-  StaticJsonDocument<256> doc;
-  doc["accelerometer"]["x"] = event.acceleration.x;
-  doc["accelerometer"]["y"] = event.acceleration.y;
-  doc["accelerometer"]["z"] = event.acceleration.z;
-  doc["heart_rate"] = validHeartRate ? heartRate : -1;
-  doc["spo2"] = validSPO2 ? spo2 : -1;
-  doc["button"] = digitalRead(BUTTON_PIN) == LOW ? 1 : 0;
-  doc["buzzer"] = digitalRead(BUZZER_PIN);
-
-  // --- Send JSON to Server ---
-  if (WiFi.status() == WL_CONNECTED) {
-    String jsonString;
-    serializeJson(doc, jsonString);
-
-    WiFiClient client;
-    HTTPClient http;
-
-    http.begin(client, serverUrl);
-    http.addHeader("Content-Type", "application/json");
-    int httpResponseCode = http.POST(jsonString);
-
-    if (httpResponseCode > 0) {
-      Serial.print("HTTP Response code: ");
-      Serial.println(httpResponseCode);
+  // --- Telemetry JSON is rate-limited now that the loop no longer blocks ---
+  if (now - lastTelemetry >= telemetryInterval) {
+    lastTelemetry = now;
+    StaticJsonDocument<256> doc;
+    doc["watch_id"] = watchId;
+    doc["accelerometer"]["x"] = event.acceleration.x;
+    doc["accelerometer"]["y"] = event.acceleration.y;
+    doc["accelerometer"]["z"] = event.acceleration.z;
+    doc["peak_accel"] = peakAccel;
+    doc["peak_age_ms"] = now - peakMillis;
+    peakAccel = 0;
+    doc["heart_rate"] = -1;  // estimated server-side from the PPG batches
+    doc["spo2"] = -1;
+    doc["button"] = digitalRead(BUTTON_PIN) == LOW ? 1 : 0;
+    doc["buzzer"] = digitalRead(BUZZER_PIN);
+
+    // --- Send JSON to Server ---
+    if (WiFi.status() == WL_CONNECTED) {
+      String jsonString;
+      serializeJson(doc, jsonString);
+
+      WiFiClient client;
+      HTTPClient http;
+
+      http.begin(client, serverUrl);
+      http.addHeader("Content-Type", "application/json");
+      int httpResponseCode = http.POST(jsonString);
+
+      if (httpResponseCode > 0) {
+        Serial.print("HTTP Response code: ");
+        Serial.println(httpResponseCode);
+      } else {
+        Serial.print("Error sending POST: ");
+        Serial.println(httpResponseCode);
+      }
+      http.end();
     } else {
-      Serial.print("Error sending POST: ");
-      Serial.println(httpResponseCode);
+      Serial.println("WiFi Disconnected. Cannot send data.");
     }
-    http.end();
-  } else {
-    Serial.println("WiFi Disconnected. Cannot send data.");
   }
 
 
@@ -0,0 +1,347 @@
+"""
+Hazard-weighted evacuation routing for ResQSense
+Models the tunnels as a graph of junctions, sensor nodes and exits. Moving
+along a tunnel costs its length scaled by the hazard at either end, and the
+hazard is updated live from node readings (gas, fire, vibration) and from
+the fire-risk level of any thermal camera mapped onto a graph node.
+
+The router keeps a shortest-path tree rooted at the exits, so
+GET /route?from=<node>&to=exit only walks next-hop pointers. When a node's
+hazard changes, only the routes that depend on it are repaired: tree
+descendants of edges that got more expensive are invalidated and re-seeded
+from their intact neighbours, cheaper edges seed improvements, and a
+Dijkstra pass bounded to the changed region settles the rest.
+"""
+
+import heapq
+import json
+import math
+import os
+import threading
+import time
+
+from flask import Blueprint, request, jsonify
+
+routing_bp = Blueprint('routing', __name__)
+
+EXIT = 'exit'
+HAZARD_PENALTY = 20.0     # Cost multiplier added per unit of hazard
+HAZARD_STEP = 0.05        # Hazard changes smaller than this don't touch the graph
+
+# (normal, danger) ppm, matching the dashboard safety thresholds
+GAS_THRESHOLDS = {
+    'MQ4': (300, 1000),
+    'MQ5': (400, 800),
+    'MQ135': (350, 700),
+    'MQ7': (200, 400),
+}
+
+# Fire-risk levels from thermal cameras, and which graph node each camera
+# watches, e.g. RESQSENSE_CAMERA_NODES='{"thermal_1": "node_1"}'. Unmapped
+# cameras only record their level changes.
+FIRE_RISK_HAZARD = {'NORMAL': 0.0, 'WARNING': 0.5, 'DANGER': 1.0}
+CAMERA_NODES = json.loads(os.environ.get('RESQSENSE_CAMERA_NODES', '{}'))
+
+# Default layout after the dashboard map: main shaft with node_1, east and
+# west tunnels with node_2/node_3, a surface exit at the shaft top and an
+# escape raise at the end of the east tunnel. Replace with a JSON file of the
+# same shape via RESQSENSE_MINE_GRAPH.
+DEFAULT_GRAPH = {
+    'nodes': {
+        'exit_shaft': {'pos': [0, 0], 'exit': True},
+        'node_1': {'pos': [0, -40]},
+        'junction_l2': {'pos': [0, -80]},
+        'node_2': {'pos': [150, -80]},
+        'exit_east_raise': {'pos': [260, -80], 'exit': True},
+        'junction_l3': {'pos': [0, -120]},
+        'node_3': {'pos': [-150, -120]},
+        'west_face': {'pos': [-260, -120]},
+    },
+    'edges': [
+        ['exit_shaft', 'node_1'],
+        ['node_1', 'junction_l2'],
+        ['junction_l2', 'node_2'],
+        ['node_2', 'exit_east_raise'],
+        ['junction_l2', 'junction_l3'],
+        ['junction_l3', 'node_3'],
+        ['node_3', 'west_face'],
+    ],
+}
+
+
+def load_graph_spec():
+    path = os.environ.get('RESQSENSE_MINE_GRAPH')
+    if path:
+        with open(path) as f:
+            return json.load(f)
+    return DEFAULT_GRAPH
+
+
+def reading_hazard(data):
+    """Hazard in [0, 1] for one node reading; 1 means impassable"""
+    if data.get('Fire'):
+        return 1.0
+    hazard = 0.0
+    for key, (normal, danger) in GAS_THRESHOLDS.items():
+        try:
+            value = float(data.get(key, 0) or 0)
+        except (TypeError, ValueError):
+            continue
+        if value > danger:
+            hazard = max(hazard, 0.9)
+        elif value > normal:
+            hazard = max(hazard, 0.2 + 0.6 * (value - normal) / (danger - normal))
+    if data.get('Vibration'):
+        hazard = max(hazard, 0.3)
+    return hazard
+
+
+class EvacuationRouter:
+    """Dynamic shortest paths from every node to the nearest exit"""
+
+    def __init__(self, spec=None):
+        spec = spec or load_graph_spec()
+        self.pos = {}
+        self.exits = set()
+        self.adj = {}                 # node -> {neighbour: length}
+        self.hazard = {}
+        for node, attrs in spec['nodes'].items():
+            self.pos[node] = tuple(attrs.get('pos', (0, 0)))
+            self.adj[node] = {}
+            self.hazard[node] = 0.0
+            if attrs.get('exit'):
+                self.exits.add(node)
+        for edge in spec['edges']:
+            a, b = edge[0], edge[1]
+            length = edge[2] if len(edge) > 2 else math.dist(self.pos[a], self.pos[b])
+            self.adj[a][b] = self.adj[b][a] = float(length)
+
+        self.dist = {}
+        self.next_hop = {}
+        self.children = {node: set() for node in self.adj}
+        self.repairs = 0
+        self.last_repair_ms = 0.0
+        self._lock = threading.Lock()
+        self._rebuild()
+
+    def cost(self, a, b):
+        """Cost of moving from a to b; entering an impassable node is forbidden,
+        but leaving one is not, so people caught there still get a route out"""
+        if self.hazard[b] >= 1.0:
+            return math.inf
+        hazard = self.hazard[b] if self.hazard[a] >= 1.0 else max(self.hazard[a], self.hazard[b])
+        return self.adj[a][b] * (1.0 + HAZARD_PENALTY * hazard)
+
+    def _set_next(self, node, hop):
+        old = self.next_hop.get(node)
+        if old is not None:
+            self.children[old].discard(node)
+        self.next_hop[node] = hop
+        if hop is not None:
+            self.children[hop].add(node)
+
+    def _rebuild(self):
+        """Full Dijkstra from the exits (startup only)"""
+        for node in self.adj:
+            self.dist[node] = math.inf
+            self._set_next(node, None)
+        heap = []
+        for node in self.exits:
+            self.dist[node] = 0.0
+            heap.append((0.0, node))
+        self._settle(heap)
+
+    def _settle(self, heap):
+        """Dijkstra from a seeded heap, relaxing only improvements"""
+        heapq.heapify(heap)
+        while heap:
+            d, node = heapq.heappop(heap)
+            if d > self.dist[node]:
+                continue
+            for neighbour in self.adj[node]:
+                candidate = d + self.cost(neighbour, node)
+                if candidate < self.dist[neighbour]:
+                    self.dist[neighbour] = candidate
+                    self._set_next(neighbour, node)
+                    heapq.heappush(heap, (candidate, neighbour))
+
+    def _subtree(self, roots):
+        """Nodes whose current route passes through any of `roots`"""
+        affected = set()
+        stack = list(roots)
+        while stack:
+            node = stack.pop()
+            if node in affected:
+                continue
+            affected.add(node)
+            stack.extend(self.children[node])
+        return affected
+
+    def set_hazard(self, node, hazard):
+        """Update one node's hazard and repair the routes it affects.
+
+        Returns True if the graph changed.
+        """
+        with self._lock:
+            if node not in self.adj:
+                return False
+            old = self.hazard[node]
+            if abs(hazard - old) < HAZARD_STEP and (hazard >= 1.0) == (old >= 1.0):
+                return False
+            started = time.perf_counter()
+            old_costs = {n: (self.cost(node, n), self.cost(n, node)) for n in self.adj[node]}
+            self.hazard[node] = hazard
+            self._repair(node, old_costs)
+            self.repairs += 1
+            self.last_repair_ms = (time.perf_counter() - started) * 1000
+            return True
+
+    def _repair(self, node, old_costs):
+        # Edges that got more expensive invalidate the routes using them
+        broken = []
+        for neighbour, (old_out, old_in) in old_costs.items():
+            if self.next_hop.get(node) == neighbour and self.cost(node, neighbour) > old_out:
+                broken.append(node)
+            if self.next_hop.get(neighbour) == node and self.cost(neighbour, node) > old_in:
+                broken.append(neighbour)
+        affected = self._subtree(broken)
+        for n in affected:
+            self.dist[n] = math.inf
+            self._set_next(n, None)
+
+        # Re-seed invalidated nodes from intact neighbours, and the changed
+        # node's neighbourhood from any edge that got cheaper
+        heap = []
+        for n in affected | {node} | set(old_costs):
+            if n in self.exits:
+                continue
+            for neighbour in self.adj[n]:
+                if neighbour in affected:
+                    continue
+                candidate = self.dist[neighbour] + self.cost(n, neighbour)
+                if candidate < self.dist[n]:
+                    self.dist[n] = candidate
+                    self._set_next(n, neighbour)
+            if self.dist[n] < math.inf:
+                heap.append((self.dist[n], n))
+        self._settle(heap)
+
+    def route_to_exit(self, source):
+        with self._lock:
+            if source not in self.adj:
+                return None
+            if self.dist[source] == math.inf:
+                return {'path': [], 'reachable': False}
+            path = [source]
+            while path[-1] not in self.exits:
+                path.append(self.next_hop[path[-1]])
+            return self._describe(path, self.dist[source])
+
+    def route(self, source, target):
+        """Point-to-point query (Dijkstra with early exit)"""
+        with self._lock:
+            if source not in self.adj or target not in self.adj:
+                return None
+            dist = {source: 0.0}
+            prev = {}
+            heap = [(0.0, source)]
+            while heap:
+                d, node = heapq.heappop(heap)
+                if node == target:
+                    break
+                if d > dist[node]:
+                    continue
+                for neighbour in self.adj[node]:
+                    candidate = d + self.cost(node, neighbour)
+                    if candidate < dist.get(neighbour, math.inf):
+                        dist[neighbour] = candidate
+                        prev[neighbour] = node
+                        heapq.heappush(heap, (candidate, neighbour))
+            if dist.get(target, math.inf) == math.inf:
+                return {'path': [], 'reachable': False}
+            path = [target]
+            while path[-1] != source:
+                path.append(prev[path[-1]])
+            return self._describe(path[::-1], dist[target])
+
+    def _describe(self, path, cost):
+        length = sum(self.adj[a][b] for a, b in zip(path, path[1:]))
+        return {
+            'path': path,
+            'reachable': True,
+            'cost': round(cost, 2),
+            'distance_m': round(length, 1),
+            'max_hazard': round(max(self.hazard[n] for n in path), 2),
+            'exit': path[-1],
+        }
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'nodes': {n: {'pos': self.pos[n], 'hazard': round(self.hazard[n], 2),
+                              'exit': n in self.exits,
+                              'dist_to_exit': None if self.dist[n] == math.inf else round(self.dist[n], 2),
+                              'next_hop': self.next_hop[n]}
+                          for n in self.adj},
+                'edges': [[a, b, round(length, 1)] for a in self.adj
+                          for b, length in self.adj[a].items() if a < b],
+                'repairs': self.repairs,
+                'last_repair_ms': round(self.last_repair_ms, 3),
+            }
+
+
+router = EvacuationRouter()
+reading_hazards = {}      # node -> hazard of its latest reading
+fire_hazards = {}         # graph node -> hazard from the thermal camera watching it
+
+
+def node_hazard(node, data=None):
+    """Hazard of `data` (default: the node's latest reading), raised by its camera's fire risk"""
+    hazard = reading_hazards.get(node, 0.0) if data is None else reading_hazard(data)
+    return max(hazard, fire_hazards.get(node, 0.0))
+
+
+def fire_risk_node(event):
+    """Record a fire_risk event's hazard on its camera's graph node; returns the node or None"""
+    node = CAMERA_NODES.get(event.get('source'))
+    if node is None or node not in router.adj:
+        return None
+    fire_hazards[node] = FIRE_RISK_HAZARD.get(event.get('level'), 0.0)
+    return node
+
+
+def on_reading(storage, data):
+    """Reading listener: fold the node's current hazard into the tunnel graph"""
+    node = data.get('node_id', 'unknown')
+    reading_hazards[node] = reading_hazard(data)
+    router.set_hazard(node, node_hazard(node))
+
+
+def on_fire_risk(event):
+    """Fire-risk listener: reroute around a mapped camera's node as its level changes"""
+    node = fire_risk_node(event)
+    if node is not None:
+        router.set_hazard(node, node_hazard(node))
+
+
+@routing_bp.route('/route', methods=['GET'])
+def get_route():
+    """Safest route from a node to the nearest exit (or to another node)"""
+    source = request.args.get('from')
+    target = request.args.get('to', EXIT)
+    if not source:
+        return jsonify({"status": "error", "message": "A 'from' query parameter is required (e.g., /route?from=node_2&to=exit)"}), 400
+
+    if target == EXIT:
+        route = router.route_to_exit(source)
+    else:
+        route = router.route(source, target)
+    if route is None:
+        return jsonify({"status": "error", "message": f"Unknown location: {source if source not in router.adj else target}"}), 404
+    return jsonify({"status": "success", "route": route}), 200
+
+
+@routing_bp.route('/api/route/graph', methods=['GET'])
+def get_route_graph():
+    """Tunnel graph with live hazards and each node's next hop toward an exit"""
+    return jsonify({"status": "success", "data": router.snapshot()}), 200
@@ -1,12 +1,12 @@
 #!/usr/bin/env python3
 """
 Windows-Compatible ResQSense Server
-This script runs the Flask server without WebSocket issues on Windows
+This script runs the consolidated server (nodes, watch and ranging) in one process
 """
 
 import os
 import sys
-from app import app, init_db
+from app import init_db, run
 
 def main():
     """Main server function"""
@@ -18,13 +18,12 @@ def main():
         
         print("\n🚀 Starting ResQSense Server...")
         print("📡 Server will be available at http://localhost:5000")
-        print("⚠️ Note: WebSocket features are temporarily disabled for Windows compatibility")
-        print("📊 HTTP API endpoints are fully functional")
+        print("📊 Node dashboard: /   ⌚ Watch dashboard: /watch   🧭 Ranging map: /map")
         print("\n🔄 Press Ctrl+C to stop the server")
         print("=" * 60)
         
-        # Run Flask app directly (without SocketIO for now)
-        app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
+        # Socket.IO runs in threading mode, so no eventlet/gevent is needed
+        run()
         
     except KeyboardInterrupt:
         print("\n\n🛑 Server stopped by user")
@@ -0,0 +1,131 @@
+"""
+Adaptive sampling control for ResQSense
+Every POST /data reply tells the node how long to wait before its next
+reading (`interval_ms`) and how many readings it may pack into one POST
+(`batch_size`). Quiet nodes are slowed down and batched. Nodes in
+WARNING/DANGER (including fire risk from a thermal camera watching them), or
+whose recent readings the anomaly detector keeps flagging, are sped up.
+
+The total reading rate across all active nodes is held within INGEST_BUDGET
+readings per second. Every node keeps at least one reading per MAX_INTERVAL,
+and the rest of the budget is shared in proportion to urgency. A global token
+bucket enforces the budget for nodes that ignore their advice; hazardous
+readings are always admitted, and can overdraw the bucket by at most one
+burst so they can't lock everyone else out.
+"""
+
+import os
+import threading
+import time
+
+import anomaly
+from routing import node_hazard
+
+MIN_INTERVAL = 0.5        # Seconds between readings for a node in DANGER
+MAX_INTERVAL = 10.0       # Seconds between readings for a quiet node
+MAX_BATCH = 5             # Readings a quiet node may pack into one POST
+ACTIVE_S = 60.0           # Nodes silent for longer no longer hold budget
+BURST_S = 5.0             # Token bucket depth, in seconds of budget
+ALWAYS_ADMIT_HAZARD = 0.2  # node_hazard() at WARNING and above bypasses the bucket
+MOVING_ACTIVITY = 0.5     # Flagged share of recent readings that counts as fully moving
+INGEST_BUDGET = float(os.environ.get('RESQSENSE_INGEST_BUDGET', '50'))   # Readings/s
+
+
+def urgency(hazard, activity):
+    """0 (quiet) .. 1 (sample as fast as allowed)
+
+    `activity` is the share of the node's recent readings that were flagged
+    (0..1). Flags are rare on ordinary data, so one flag speeds a node up a
+    little and a run of them brings it close to the minimum interval.
+    """
+    if hazard >= 0.9:
+        return 1.0
+    moving = min(activity / MOVING_ACTIVITY, 1.0)
+    return max(min(hazard, 0.8), moving)
+
+
+class SamplingController:
+    """Per-node reporting intervals under a global readings/s budget"""
+
+    def __init__(self, budget=INGEST_BUDGET, min_interval=MIN_INTERVAL,
+                 max_interval=MAX_INTERVAL):
+        self.budget = budget
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.nodes = {}           # node_id -> {'seen': t, 'urgency': u}
+        self.tokens = budget * BURST_S
+        self.refilled = time.monotonic()
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def admit(self, hazard, readings=1, now=None):
+        """Take tokens for an incoming POST; returns None or seconds to retry after"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            elapsed = max(now - self.refilled, 0.0)
+            self.tokens = min(self.budget * BURST_S, self.tokens + elapsed * self.budget)
+            self.refilled = now
+            if hazard >= ALWAYS_ADMIT_HAZARD:
+                self.tokens = max(self.tokens - readings, -self.budget * BURST_S)
+                return None
+            if self.tokens < readings:
+                self.rejected += readings
+                return (readings - self.tokens) / self.budget
+            self.tokens -= readings
+            return None
+
+    def desired_interval(self, u):
+        """Log-scale interpolation between max_interval (u=0) and min_interval (u=1)"""
+        return self.max_interval * (self.min_interval / self.max_interval) ** u
+
+    def advise(self, node_id, hazard, activity, now=None):
+        """Record the node's state and return its reporting advice"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            u = urgency(hazard, activity)
+            self.nodes[node_id] = {'seen': now, 'urgency': u}
+            interval = self._allocate(now)[node_id]
+        quiet = u == 0.0 and interval >= self.max_interval
+        return {'interval_ms': int(round(interval * 1000)),
+                'batch_size': MAX_BATCH if quiet else 1}
+
+    def _allocate(self, now):
+        """Intervals for all active nodes, scaled down to fit the budget"""
+        for node_id in [n for n, s in self.nodes.items() if now - s['seen'] > ACTIVE_S]:
+            del self.nodes[node_id]
+        rates = {n: 1.0 / self.desired_interval(s['urgency']) for n, s in self.nodes.items()}
+        total = sum(rates.values())
+        if total <= self.budget:
+            return {n: 1.0 / rate for n, rate in rates.items()}
+
+        # Everyone keeps the floor rate; the rest is shared by urgency
+        floor = 1.0 / self.max_interval
+        spare = self.budget - floor * len(rates)
+        if spare <= 0:
+            return {n: len(rates) / self.budget for n in rates}
+        extra = sum(rate - floor for rate in rates.values())
+        return {n: 1.0 / (floor + spare * (rate - floor) / extra) for n, rate in rates.items()}
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            allocation = self._allocate(now) if self.nodes else {}
+            return {
+                'budget_per_s': self.budget,
+                'allocated_per_s': round(sum(1.0 / i for i in allocation.values()), 2),
+                'tokens': round(self.tokens, 1),
+                'rejected': self.rejected,
+                'nodes': {n: {'interval_ms': int(round(i * 1000)),
+                              'urgency': round(self.nodes[n]['urgency'], 2)}
+                          for n, i in allocation.items()},
+            }
+
+
+controller = SamplingController()
+
+
+def advise_reading(data):
+    """Reporting advice for the node that sent `data` (after it was scored)"""
+    node_id = data.get('node_id', 'unknown')
+    return controller.advise(node_id, node_hazard(node_id, data),
+                             anomaly.detector.activity.get(node_id, 0.0))
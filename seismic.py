@@ -0,0 +1,277 @@
+"""
+Seismic/vibration event detection for ResQSense
+Runs an STA/LTA trigger on each node's acceleration magnitude as readings are
+ingested, then correlates trigger onsets across nodes to flag ground movement
+or a possible collapse.
+
+Nodes report anywhere from every 0.5 s to every 10 s, so the windows are
+defined in seconds, not samples. STA and LTA are recursive averages whose
+weight for each reading comes from the time since the node's previous
+reading. A burst of fast readings therefore doesn't shrink the windows, and
+slow reporting doesn't stretch them. State for all nodes lives in NumPy arrays
+indexed by node slot. Each reading is O(1), and a batch of readings for
+distinct nodes is one vectorized update.
+"""
+
+import threading
+import time
+
+import numpy as np
+from flask import Blueprint, request, jsonify
+
+from realtime import socketio
+from storage import get_storage, reading_time, timestamp_at
+
+seismic_bp = Blueprint('seismic', __name__)
+
+
+def init_schema(conn):
+    """Create the seismic_events table if it doesn't exist"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS seismic_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            kind TEXT NOT NULL,
+            node_id TEXT,
+            nodes TEXT,
+            ratio REAL,
+            magnitude REAL,
+            severity TEXT,
+            detail TEXT
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_seismic_events_node ON seismic_events (node_id, id)')
+
+
+class SeismicDetector:
+    """Incremental multi-node STA/LTA trigger with cross-node coincidence"""
+
+    def __init__(self, sta_s=5.0, lta_s=60.0, trigger_on=3.0, trigger_off=1.5,
+                 min_energy=0.01, baseline_s=100.0, coincidence_s=10.0, min_nodes=2,
+                 collapse_nodes=3, collapse_ratio=8.0, capacity=64):
+        self.sta_s = sta_s
+        self.lta_s = lta_s
+        self.trigger_on = trigger_on
+        self.trigger_off = trigger_off
+        self.min_energy = min_energy
+        self.baseline_s = baseline_s
+        self.coincidence_s = coincidence_s
+        self.min_nodes = min_nodes
+        self.collapse_nodes = collapse_nodes
+        self.collapse_ratio = collapse_ratio
+
+        self.node_index = {}
+        self.node_ids = []
+        self._lock = threading.Lock()
+        self._last_network_event = -np.inf
+        self._last_severity = None
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        def grow(name, fill, dtype=float, shape=()):
+            old = getattr(self, name, None)
+            new = np.full((capacity,) + shape, fill, dtype=dtype)
+            if old is not None:
+                new[:len(old)] = old
+            setattr(self, name, new)
+
+        grow('count', 0, dtype=np.int64)
+        grow('first', np.nan)
+        grow('last', np.nan)
+        grow('sta', 0.0)
+        grow('lta', 0.0)
+        grow('baseline', np.nan)
+        grow('ratio', 0.0)
+        grow('triggered', False, dtype=bool)
+        grow('onset', -np.inf)
+        grow('peak_ratio', 0.0)
+        grow('peak_mag', 0.0)
+        grow('vibration', False, dtype=bool)
+        self.capacity = capacity
+
+    def _slots(self, node_ids):
+        slots = []
+        for node_id in node_ids:
+            slot = self.node_index.get(node_id)
+            if slot is None:
+                slot = self.node_index[node_id] = len(self.node_ids)
+                self.node_ids.append(node_id)
+                if slot >= self.capacity:
+                    self._allocate(self.capacity * 2)
+            slots.append(slot)
+        return np.array(slots, dtype=np.int64)
+
+    def update(self, node_id, magnitude, vibration=0, now=None):
+        """Feed one reading; returns a list of event dicts"""
+        return self.update_many([node_id], [magnitude], [vibration], now)
+
+    def update_many(self, node_ids, magnitudes, vibrations, now=None):
+        """Feed one reading per node (node_ids must be distinct); returns events"""
+        now = time.time() if now is None else now
+        mag = np.asarray(magnitudes, dtype=float)
+        vib = np.asarray(vibrations, dtype=bool)
+        with self._lock:
+            idx = self._slots(node_ids)
+
+            # Seconds since each node's previous reading; out-of-order readings count as simultaneous
+            fresh = np.isnan(self.baseline[idx])
+            dt = np.where(fresh, 0.0, np.maximum(now - self.last[idx], 0.0))
+            self.first[idx] = np.where(fresh, now, self.first[idx])
+            self.last[idx] = np.maximum(np.nan_to_num(self.last[idx], nan=now), now)
+            self.count[idx] += 1
+
+            # Characteristic function: squared deviation from a slow baseline
+            self.baseline[idx] = np.where(fresh, mag, self.baseline[idx])
+            cf = (mag - self.baseline[idx]) ** 2 + 1e-6
+            self.baseline[idx] += -np.expm1(-dt / self.baseline_s) * (mag - self.baseline[idx])
+
+            # Recursive averages over sta_s and lta_s seconds of reading time. One reading never
+            # weighs more than half the STA window, and the ratio is taken against the LTA before
+            # this reading, so a slow node's first loud reading doesn't raise its own reference.
+            background = self.lta[idx]
+            sta_dt = np.minimum(dt, self.sta_s / 2)
+            sta = np.where(fresh, cf, self.sta[idx] - np.expm1(-sta_dt / self.sta_s) * (cf - self.sta[idx]))
+            self.sta[idx] = sta
+            self.lta[idx] = np.where(fresh, cf, background - np.expm1(-dt / self.lta_s) * (cf - background))
+
+            warm = now - self.first[idx] >= self.lta_s / 2
+            ratio = np.where(warm, sta / np.where(fresh, cf, background), 0.0)
+            self.ratio[idx] = ratio
+
+            # The energy floor keeps sensor noise on a quiet node from triggering
+            was = self.triggered[idx]
+            on = ~was & (ratio > self.trigger_on) & (sta > self.min_energy)
+            off = was & (ratio < self.trigger_off)
+
+            self.peak_ratio[idx] = np.where(on, ratio, np.maximum(self.peak_ratio[idx], ratio))
+            self.peak_mag[idx] = np.where(on, mag, np.maximum(self.peak_mag[idx], mag))
+            self.vibration[idx] = np.where(on, vib, self.vibration[idx] | vib)
+            self.onset[idx[on]] = now
+            self.triggered[idx] = (was | on) & ~off
+
+            events = []
+            for i in np.flatnonzero(on):
+                events.append({'kind': 'TRIGGER', 'node_id': node_ids[i],
+                               'ratio': round(float(ratio[i]), 2),
+                               'magnitude': round(float(mag[i]), 3),
+                               'vibration': bool(vib[i]), 'time': now})
+            for i in np.flatnonzero(off):
+                slot = idx[i]
+                events.append({'kind': 'TRIGGER_END', 'node_id': node_ids[i],
+                               'ratio': round(float(self.peak_ratio[slot]), 2),
+                               'magnitude': round(float(self.peak_mag[slot]), 3),
+                               'duration': round(now - float(self.onset[slot]), 1),
+                               'time': now})
+            if on.any():
+                network = self._coincidence(now)
+                if network:
+                    events.append(network)
+            return events
+
+    def _coincidence(self, now):
+        """Network event when enough nodes triggered within the coincidence window"""
+        n = len(self.node_ids)
+        recent = np.flatnonzero(now - self.onset[:n] <= self.coincidence_s)
+        if recent.size < self.min_nodes:
+            return None
+
+        order = recent[np.argsort(self.onset[recent])]
+        peak = float(self.peak_ratio[order].max())
+        shaking = bool(self.vibration[order].any())
+        collapse = (order.size >= self.collapse_nodes
+                    or (peak >= self.collapse_ratio and shaking))
+        severity = 'COLLAPSE_RISK' if collapse else 'GROUND_MOVEMENT'
+
+        # One event per window, unless ground movement escalates to collapse risk
+        if now - self._last_network_event < self.coincidence_s and (
+                severity == self._last_severity or collapse is False):
+            return None
+        self._last_network_event = now
+        self._last_severity = severity
+        return {'kind': 'COINCIDENCE', 'node_id': None,
+                # Onset order hints at where the movement started
+                'nodes': [self.node_ids[slot] for slot in order],
+                'ratio': round(peak, 2),
+                'magnitude': round(float(self.peak_mag[order].max()), 3),
+                'severity': severity,
+                'time': now}
+
+    def status(self):
+        with self._lock:
+            return {node_id: {'ratio': round(float(self.ratio[slot]), 2),
+                              'triggered': bool(self.triggered[slot]),
+                              'samples': int(self.count[slot])}
+                    for node_id, slot in self.node_index.items()}
+
+
+detector = SeismicDetector()
+
+
+def acceleration_magnitude(data):
+    acceleration = data.get('Acceleration') or {}
+    try:
+        return float(np.sqrt(sum(float(acceleration.get(axis, 0) or 0) ** 2
+                                 for axis in ('x', 'y', 'z'))))
+    except (TypeError, ValueError):
+        return None
+
+
+def event_row(event):
+    """Map a detector event onto a seismic_events row"""
+    detail = None
+    if event['kind'] == 'TRIGGER_END':
+        detail = f"duration={event['duration']}"
+    elif event['kind'] == 'TRIGGER':
+        detail = f"vibration={int(event['vibration'])}"
+    return {
+        'timestamp': timestamp_at(event['time']),
+        'kind': event['kind'],
+        'node_id': event.get('node_id'),
+        'nodes': ','.join(event['nodes']) if event.get('nodes') else None,
+        'ratio': event['ratio'],
+        'magnitude': event['magnitude'],
+        'severity': event.get('severity'),
+        'detail': detail,
+    }
+
+
+def on_reading(storage, data):
+    """Reading listener: update the detector and persist/emit any events"""
+    magnitude = acceleration_magnitude(data)
+    if magnitude is None:
+        return
+    events = detector.update(data.get('node_id', 'unknown'), magnitude, data.get('Vibration', 0),
+                             now=reading_time(data))
+    if not events:
+        return
+    storage.insert_many('seismic_events', [event_row(event) for event in events])
+    for event in events:
+        socketio.emit('seismic_event', event)
+
+
+@seismic_bp.route('/api/seismic/events', methods=['GET'])
+def get_seismic_events():
+    """Recent triggers and network events, optionally for one node"""
+    node_id = request.args.get('node')
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+    except ValueError:
+        limit = 50
+
+    try:
+        if node_id:
+            rows = get_storage().query(
+                'SELECT * FROM seismic_events WHERE node_id = ? ORDER BY id DESC LIMIT ?',
+                (node_id, limit))
+        else:
+            rows = get_storage().query(
+                'SELECT * FROM seismic_events ORDER BY id DESC LIMIT ?', (limit,))
+        return jsonify({"status": "success", "data": [dict(row) for row in rows]}), 200
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@seismic_bp.route('/api/seismic/status', methods=['GET'])
+def get_seismic_status():
+    """Current STA/LTA ratio and trigger state per node"""
+    return jsonify({"status": "success", "data": detector.status()}), 200
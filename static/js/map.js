@@ -0,0 +1,227 @@
+class RoverRadar {
+    constructor() {
+        this.isConnected = false;
+        this.totalReadings = 0;
+        this.lastData = null;
+        this.init();
+    }
+
+    init() {
+        this.updateConnectionStatus(false);
+        this.startDataFetching();
+    }
+
+    async fetchData() {
+        try {
+            const response = await fetch('/get_data');
+            if (!response.ok) throw new Error('Network response was not ok');
+
+            const data = await response.json();
+            if (data && data.length > 0) {
+                this.processData(data[0]); // Get the most recent reading
+                this.updateConnectionStatus(true);
+            }
+        } catch (error) {
+            console.error('Error fetching data:', error);
+            this.updateConnectionStatus(false);
+        }
+    }
+
+    processData(reading) {
+        this.lastData = reading;
+        this.totalReadings++;
+
+        // Update sensor readings display
+        this.updateSensorReading('front', reading.front);
+        this.updateSensorReading('right', reading.right);
+        this.updateSensorReading('back', reading.back);
+        this.updateSensorReading('left', reading.left);
+
+        // Update radar visualization
+        this.updateRadarVisualization(reading);
+
+        // Update data panel
+        document.getElementById('lastUpdate').textContent = new Date().toLocaleTimeString();
+        document.getElementById('totalReadings').textContent = this.totalReadings;
+        document.getElementById('alertLevel').textContent = this.getAlertLevel(reading);
+    }
+
+    updateSensorReading(direction, distance) {
+        const readingElement = document.getElementById(direction + 'Reading');
+        readingElement.textContent = distance;
+
+        // Update color based on distance
+        readingElement.className = this.getDistanceClass(distance);
+    }
+
+    updateRadarVisualization(reading) {
+        // Update object positions and visibility based on distance
+        this.updateObjectIndicator('front', reading.front, 350, this.calculateY(reading.front));
+        this.updateObjectIndicator('right', reading.right, this.calculateX(reading.right), 350);
+        this.updateObjectIndicator('back', reading.back, 350, this.calculateY(reading.back, true));
+        this.updateObjectIndicator('left', reading.left, this.calculateX(reading.left, true), 350);
+
+        // Update beam colors based on readings
+        this.updateBeamColor('front', reading.front);
+        this.updateBeamColor('right', reading.right);
+        this.updateBeamColor('back', reading.back);
+        this.updateBeamColor('left', reading.left);
+    }
+
+    calculateX(distance, isLeft = false) {
+        const maxDistance = 300; // Maximum sensor range
+        const centerX = 350;
+        const maxRadius = 250;
+
+        const normalizedDistance = Math.min(distance, maxDistance) / maxDistance;
+        const pixelDistance = normalizedDistance * maxRadius;
+
+        return isLeft ? centerX - pixelDistance : centerX + pixelDistance;
+    }
+
+    calculateY(distance, isBack = false) {
+        const maxDistance = 300; // Maximum sensor range
+        const centerY = 350;
+        const maxRadius = 250;
+
+        const normalizedDistance = Math.min(distance, maxDistance) / maxDistance;
+        const pixelDistance = normalizedDistance * maxRadius;
+
+        return isBack ? centerY + pixelDistance : centerY - pixelDistance;
+    }
+
+    updateObjectIndicator(direction, distance, x, y) {
+        const objectElement = document.getElementById(direction + 'Object');
+        const ringElement = document.getElementById(direction + 'Ring');
+        const rangeRings = document.getElementById('rangeRings');
+
+        if (distance < 150) { // Show object if within 150cm
+            objectElement.setAttribute('cx', x);
+            objectElement.setAttribute('cy', y);
+            objectElement.style.opacity = '1';
+
+            ringElement.setAttribute('cx', x);
+            ringElement.setAttribute('cy', y);
+            rangeRings.style.opacity = '1';
+
+            // Change color based on distance
+            if (distance < 30) {
+                objectElement.setAttribute('fill', 'url(#objectGradient)');
+                objectElement.setAttribute('stroke', '#ff4444');
+                ringElement.setAttribute('stroke', '#ff4444');
+            } else if (distance < 60) {
+                objectElement.setAttribute('fill', 'url(#warningGradient)');
+                objectElement.setAttribute('stroke', '#ffaa00');
+                ringElement.setAttribute('stroke', '#ffaa00');
+            } else {
+                objectElement.setAttribute('fill', 'rgba(0,255,0,0.5)');
+                objectElement.setAttribute('stroke', '#00ff00');
+                ringElement.setAttribute('stroke', '#00ff00');
+            }
+        } else {
+            objectElement.style.opacity = '0';
+        }
+    }
+
+    updateBeamColor(direction, distance) {
+        const beamElement = document.getElementById(direction + 'Beam');
+        let color, opacity;
+
+        if (distance < 30) {
+            color = 'rgba(255,68,68,0.3)';
+            opacity = '0.8';
+        } else if (distance < 60) {
+            color = 'rgba(255,170,0,0.2)';
+            opacity = '0.7';
+        } else {
+            color = 'rgba(0,255,0,0.1)';
+            opacity = '0.6';
+        }
+
+        const polygon = beamElement.querySelector('polygon');
+        polygon.setAttribute('fill', color);
+        beamElement.style.opacity = opacity;
+    }
+
+    getDistanceClass(distance) {
+        if (distance < 30) {
+            return 'alert';
+        } else if (distance < 60) {
+            return 'warning';
+        } else {
+            return 'safe';
+        }
+    }
+
+    getAlertLevel(reading) {
+        const minDistance = Math.min(reading.front, reading.right, reading.back, reading.left);
+
+        if (minDistance < 30) {
+            return 'CRITICAL';
+        } else if (minDistance < 60) {
+            return 'WARNING';
+        } else {
+            return 'NORMAL';
+        }
+    }
+
+    updateConnectionStatus(connected) {
+        const statusElement = document.getElementById('connectionStatus');
+        const statusText = document.getElementById('statusText');
+
+        if (connected !== this.isConnected) {
+            this.isConnected = connected;
+
+            if (connected) {
+                statusElement.className = 'connection-status connected';
+                statusText.textContent = 'RADAR ONLINE';
+                document.getElementById('systemStatus').textContent = 'OPERATIONAL';
+            } else {
+                statusElement.className = 'connection-status disconnected';
+                statusText.textContent = 'RADAR OFFLINE';
+                document.getElementById('systemStatus').textContent = 'ERROR';
+            }
+        }
+    }
+
+    startDataFetching() {
+        // Fetch data every 300ms for real-time updates
+        setInterval(() => {
+            this.fetchData();
+        }, 300);
+
+        // Initial fetch
+        this.fetchData();
+    }
+}
+
+// Initialize the radar system when page loads
+document.addEventListener('DOMContentLoaded', () => {
+    new RoverRadar();
+});
+
+// Demo data for testing (remove in production)
+if (window.location.hostname === 'localhost' || window.location.hostname === '127.0.0.1') {
+    let demoData = {'front': 116, 'right': 118, 'back': 109, 'left': 86};
+
+    const originalFetch = window.fetch;
+    window.fetch = function(url) {
+        if (url === '/get_data') {
+            // Simulate realistic sensor variations
+            Object.keys(demoData).forEach(key => {
+                demoData[key] += Math.floor(Math.random() * 20 - 10);
+                demoData[key] = Math.max(15, Math.min(250, demoData[key]));
+            });
+
+            return Promise.resolve({
+                ok: true,
+                json: () => Promise.resolve([{
+                    id: 1,
+                    timestamp: new Date().toISOString(),
+                    ...demoData
+                }])
+            });
+        }
+        return originalFetch.apply(this, arguments);
+    };
+}
@@ -0,0 +1,183 @@
+// --- Global State and Configuration ---
+const MAX_DATA_POINTS = 20;
+let lastAccel = null;
+const MOVEMENT_THRESHOLD = 0.5; // Adjust this value based on sensor sensitivity
+let audioCtx; // To be initialized on first user interaction for the alert sound
+let isSosActive = false;
+let sosSoundInterval = null; // To hold the interval ID for the repeating sound
+
+// --- DOM Elements ---
+const sosAlertModal = document.getElementById('sos-alert');
+const closeSosButton = document.getElementById('close-sos');
+
+// --- Chart.js Configuration ---
+function createChart(ctx, label, color) {
+    return new Chart(ctx, {
+        type: 'line',
+        data: { labels: [], datasets: [{ label: label, data: [], borderColor: color, backgroundColor: color.replace('1)', '0.2)'), borderWidth: 2, fill: true, tension: 0.4 }] },
+        options: {
+            scales: {
+                x: { ticks: { color: '#ecf0f1' }, grid: { color: 'rgba(236, 240, 241, 0.1)' } },
+                y: { beginAtZero: false, ticks: { color: '#ecf0f1' }, grid: { color: 'rgba(236, 240, 241, 0.1)' } }
+            },
+            plugins: { legend: { display: false } },
+            responsive: true, maintainAspectRatio: true
+        }
+    });
+}
+
+const hrCtx = document.getElementById('heartRateChart').getContext('2d');
+const spo2Ctx = document.getElementById('spo2Chart').getContext('2d');
+const heartRateChart = createChart(hrCtx, 'Heart Rate', 'rgba(231, 76, 60, 1)');
+const spo2Chart = createChart(spo2Ctx, 'SpO2', 'rgba(52, 152, 219, 1)');
+
+// --- WebSocket Connection ---
+const socket = io();
+socket.on('connect', () => {
+    console.log('Connected to server');
+    socket.emit('watch_subscribe'); // Raw telemetry is only sent to subscribers
+});
+socket.on('disconnect', () => console.log('Disconnected from server'));
+
+socket.on('initial_data', (data) => {
+    console.log('Received initial data:', data);
+    if (data.length > 0) {
+        lastAccel = data[data.length - 1].accelerometer; // Set baseline from the last known point
+    }
+    data.forEach(point => updateDashboard(point));
+});
+
+socket.on('sensor_update', (data) => {
+    console.log('Received sensor update:', data);
+    updateDashboard(data);
+});
+
+// Heart rate and SpO2 estimated on the server from raw PPG batches
+socket.on('ppg_update', (data) => {
+    if (!data.valid) return;
+    updateChart(heartRateChart, data.heart_rate);
+    updateChart(spo2Chart, data.spo2);
+    updateStatus('hr-status', data.heart_rate, 60, 100);
+    updateStatus('spo2-status', data.spo2, 95, 100);
+});
+
+// Fall and SOS detection run on the server; alerts arrive independently of telemetry
+socket.on('watch_alert', (alert) => {
+    console.log('Received watch alert:', alert);
+    if (!isSosActive) {
+        isSosActive = true;
+        sosAlertModal.querySelector('h2').textContent = alert.type === 'FALL' ? 'FALL DETECTED!' : 'SOS ALERT!';
+        sosAlertModal.style.display = 'flex';
+        playAlertSound();
+    }
+});
+
+socket.on('watch_state', (status) => {
+    console.log('Received watch state:', status);
+    if (status.state !== 'NORMAL') {
+        document.getElementById('worker-status').textContent = status.state.replace('_', ' ');
+    }
+});
+
+// --- Alert Sound Functions ---
+function playAlertSound() {
+    if (!audioCtx) {
+        audioCtx = new (window.AudioContext || window.webkitAudioContext)();
+    }
+    stopAlertSound(); // Clear any existing sound interval to prevent overlap
+
+    const playBeep = () => {
+        const oscillator = audioCtx.createOscillator();
+        const gainNode = audioCtx.createGain();
+        oscillator.connect(gainNode);
+        gainNode.connect(audioCtx.destination);
+        oscillator.type = 'sine';
+        oscillator.frequency.setValueAtTime(900, audioCtx.currentTime); // High pitch
+        oscillator.start(audioCtx.currentTime);
+        oscillator.stop(audioCtx.currentTime + 0.5); // Play for 0.5 seconds
+    };
+
+    playBeep(); // Play the beep immediately
+    sosSoundInterval = setInterval(playBeep, 1000); // Repeat every second
+
+    // Stop the sound after 10 seconds
+    setTimeout(() => {
+        stopAlertSound();
+    }, 10000);
+}
+
+function stopAlertSound() {
+    if (sosSoundInterval) {
+        clearInterval(sosSoundInterval);
+        sosSoundInterval = null;
+    }
+}
+
+// --- Dashboard Update Logic ---
+function updateDashboard(data) {
+    // Update charts
+    updateChart(heartRateChart, data.heart_rate);
+    updateChart(spo2Chart, data.spo2);
+
+    // Update status boxes
+    updateStatus('hr-status', data.heart_rate, 60, 100);
+    updateStatus('spo2-status', data.spo2, 95, 100);
+
+    // Update other data fields
+    document.getElementById('accel-x').textContent = data.accelerometer.x.toFixed(2);
+    document.getElementById('accel-y').textContent = data.accelerometer.y.toFixed(2);
+    document.getElementById('accel-z').textContent = data.accelerometer.z.toFixed(2);
+    document.getElementById('button-state').textContent = data.button;
+
+    // Check for worker activity
+    updateWorkerStatus(data.accelerometer);
+}
+
+function updateChart(chart, value) {
+    if (value === -1 || value === null) return;
+    const now = new Date();
+    const timeLabel = `${now.getHours()}:${String(now.getMinutes()).padStart(2, '0')}:${String(now.getSeconds()).padStart(2, '0')}`;
+    chart.data.labels.push(timeLabel);
+    chart.data.datasets[0].data.push(value);
+    if (chart.data.labels.length > MAX_DATA_POINTS) {
+        chart.data.labels.shift();
+        chart.data.datasets[0].data.shift();
+    }
+    chart.update();
+}
+
+function updateStatus(elementId, value, minNormal, maxNormal) {
+    const statusElement = document.getElementById(elementId);
+    if (value >= minNormal && value <= maxNormal) {
+        statusElement.textContent = 'NORMAL';
+        statusElement.className = 'status-box status-normal';
+    } else {
+        statusElement.textContent = 'ABNORMAL';
+        statusElement.className = 'status-box status-abnormal';
+    }
+}
+
+function updateWorkerStatus(currentAccel) {
+    if (lastAccel) {
+        const deltaX = currentAccel.x - lastAccel.x;
+        const deltaY = currentAccel.y - lastAccel.y;
+        const deltaZ = currentAccel.z - lastAccel.z;
+        // Calculate the magnitude of the change vector
+        const movement = Math.sqrt(deltaX*deltaX + deltaY*deltaY + deltaZ*deltaZ);
+
+        if (movement > MOVEMENT_THRESHOLD) {
+            document.getElementById('worker-status').textContent = 'Active';
+        } else {
+            document.getElementById('worker-status').textContent = 'Idle';
+        }
+    }
+    // Update the last known accelerometer reading for the next comparison
+    lastAccel = currentAccel;
+}
+
+// --- Event Listeners ---
+closeSosButton.addEventListener('click', () => {
+    sosAlertModal.style.display = 'none';
+    isSosActive = false; // Allow the alert to be triggered again
+    stopAlertSound(); // Stop the sound when dismissed
+});
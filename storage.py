@@ -0,0 +1,602 @@
+"""
+Shared SQLite storage engine for ResQSense
+A single writer thread owns the only write connection and commits everything
+queued at once in one transaction (group commit), without waiting for more:
+a lone write commits immediately, and batches only form under load. Readers
+borrow connections from a small pool.
+Every blueprint goes through one engine, so the server has one process, one WAL
+and one writer no matter how many device types are reporting.
+
+A high-volume table can be partitioned by time (see partition()): its rows go
+to one SQLite file per day or week, which the writer ATTACHes as needed. Each
+reader sees a TEMP VIEW of the same name that UNIONs the main table with the
+newest partitions, so queries don't change, and SQLite pushes WHERE and
+ORDER BY down into each partition's own index. Dropping old data is a file
+unlink instead of a DELETE.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
+
+from flask import current_app
+
+# Sentinel used to wake the writer thread for flushes and shutdown
+_FLUSH = object()
+_STOP = object()
+
+MAX_ATTACHED = 10         # SQLite's default SQLITE_LIMIT_ATTACHED
+WRITER_ATTACHED = 4       # Partitions the writer keeps attached (most recently written)
+
+# Wall clock behind row timestamps and reading times; replay.py sets it to the
+# recorded time of the request being replayed
+clock = time.time
+
+
+class PartitionsNotAttached(Exception):
+    """A read needs partitions older than the newest MAX_ATTACHED - 1 the views cover"""
+
+
+class TablePartitions:
+    """A table split into one SQLite file per `period_days`, named by period start"""
+
+    def __init__(self, table, directory, period_days=1):
+        self.table = table
+        self.directory = directory
+        self.period_days = period_days
+        self.columns = []         # [(name, type, notnull, default, pk)] copied from main
+        self.indexes = []         # [(name, [columns])]
+        os.makedirs(directory, exist_ok=True)
+        prefix = f'{table}_'
+        self.keys = sorted(name[len(prefix):-3] for name in os.listdir(directory)
+                           if name.startswith(prefix) and name.endswith('.db'))
+
+    def key_for(self, timestamp):
+        """Period start ('YYYY-MM-DD') for a row timestamp; weeks start on Monday"""
+        day = date.fromisoformat(timestamp[:10])
+        return (day - timedelta(days=(day.toordinal() - 1) % self.period_days)).isoformat()
+
+    def end(self, key):
+        """First day after the period"""
+        return (date.fromisoformat(key) + timedelta(days=self.period_days)).isoformat()
+
+    def overlapping(self, keys, since=None, until=None):
+        """The keys whose period overlaps [since, until)"""
+        return [key for key in keys
+                if (since is None or self.end(key) > since[:10]) and (until is None or key < until)]
+
+    def schema(self, key):
+        return f"{self.table}_{key.replace('-', '')}"
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{self.table}_{key}.db')
+
+    def read_layout(self, conn):
+        """Copy the main table's columns and indexes as the partition template"""
+        self.columns = [(row[1], row[2], row[3], row[4], row[5])
+                        for row in conn.execute(f'PRAGMA main.table_info({self.table})')]
+        self.indexes = []
+        for row in conn.execute(f'PRAGMA main.index_list({self.table})'):
+            if row[3] == 'c':     # Explicit CREATE INDEX, not a constraint's autoindex
+                columns = [info[2] for info in conn.execute(f'PRAGMA main.index_info({row[1]})')]
+                self.indexes.append((row[1], columns))
+
+    def create(self, conn, schema):
+        """Create the table and indexes in an attached partition, adding any new columns"""
+        existing = {row[1] for row in conn.execute(f'PRAGMA {schema}.table_info({self.table})')}
+        if not existing:
+            definitions = []
+            for name, type_, notnull, default, pk in self.columns:
+                definition = f'{name} {type_}'.strip()
+                if pk:
+                    definition += ' PRIMARY KEY'
+                if notnull:
+                    definition += ' NOT NULL'
+                if default is not None:
+                    definition += f' DEFAULT {default}'
+                definitions.append(definition)
+            conn.execute(f'CREATE TABLE {schema}.{self.table} ({", ".join(definitions)})')
+        else:
+            for name, type_, _, default, _ in self.columns:
+                if name not in existing:
+                    conn.execute(f'ALTER TABLE {schema}.{self.table} ADD COLUMN {name} {type_}'
+                                 + (f' DEFAULT {default}' if default is not None else ''))
+        for name, columns in self.indexes:
+            conn.execute(f'CREATE INDEX IF NOT EXISTS {schema}.{name} ON {self.table} ({", ".join(columns)})')
+
+    def attach_view(self, conn, keys):
+        """(Re)attach `keys` on a read connection and point the TEMP VIEW at them"""
+        for row in conn.execute('PRAGMA database_list').fetchall():
+            if row[1].startswith(f'{self.table}_'):
+                conn.execute(f'DETACH DATABASE {row[1]}')
+        columns = ', '.join(column[0] for column in self.columns)
+        selects = [f'SELECT {columns} FROM main.{self.table}']
+        for key in keys:
+            conn.execute('ATTACH DATABASE ? AS ' + self.schema(key), (self.path(key),))
+            selects.append(f'SELECT {columns} FROM {self.schema(key)}.{self.table}')
+        conn.execute(f'DROP VIEW IF EXISTS temp.{self.table}')
+        conn.execute(f'CREATE TEMP VIEW {self.table} AS ' + ' UNION ALL '.join(selects))
+
+
+class StorageEngine:
+    """Pooled readers plus one batching writer over a single SQLite file"""
+
+    def __init__(self, path, pool_size=4, batch_size=256):
+        self.path = path
+        self.pool_size = pool_size
+        self.batch_size = batch_size
+
+        self._schemas = []
+        self._queue = queue.Queue()
+        self._pool = queue.LifoQueue()
+        self._pool_created = 0
+        self._pool_lock = threading.Lock()
+        self._writer = None
+        self._start_lock = threading.Lock()
+
+        self.rows_written = 0
+        self.batches_committed = 0
+
+        self.partitioned = {}         # table -> TablePartitions
+        self._partition_version = 0   # Bumped whenever a partition is created or dropped
+        self._reader_versions = {}    # read connection -> version its views were built at
+        self._partition_lock = threading.Lock()
+        self._next_id = {}            # Writer-only: next row id per partitioned table
+        self._attached = OrderedDict()  # Writer-only: attached partition schemas, LRU order
+
+        # Optional callable(sql, params, seconds) told about every statement a caller
+        # issues; queued writes report seconds=None. Left None unless profiling.
+        self.tracer = None
+
+    # --- Setup ---
+
+    def init_app(self, app):
+        """Attach the engine to a Flask app so blueprints can find it"""
+        app.extensions['storage'] = self
+
+    def add_schema(self, schema_fn):
+        """Register a callable that creates/migrates tables on the write connection"""
+        self._schemas.append(schema_fn)
+        return schema_fn
+
+    def partition(self, table, directory, period_days=1):
+        """Store `table`'s rows in one file per period under `directory` (call before start)"""
+        self.partitioned[table] = TablePartitions(table, directory, period_days)
+
+    def partitions(self, table):
+        """[(period start, first day after it)] for a partitioned table, oldest first"""
+        spec = self.partitioned[table]
+        with self._partition_lock:
+            return [(key, spec.end(key)) for key in spec.keys]
+
+    def hidden_partitions(self, table, since=None, until=None):
+        """Partitions overlapping [since, until) that are too old for the reader views"""
+        spec = self.partitioned.get(table)
+        if spec is None:
+            return []
+        with self._partition_lock:
+            hidden = spec.keys[:-(MAX_ATTACHED - 1)]
+        return spec.overlapping(hidden, since, until)
+
+    def drop_partition(self, table, key, max_id=None):
+        """Detach and delete one partition file; returns a Future of True if dropped.
+
+        With `max_id`, the drop is skipped if rows with higher ids have been
+        written to the partition since the caller read it.
+        """
+        return self._submit(('drop', table, key, max_id))
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False,
+                               isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute('PRAGMA busy_timeout=5000')
+        return conn
+
+    def start(self):
+        """Run registered schemas and start the writer thread (idempotent)"""
+        with self._start_lock:
+            if self._writer is not None and self._writer.is_alive():
+                return
+            conn = self._connect()
+            for schema_fn in self._schemas:
+                schema_fn(conn)
+            for spec in self.partitioned.values():
+                self._prepare_partitions(conn, spec)
+            self._writer = threading.Thread(target=self._writer_loop, args=(conn,),
+                                            name='storage-writer', daemon=True)
+            self._writer.start()
+
+    def _prepare_partitions(self, conn, spec):
+        """Bring existing partition files up to the main table's layout and find the next id"""
+        spec.read_layout(conn)
+        last_id = conn.execute(f'SELECT MAX(id) FROM main.{spec.table}').fetchone()[0] or 0
+        try:
+            row = conn.execute('SELECT seq FROM sqlite_sequence WHERE name = ?', (spec.table,)).fetchone()
+            last_id = max(last_id, row[0] if row else 0)
+        except sqlite3.OperationalError:
+            pass                  # No AUTOINCREMENT table in this database
+        for key in spec.keys:
+            schema = spec.schema(key)
+            conn.execute('ATTACH DATABASE ? AS ' + schema, (spec.path(key),))
+            spec.create(conn, schema)
+            last_id = max(last_id, conn.execute(f'SELECT MAX(id) FROM {schema}.{spec.table}').fetchone()[0] or 0)
+            conn.execute(f'DETACH DATABASE {schema}')
+        self._next_id[spec.table] = last_id + 1
+        self._attached.clear()
+        if len(spec.keys) > MAX_ATTACHED - 1:
+            print(f"⚠️ {len(spec.keys)} {spec.table} partitions; reads reaching past the newest "
+                  f"{MAX_ATTACHED - 1} fail until the archiver has moved older ones")
+
+    def close(self, timeout=5):
+        """Flush pending writes, stop the writer and close pooled readers"""
+        if self._writer is not None and self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join(timeout)
+        self._writer = None
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+        self._pool_created = 0
+        self._reader_versions.clear()
+
+    # --- Writes (all go through the writer thread) ---
+
+    def _submit(self, op):
+        if self._writer is None:
+            self.start()
+        future = Future()
+        self._queue.put((op, future))
+        return future
+
+    def insert(self, table, row):
+        """Queue one row (dict of column -> value); returns a Future set on commit"""
+        return self.insert_many(table, [row])
+
+    def insert_many(self, table, rows):
+        """Queue several rows for the same table; all share one Future"""
+        rows = list(rows)
+        if not rows:
+            future = Future()
+            future.set_result(0)
+            return future
+        if table in self.partitioned and 'timestamp' not in rows[0]:
+            # Partitions are chosen by timestamp, so stamp rows here rather than by DEFAULT
+            stamp = timestamp_now()
+            rows = [dict(row, timestamp=stamp) for row in rows]
+        columns = tuple(rows[0].keys())
+        values = [tuple(row.get(col) for col in columns) for row in rows]
+        if self.tracer is not None:
+            self.tracer(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ... -- {len(values)} row(s)", (), None)
+        return self._submit(('insert', table, columns, values))
+
+    def execute(self, sql, params=()):
+        """Queue an arbitrary write statement (UPDATE, DELETE, DDL)"""
+        if self.tracer is not None:
+            self.tracer(sql, params, None)
+        return self._submit(('execute', sql, params))
+
+    def flush(self, timeout=5):
+        """Block until everything queued so far has been committed"""
+        future = self._submit(_FLUSH)
+        return future.result(timeout)
+
+    def _writer_loop(self, conn):
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                # Take whatever else is already queued; a lone write commits at once, and
+                # under load the writes queued during one commit form the next batch
+                batch = [item]
+                stop = False
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+                self._commit_batch(conn, batch)
+                if stop:
+                    break
+            # Drain anything queued after the stop request
+            leftover = []
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    leftover.append(item)
+            if leftover:
+                self._commit_batch(conn, leftover)
+        finally:
+            conn.close()
+
+    # --- Partition routing (writer thread only) ---
+
+    def _partition_keys(self, op):
+        """Partition schemas an op writes to, as {table: set(keys)}"""
+        if op is _FLUSH or op[0] != 'insert' or op[1] not in self.partitioned:
+            return {}
+        _, table, columns, values = op
+        spec = self.partitioned[table]
+        index = columns.index('timestamp')
+        return {table: {spec.key_for(row[index]) for row in values}}
+
+    def _attach_for(self, conn, ops):
+        """ATTACH (creating if needed) every partition `ops` write to; must run outside a transaction"""
+        needed = []
+        for op in ops:
+            for table, keys in self._partition_keys(op).items():
+                spec = self.partitioned[table]
+                needed += [(spec, key) for key in keys]
+        if len({spec.schema(key) for spec, key in needed}) > WRITER_ATTACHED:
+            raise ValueError(f'Batch spans more than {WRITER_ATTACHED} partitions')
+        for spec, key in needed:
+            schema = spec.schema(key)
+            if schema in self._attached:
+                self._attached.move_to_end(schema)
+                continue
+            while len(self._attached) >= WRITER_ATTACHED:
+                conn.execute(f'DETACH DATABASE {self._attached.popitem(last=False)[0]}')
+            created = not os.path.exists(spec.path(key))
+            conn.execute('ATTACH DATABASE ? AS ' + schema, (spec.path(key),))
+            self._attached[schema] = None
+            if created:
+                conn.execute(f'PRAGMA {schema}.journal_mode=WAL')
+                conn.execute(f'PRAGMA {schema}.synchronous=NORMAL')
+                spec.create(conn, schema)
+                with self._partition_lock:
+                    spec.keys = sorted(set(spec.keys) | {key})
+                    self._partition_version += 1
+                print(f"🗂️ Created {spec.table} partition {key}")
+
+    def _insert_partitioned(self, conn, table, columns, values):
+        """Give rows ids from the table's shared sequence and write each to its partition"""
+        spec = self.partitioned[table]
+        if 'id' not in columns:
+            columns = ('id',) + columns
+            values = [(None,) + row for row in values]
+        id_index = columns.index('id')
+        time_index = columns.index('timestamp')
+        by_key = {}
+        ids = []
+        for row in values:
+            row_id = row[id_index]
+            if row_id is None:
+                row_id = self._next_id[table]
+                row = row[:id_index] + (row_id,) + row[id_index + 1:]
+            self._next_id[table] = max(self._next_id[table], row_id + 1)
+            ids.append(row_id)
+            by_key.setdefault(spec.key_for(row[time_index]), []).append(row)
+
+        placeholders = ', '.join('?' for _ in columns)
+        for key, rows in by_key.items():
+            conn.executemany(f'INSERT INTO {spec.schema(key)}.{table} ({", ".join(columns)}) '
+                             f'VALUES ({placeholders})', rows)
+        # Ids stay unique after partitions are dropped: keep AUTOINCREMENT's high-water mark
+        try:
+            if not conn.execute('UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?',
+                                (max(ids), table)).rowcount:
+                conn.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)', (table, max(ids)))
+        except sqlite3.OperationalError:
+            pass
+        return ids[0] if len(ids) == 1 else len(ids)
+
+    def _drop(self, conn, table, key, max_id):
+        spec = self.partitioned[table]
+        schema = spec.schema(key)
+        if key not in spec.keys:
+            return False
+        if max_id is not None:
+            if schema not in self._attached:
+                conn.execute('ATTACH DATABASE ? AS ' + schema, (spec.path(key),))
+                self._attached[schema] = None
+            newest = conn.execute(f'SELECT MAX(id) FROM {schema}.{table}').fetchone()[0]
+            if newest is not None and newest > max_id:
+                return False
+        if schema in self._attached:
+            conn.execute(f'DETACH DATABASE {schema}')
+            del self._attached[schema]
+        with self._partition_lock:
+            spec.keys = [k for k in spec.keys if k != key]
+            self._partition_version += 1
+        for suffix in ('', '-wal', '-shm'):
+            try:
+                os.remove(spec.path(key) + suffix)
+            except FileNotFoundError:
+                pass
+        print(f"🗑️ Dropped {table} partition {key}")
+        return True
+
+    def _apply(self, conn, op):
+        if op is _FLUSH:
+            return None
+        if op[0] == 'insert':
+            _, table, columns, values = op
+            if table in self.partitioned:
+                return self._insert_partitioned(conn, table, columns, values)
+            placeholders = ', '.join('?' for _ in columns)
+            sql = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({placeholders})'
+            if len(values) == 1:
+                cursor = conn.execute(sql, values[0])
+                return cursor.lastrowid
+            conn.executemany(sql, values)
+            return len(values)
+        _, sql, params = op
+        return conn.execute(sql, params).rowcount
+
+    def _commit_batch(self, conn, batch):
+        """Apply a batch in one transaction; fall back to per-op on failure"""
+        if self.partitioned:
+            # ATTACH/DETACH can't run inside a transaction, so drops go first
+            for op, future in [item for item in batch if item[0] is not _FLUSH and item[0][0] == 'drop']:
+                try:
+                    future.set_result(self._drop(conn, *op[1:]))
+                except Exception as e:
+                    future.set_exception(e)
+            batch = [item for item in batch if item[0] is _FLUSH or item[0][0] != 'drop']
+            try:
+                self._attach_for(conn, [op for op, _ in batch])
+            except Exception:
+                self._commit_individually(conn, batch)
+                return
+        results = []
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            for op, _ in batch:
+                results.append(self._apply(conn, op))
+            conn.execute('COMMIT')
+        except Exception:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            self._commit_individually(conn, batch)
+            return
+        self._record(batch)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def _commit_individually(self, conn, batch):
+        for op, future in batch:
+            try:
+                if self.partitioned:
+                    self._attach_for(conn, [op])
+                conn.execute('BEGIN IMMEDIATE')
+                result = self._apply(conn, op)
+                conn.execute('COMMIT')
+            except Exception as e:
+                if conn.in_transaction:
+                    conn.execute('ROLLBACK')
+                future.set_exception(e)
+                continue
+            self._record([(op, future)])
+            future.set_result(result)
+
+    def _record(self, batch):
+        self.batches_committed += 1
+        for op, _ in batch:
+            if op is not _FLUSH and op[0] == 'insert':
+                self.rows_written += len(op[3])
+
+    # --- Reads (pooled connections) ---
+
+    @contextmanager
+    def connection(self):
+        """Borrow a read connection from the pool"""
+        if self._writer is None:
+            self.start()
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                create = self._pool_created < self.pool_size
+                if create:
+                    self._pool_created += 1
+            conn = self._connect() if create else self._pool.get()
+        try:
+            if self.partitioned and self._reader_versions.get(conn) != self._partition_version:
+                self._refresh_views(conn)
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    def _refresh_views(self, conn):
+        with self._partition_lock:
+            version = self._partition_version
+            keys = {table: list(spec.keys[-(MAX_ATTACHED - 1):]) for table, spec in self.partitioned.items()}
+        for table, spec in self.partitioned.items():
+            spec.attach_view(conn, keys[table])
+        self._reader_versions[conn] = version
+
+    def query(self, sql, params=()):
+        """Run a read query and return all rows as sqlite3.Row"""
+        return self._read(sql, params, sqlite3.Cursor.fetchall)
+
+    def query_one(self, sql, params=()):
+        """Run a read query and return the first row (or None)"""
+        return self._read(sql, params, sqlite3.Cursor.fetchone)
+
+    def _read(self, sql, params, fetch):
+        with self.connection() as conn:
+            tracer = self.tracer
+            if tracer is None:
+                return fetch(conn.execute(sql, params))
+            started = time.perf_counter()
+            result = fetch(conn.execute(sql, params))
+            tracer(sql, params, time.perf_counter() - started)
+            return result
+
+    def stats(self):
+        stats = {
+            'queued': self._queue.qsize(),
+            'rows_written': self.rows_written,
+            'batches_committed': self.batches_committed,
+        }
+        for table in self.partitioned:
+            keys = [key for key, _ in self.partitions(table)]
+            stats[f'{table}_partitions'] = {'count': len(keys), 'oldest': keys[0] if keys else None,
+                                            'newest': keys[-1] if keys else None}
+        return stats
+
+
+def database_path():
+    """The server's database file: RESQSENSE_DATABASE, else sensor_data.db"""
+    return os.environ.get('RESQSENSE_DATABASE', 'sensor_data.db')
+
+
+def partition_directory(path):
+    """Where the partition files of the database at `path` live"""
+    return os.path.splitext(path)[0] + '_partitions'
+
+
+def get_storage():
+    """Return the storage engine attached to the current Flask app"""
+    return current_app.extensions['storage']
+
+
+def timestamp_now(age=0.0):
+    """UTC timestamp in the CURRENT_TIMESTAMP format, with milliseconds
+
+    Rows are stamped when received rather than when the writer commits them, so
+    batching never shifts a reading's time. `age` (seconds) backdates readings
+    a device buffered before posting.
+    """
+    now = datetime.fromtimestamp(clock(), timezone.utc) - timedelta(seconds=age)
+    return now.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+
+def wall_time():
+    """Epoch seconds from `clock` (the recorded time during an in-process replay)"""
+    return clock()
+
+
+def timestamp_at(t):
+    """timestamp_now() format for epoch seconds `t`"""
+    return datetime.fromtimestamp(t, timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+
+def reading_time(data):
+    """Epoch seconds a reading was taken, resolved once and kept on the reading
+
+    A batched reading carries age_ms, how long the device held it before
+    posting, so the stored timestamp and the streaming analytics agree on
+    when it happened rather than when it arrived.
+    """
+    if 'captured_at' not in data:
+        data['captured_at'] = clock() - float(data.get('age_ms', 0) or 0) / 1000
+    return data['captured_at']
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Anomaly Flag Rate Check for ResQSense
+Replays the bundled sensor_data.db through a fresh anomaly detector and the
+batch scorer. Real data should be flagged rarely; a high rate means the
+detector would emit sensor_anomaly on ordinary readings. Also checks that a
+stored non-numeric gas value doesn't break /api/anomaly/history.
+No server needed.
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+import numpy as np
+
+import anomaly
+
+DATABASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sensor_data.db')
+MAX_FLAG_RATE = 0.05
+
+
+def load_rows(path=DATABASE):
+    conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        return conn.execute('SELECT * FROM sensor_data ORDER BY timestamp, id').fetchall()
+    finally:
+        conn.close()
+
+
+def channel_values(rows, channels):
+    return np.array([[row[c] if row[c] is not None else np.nan for c in channels] for row in rows], dtype=float)
+
+
+def online_flag_rate(rows):
+    """Share of readings the streaming detector flags"""
+    detector = anomaly.AnomalyDetector()
+    values = channel_values(rows, detector.channels)
+    flagged = sum(1 for row, x in zip(rows, values) if detector.update(row['node_id'], x)[1])
+    return flagged / len(rows)
+
+
+def history_flag_rate(rows):
+    """Share of readings score_history flags, node by node"""
+    detector = anomaly.AnomalyDetector()
+    flagged = 0
+    for node_id in sorted({row['node_id'] for row in rows}):
+        values = channel_values([row for row in rows if row['node_id'] == node_id], detector.channels)
+        values = np.where(np.isnan(values), np.nanmedian(values, axis=0), values)
+        jump_z, drift_z, stuck = anomaly.score_history(values, adc=detector.adc)
+        flags = (np.abs(jump_z) >= anomaly.JUMP_Z) | (np.abs(drift_z) >= anomaly.DRIFT_Z) | stuck
+        flagged += int(flags.any(axis=1).sum())
+    return flagged / len(rows)
+
+
+def server_client():
+    """Flask test client of the full app on a throwaway database"""
+    if 'app' not in sys.modules:
+        os.environ['RESQSENSE_DATABASE'] = os.path.join(tempfile.mkdtemp(prefix='resqsense-test-'), 'test.db')
+        os.environ['RESQSENSE_THERMAL_ANALYSIS'] = '0'
+    import app
+    app.init_db()
+    return app.app.test_client()
+
+
+def history_with_text_value():
+    """Status of /api/anomaly/history after one reading stored a string as MQ4"""
+    client = server_client()
+    for i in range(30):
+        client.post('/data', json={'node_id': 'text_node', 'MQ4': 'abc' if i == 10 else 200 + i, 'MQ7': 50})
+    response = client.get('/api/anomaly/history?node=text_node')
+    return response.status_code, response.get_json()
+
+
+def test_bundled_flag_rate():
+    rows = load_rows()
+    assert rows, "bundled sensor_data.db has no readings"
+    assert online_flag_rate(rows) < MAX_FLAG_RATE
+    assert history_flag_rate(rows) < MAX_FLAG_RATE
+
+
+def test_history_with_text_value():
+    status, body = history_with_text_value()
+    assert status == 200, body
+    assert body['scored'] == 30
+
+
+def main():
+    print("🧪 ResQSense Anomaly Flag Rate Check")
+    print("=" * 50)
+    rows = load_rows()
+    ok = True
+    for name, rate in (('online detector', online_flag_rate(rows)), ('score_history', history_flag_rate(rows))):
+        passed = rate < MAX_FLAG_RATE
+        ok &= passed
+        print(f"{'✅' if passed else '❌'} {name}: {rate:.1%} of {len(rows)} readings flagged "
+              f"(limit {MAX_FLAG_RATE:.0%})")
+    status, _ = history_with_text_value()
+    ok &= status == 200
+    print(f"{'✅' if status == 200 else '❌'} history with a non-numeric MQ4: HTTP {status}")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Cold Archive Check for ResQSense
+Round-trips a day of mixed readings (millisecond timestamps, floats, flags,
+NULLs and sparse text) through the columnar file format, then archives the
+older days of a throwaway database with Archiver and checks that history()
+and iter_range() return exactly what they returned before, including a late
+reading merged into a day that was already archived.
+No server needed.
+"""
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta, timezone
+
+import anomaly
+import archive
+import nodes
+from storage import StorageEngine
+
+NOW = datetime(2026, 3, 11, 12, 0, tzinfo=timezone.utc)
+DAYS = 10
+AFTER_DAYS = 4
+
+
+def mixed_rows(count=500, seed=5):
+    """One node-day of readings using every column codec"""
+    rng = random.Random(seed)
+    start = datetime(2026, 3, 1)
+    rows = []
+    row_id = 1000
+    for i in range(count):
+        row_id += rng.choice([1, 1, 1, 3])
+        stamp = start + timedelta(milliseconds=1300 * i + rng.randint(0, 40))
+        rows.append({
+            'id': row_id,
+            'node_id': 'node/1',
+            'timestamp': stamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
+            'mq4': None if i % 17 == 0 else round(rng.uniform(150, 900), 2),
+            'temperature': rng.uniform(-12.5, 45.0),
+            'fire': None if i == 7 else int(rng.random() < 0.02),
+            'vibration': i // 100,
+            'anomaly_flags': 'mq4_jump,mq7_stuck' if i % 50 == 3 else None,
+            'note': i if i % 2 else f'n{i}',
+        })
+    return rows
+
+
+def codec_round_trip(directory):
+    """Rows read back that differ from the ones written, plus the codec per column"""
+    rows = mixed_rows()
+    store = archive.ColumnArchive(directory)
+    store.write('node/1', '2026-03-01', rows)
+    header, _ = archive.read_file(store.path('node/1', '2026-03-01'))
+    back = store.rows('node/1', '2026-03-01', newest_first=False)
+    wrong = [(a, b) for a, b in zip(rows, back) if a != b] + [None] * abs(len(rows) - len(back))
+    return wrong, {column['name']: column['codec'] for column in header['columns']}
+
+
+def open_storage(path):
+    storage = StorageEngine(path)
+    storage.add_schema(nodes.init_schema)
+    storage.add_schema(anomaly.init_schema)
+    storage.start()
+    return storage
+
+
+def live_rows(node_id, day, hours):
+    return [{'node_id': node_id, 'timestamp': f'{day} {hour:02d}:15:00', 'mq4': 200.0 + hour,
+             'temperature': 21.5, 'fire': int(hour == 13), 'vibration': 0} for hour in hours]
+
+
+def reads(storage, store):
+    """Everything the server could ask for, across the archive boundary"""
+    cut = (NOW - timedelta(days=AFTER_DAYS)).strftime('%Y-%m-%d')
+    return {
+        'history': archive.history(storage, store, 'node_1'),
+        'page': archive.history(storage, store, 'node_1', limit=30),
+        'range': archive.history(storage, store, 'node_1', since=f'{cut[:8]}05 06:00:00', until=f'{cut} 12:00:00'),
+        'export': list(archive.iter_range(storage, store, 'node_1', columns=['mq4', 'fire'])),
+        'other': archive.history(storage, store, 'node_2'),
+    }
+
+
+def archive_run(directory):
+    """(reads before, reads after archiving, rows moved, rows moved by the second pass)"""
+    storage = open_storage(os.path.join(directory, 'test.db'))
+    store = archive.ColumnArchive(os.path.join(directory, 'test_archive'))
+    try:
+        for offset in range(DAYS, 0, -1):
+            day = (NOW - timedelta(days=offset)).strftime('%Y-%m-%d')
+            storage.insert_many('sensor_data', live_rows('node_1', day, range(0, 24, 2)))
+            storage.insert_many('sensor_data', live_rows('node_2', day, [3, 15]))
+        storage.flush()
+        before = reads(storage, store)
+        archiver = archive.Archiver(storage, store, after_days=AFTER_DAYS)
+        moved = archiver.run_once(now=NOW)
+        after = reads(storage, store)
+
+        # A late reading for a day that is already archived is merged into its file
+        late_day = (NOW - timedelta(days=DAYS)).strftime('%Y-%m-%d')
+        storage.insert_many('sensor_data', live_rows('node_1', late_day, [23])).result(timeout=5)
+        late = reads(storage, store)
+        second = archiver.run_once(now=NOW)
+        merged = reads(storage, store)
+        left = storage.query_one('SELECT COUNT(*) AS n FROM sensor_data WHERE timestamp < ?',
+                                 ((NOW - timedelta(days=AFTER_DAYS)).strftime('%Y-%m-%d'),))['n']
+        return before, after, late, merged, moved, second, left
+    finally:
+        storage.close()
+
+
+def test_codec_round_trip():
+    directory = tempfile.mkdtemp(prefix='resqsense-archive-')
+    try:
+        wrong, codecs = codec_round_trip(directory)
+    finally:
+        shutil.rmtree(directory)
+    assert not wrong, wrong[:3]
+    assert codecs['timestamp'] == 'dod' and codecs['id'] == 'dod'
+    assert codecs['mq4'] == 'xor' and codecs['fire'] == 'rle'
+    assert codecs['anomaly_flags'] == 'text' and codecs['note'] == 'json'
+
+
+def test_history_survives_archiving():
+    directory = tempfile.mkdtemp(prefix='resqsense-archive-')
+    try:
+        before, after, late, merged, moved, second, left = archive_run(directory)
+    finally:
+        shutil.rmtree(directory)
+    assert moved == {'node_1': 12 * (DAYS - AFTER_DAYS), 'node_2': 2 * (DAYS - AFTER_DAYS)}
+    assert after == before
+    assert second == {'node_1': 1} and left == 0
+    assert merged == late
+    assert len(merged['history']) == len(before['history']) + 1
+
+
+def main():
+    print("🧪 ResQSense Cold Archive Check")
+    print("=" * 50)
+    ok = True
+    for name, check in (('columnar codec round trip', test_codec_round_trip),
+                        ('history and export unchanged by archiving', test_history_survives_archiving)):
+        try:
+            check()
+            print(f"✅ {name}")
+        except AssertionError as e:
+            ok = False
+            print(f"❌ {name} {e}")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Gateway Dedupe Check for ResQSense
+Posts store-and-forward batches carrying gateway_id/gateway_seq to the app's
+/data endpoint and re-sends them as gateway.py does after a lost reply: the
+re-sent readings must be dropped as duplicates without storing a row twice,
+a batch that overlaps the last one must store only its new readings, and a
+malformed gateway_seq must be rejected with a 400.
+No server needed.
+"""
+
+import gzip
+import json
+import sys
+import uuid
+
+from test_anomaly_rate import server_client
+
+
+def gateway_batch(gateway_id, node_id, seqs):
+    return [{'node_id': node_id, 'MQ4': 200 + seq, 'MQ7': 50, 'age_ms': 1000,
+             'gateway_id': gateway_id, 'gateway_seq': seq} for seq in seqs]
+
+
+def post_gzipped(client, batch):
+    return client.post('/data', data=gzip.compress(json.dumps(batch).encode()),
+                       content_type='application/json', headers={'Content-Encoding': 'gzip'})
+
+
+def stored_rows(client, node_id):
+    return len(client.get(f'/data?node={node_id}&limit=100').get_json()['data'])
+
+
+def resend_run():
+    """(duplicates reported per post, rows stored after each post) for one gateway"""
+    client = server_client()
+    gateway_id, node_id = f'gw_{uuid.uuid4().hex[:8]}', f'gw_node_{uuid.uuid4().hex[:8]}'
+    duplicates, rows = [], []
+    for seqs in (range(1, 11), range(1, 11), range(6, 16)):
+        response = post_gzipped(client, gateway_batch(gateway_id, node_id, seqs))
+        assert response.status_code == 200, response.get_json()
+        duplicates.append(response.get_json()['duplicates'])
+        rows.append(stored_rows(client, node_id))
+    return duplicates, rows
+
+
+def invalid_seq_statuses():
+    client = server_client()
+    statuses = []
+    for seq in (0, -3, '7', 2.5, True, None):
+        batch = gateway_batch('gw_bad', 'gw_bad_node', [1])
+        batch[0]['gateway_seq'] = seq
+        statuses.append(client.post('/data', json=batch).status_code)
+    return statuses
+
+
+def test_resent_batch_is_dropped():
+    duplicates, rows = resend_run()
+    assert duplicates == [0, 10, 5]
+    assert rows == [10, 10, 15]
+
+
+def test_invalid_seq_is_rejected():
+    assert invalid_seq_statuses() == [400] * 6
+
+
+def main():
+    print("🧪 ResQSense Gateway Dedupe Check")
+    print("=" * 50)
+    ok = True
+    for name, check in (('re-sent and overlapping batches dropped', test_resent_batch_is_dropped),
+                        ('malformed gateway_seq rejected', test_invalid_seq_is_rejected)):
+        try:
+            check()
+            print(f"✅ {name}")
+        except AssertionError as e:
+            ok = False
+            print(f"❌ {name} {e}")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -4,6 +4,7 @@ Multi-Node Sensor Data Simulator for ResQSense
 Simulates real-time sensor data from 3 underground mining nodes
 """
 
+import argparse
 import requests
 import json
 import time
@@ -11,7 +12,7 @@ import random
 from datetime import datetime
 
 # Server configuration
-SERVER_URL = "http://localhost:5000/data"
+SERVER_URL = "http://localhost:5000/data"  # or a gateway.py instance near the nodes
 
 # Node configurations
 NODES = [
@@ -38,8 +39,12 @@ NODES = [
     }
 ]
 
-def generate_sensor_data(node_config):
-    """Generate realistic sensor data for a specific node"""
+def generate_sensor_data(node_config, incident=0.0):
+    """Generate realistic sensor data for a specific node
+
+    `incident` (0-1, only with --incident) adds a methane/CO leak on top of
+    the normal readings, to exercise the server's hazard and sampling logic.
+    """
     
     # Base values with realistic variations
     base_temp = node_config["base_temp"]
@@ -50,6 +55,9 @@ def generate_sensor_data(node_config):
     mq5 = random.randint(200, 600)      # LPG/Propane: 200-600 ppm  
     mq135 = random.randint(180, 500)    # Air Quality: 180-500 ppm
     mq7 = random.randint(80, 350)       # Carbon Monoxide: 80-350 ppm
+    if incident:
+        mq4 += int(incident * 1200)     # Leak: methane past the 1000 ppm danger level
+        mq7 += int(incident * 400)      # ...and CO past 400 ppm
     
     # Environmental sensors
     temperature = base_temp + random.uniform(-3, 3)
@@ -83,53 +91,92 @@ def generate_sensor_data(node_config):
         "Acceleration": acceleration
     }
 
-def send_node_data(node_config):
-    """Send sensor data for a specific node to the server"""
+def send_node_data(node_config, readings):
+    """Send buffered readings for a node; returns the server's (interval_ms, batch_size)"""
+    now = time.time()
+    # One reading goes as an object, a batch as a list with each reading's age
+    payload = [dict(data, age_ms=int((now - taken) * 1000)) for taken, data in readings]
+    if len(payload) == 1:
+        payload = payload[0]
     try:
-        data = generate_sensor_data(node_config)
-        
         # Send POST request to server
         response = requests.post(
             SERVER_URL,
-            json=data,
+            json=payload,
             headers={'Content-Type': 'application/json'},
             timeout=5
         )
+        data = readings[-1][1]
+        advice = response.json()
         
         if response.status_code == 200:
-            print(f"✅ {node_config['name']} ({node_config['id']}): Data sent successfully")
+            print(f"✅ {node_config['name']} ({node_config['id']}): {len(readings)} reading(s) sent successfully")
             print(f"   📊 Gas: MQ4={data['MQ4']}, MQ5={data['MQ5']}, MQ135={data['MQ135']}, MQ7={data['MQ7']}")
             print(f"   🌡️ Environment: Temp={data['Temperature']}°C, Humidity={data['Humidity']}%")
             print(f"   ⚠️ Safety: Fire={data['Fire']}, Vibration={data['Vibration']}")
             print(f"   📍 Location: {node_config['location']}")
+        elif response.status_code == 429:
+            print(f"🐢 {node_config['name']}: Server over budget, retrying later")
         else:
             print(f"❌ {node_config['name']}: Failed to send data - Status {response.status_code}")
+        return advice.get('interval_ms'), advice.get('batch_size')
             
     except requests.exceptions.RequestException as e:
         print(f"❌ {node_config['name']}: Network error - {e}")
     except Exception as e:
         print(f"❌ {node_config['name']}: Error - {e}")
+    return None, None
 
 def main():
     """Main function to run the multi-node sensor simulator"""
+    global SERVER_URL
+    parser = argparse.ArgumentParser(description='ResQSense multi-node sensor simulator')
+    parser.add_argument('--incident', help='Node id that develops a methane/CO leak (e.g. node_2)')
+    parser.add_argument('--incident-after', type=float, default=60,
+                        help='Seconds before the leak starts ramping up (default 60)')
+    parser.add_argument('--url', default=SERVER_URL,
+                        help=f'Ingest URL, e.g. a gateway at http://localhost:5080/data (default {SERVER_URL})')
+    args = parser.parse_args()
+    SERVER_URL = args.url
+
     print("🚀 ResQSense Multi-Node Sensor Data Simulator")
     print("=" * 60)
     print("Simulating 3 underground mining nodes with real-time data")
+    print("Each node follows the reporting interval and batch size the server returns")
+    if args.incident:
+        print(f"💨 {args.incident} will develop a gas leak after {args.incident_after:.0f}s")
     print("Press Ctrl+C to stop the simulation")
     print("=" * 60)
     
+    started = time.time()
+    state = {node["id"]: {"interval": 2.0, "batch": 1, "due": started, "pending": []} for node in NODES}
+    
     try:
         while True:
-            print(f"\n🕐 {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-            print("-" * 40)
-            
-            # Send data for all nodes
+            now = time.time()
             for node in NODES:
-                send_node_data(node)
-                time.sleep(0.5)  # Small delay between nodes
+                node_state = state[node["id"]]
+                if now < node_state["due"]:
+                    continue
+                
+                incident = 0.0
+                if node["id"] == args.incident:
+                    incident = min(max((now - started - args.incident_after) / 30.0, 0.0), 1.0)
+                node_state["pending"].append((now, generate_sensor_data(node, incident)))
+                node_state["due"] = now + node_state["interval"]
+                if len(node_state["pending"]) < node_state["batch"]:
+                    continue
+                
+                interval_ms, batch = send_node_data(node, node_state["pending"])
+                node_state["pending"] = []
+                if interval_ms and (interval_ms / 1000.0, batch) != (node_state["interval"], node_state["batch"]):
+                    print(f"   ⏱️ {node['id']}: next reading in {interval_ms} ms, batch size {batch} "
+                          f"[{datetime.now().strftime('%H:%M:%S')}]")
+                    node_state["interval"] = interval_ms / 1000.0
+                    node_state["batch"] = batch or 1
+                    node_state["due"] = now + node_state["interval"]
             
-            print(f"\n⏳ Waiting 3 seconds before next data transmission...")
-            time.sleep(3)
+            time.sleep(0.05)
             
     except KeyboardInterrupt:
         print("\n\n🛑 Simulation stopped by user")
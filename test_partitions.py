@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Partitioned Storage Check for ResQSense
+Writes readings spanning more days than SQLite can attach into a sensor_data
+table partitioned by day, then checks that reads reaching partitions beyond
+the reader views raise PartitionsNotAttached instead of silently missing
+rows, that a partition drop is skipped when rows were written after the
+caller read it and otherwise removes the file and its rows from the views,
+that row ids keep rising after a restart, and that archiving the old
+partitions makes the full range readable again.
+No server needed.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+from datetime import date, datetime, timedelta, timezone
+
+import anomaly
+import archive
+import nodes
+from storage import MAX_ATTACHED, PartitionsNotAttached, StorageEngine, partition_directory
+
+FIRST_DAY = date(2026, 2, 1)
+DAYS = MAX_ATTACHED + 3
+PER_DAY = 6
+
+
+def day(offset):
+    return (FIRST_DAY + timedelta(days=offset)).isoformat()
+
+
+def open_storage(path):
+    storage = StorageEngine(path)
+    storage.add_schema(nodes.init_schema)
+    storage.add_schema(anomaly.init_schema)
+    storage.partition('sensor_data', partition_directory(path), 1)
+    storage.start()
+    return storage
+
+
+def fill(storage):
+    for offset in range(DAYS):
+        storage.insert_many('sensor_data', [{'node_id': 'node_1', 'timestamp': f'{day(offset)} {hour:02d}:30:00',
+                                             'mq4': 300.0 + offset} for hour in range(0, 24, 24 // PER_DAY)])
+    storage.flush()
+
+
+def count(storage, since='', until='9999-12-31'):
+    return storage.query_one('SELECT COUNT(*) AS n FROM sensor_data WHERE timestamp >= ? AND timestamp < ?',
+                             (since, until))['n']
+
+
+def raises_not_attached(storage, since, until=None):
+    try:
+        archive.require_attached(storage, since, until)
+    except PartitionsNotAttached:
+        return True
+    return False
+
+
+def test_hidden_partitions_refuse_reads():
+    directory = tempfile.mkdtemp(prefix='resqsense-partitions-')
+    storage = open_storage(os.path.join(directory, 'test.db'))
+    try:
+        fill(storage)
+        hidden = DAYS - (MAX_ATTACHED - 1)
+        assert len(storage.partitions('sensor_data')) == DAYS
+        assert storage.hidden_partitions('sensor_data') == [day(i) for i in range(hidden)]
+        assert raises_not_attached(storage, day(0))
+        assert raises_not_attached(storage, f'{day(hidden - 1)} 23:00:00', day(hidden + 1))
+        assert not raises_not_attached(storage, day(hidden))
+        # The views cover exactly the partitions that aren't hidden
+        assert count(storage) == (DAYS - hidden) * PER_DAY
+        assert count(storage, day(hidden)) == (DAYS - hidden) * PER_DAY
+    finally:
+        storage.close()
+        shutil.rmtree(directory)
+
+
+def test_drop_partition():
+    directory = tempfile.mkdtemp(prefix='resqsense-partitions-')
+    path = os.path.join(directory, 'test.db')
+    storage = open_storage(path)
+    try:
+        fill(storage)
+        newest = day(DAYS - 1)
+        max_id = storage.query_one('SELECT MAX(id) AS id FROM sensor_data WHERE timestamp >= ?', (newest,))['id']
+        storage.insert('sensor_data', {'node_id': 'node_1', 'timestamp': f'{newest} 23:59:00', 'mq4': 1.0}).result(timeout=5)
+        # A row arrived after max_id was read, so the drop must not lose it
+        assert storage.drop_partition('sensor_data', newest, max_id).result(timeout=5) is False
+        assert os.path.exists(storage.partitioned['sensor_data'].path(newest))
+        assert count(storage, newest) == PER_DAY + 1
+
+        assert storage.drop_partition('sensor_data', newest, max_id + 1).result(timeout=5) is True
+        assert not os.path.exists(storage.partitioned['sensor_data'].path(newest))
+        assert count(storage, newest) == 0
+        assert newest not in [key for key, _ in storage.partitions('sensor_data')]
+        assert storage.hidden_partitions('sensor_data') == [day(i) for i in range(DAYS - 1 - (MAX_ATTACHED - 1))]
+        assert storage.drop_partition('sensor_data', newest).result(timeout=5) is False
+
+        # Ids keep rising across a restart even though the newest partition is gone
+        storage.close()
+        storage = open_storage(path)
+        row_id = storage.insert('sensor_data', {'node_id': 'node_1', 'timestamp': f'{day(5)} 12:00:00'}).result(timeout=5)
+        assert row_id > max_id + 1
+    finally:
+        storage.close()
+        shutil.rmtree(directory)
+
+
+def test_archiving_drops_old_partitions():
+    directory = tempfile.mkdtemp(prefix='resqsense-partitions-')
+    storage = open_storage(os.path.join(directory, 'test.db'))
+    store = archive.ColumnArchive(os.path.join(directory, 'test_archive'))
+    try:
+        fill(storage)
+        now = datetime.combine(FIRST_DAY + timedelta(days=DAYS), datetime.min.time(), timezone.utc)
+        moved = archive.Archiver(storage, store, after_days=4).run_once(now=now)
+        assert moved == {'node_1': (DAYS - 4) * PER_DAY}
+        assert [key for key, _ in storage.partitions('sensor_data')] == [day(i) for i in range(DAYS - 4, DAYS)]
+        assert storage.hidden_partitions('sensor_data') == []
+        rows = archive.history(storage, store, 'node_1')
+        assert len(rows) == DAYS * PER_DAY
+        assert len({row['id'] for row in rows}) == len(rows)
+    finally:
+        storage.close()
+        shutil.rmtree(directory)
+
+
+def main():
+    print("🧪 ResQSense Partitioned Storage Check")
+    print("=" * 50)
+    ok = True
+    for name, check in (('reads past the views raise PartitionsNotAttached', test_hidden_partitions_refuse_reads),
+                        ('partition drop guarded by max_id', test_drop_partition),
+                        ('archiving drops old partitions', test_archiving_drops_old_partitions)):
+        try:
+            check()
+            print(f"✅ {name}")
+        except AssertionError as e:
+            ok = False
+            print(f"❌ {name} {e}")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+PPG Batch Check for ResQSense
+Round-trips synthetic MAX30102 batches through the binary format, checks that
+malformed batches are rejected, and feeds a pulse through PPGEstimator: the
+heart rate must come out right, start-time jitter up to the sensor FIFO depth
+must not restart the window, and a real dropout (also across a millis()
+wrap) must restart it once and count the lost samples.
+No server needed.
+"""
+
+import sys
+
+import numpy as np
+
+import ppg
+
+RATE = 100
+BATCH = 100
+PULSE_HZ = 1.2          # 72 bpm
+
+
+def pulse_batch(index):
+    """One 1 s batch of red/IR samples with a 72 bpm pulse"""
+    t = np.arange(index * BATCH, (index + 1) * BATCH) / RATE
+    ir = (100000 + 2000 * np.sin(2 * np.pi * PULSE_HZ * t)).astype(np.uint32)
+    red = (90000 + 1500 * np.sin(2 * np.pi * PULSE_HZ * t)).astype(np.uint32)
+    return red, ir
+
+
+def feed(starts):
+    """PPGEstimator after one batch per first_sample_ms in `starts`"""
+    estimator = ppg.PPGEstimator()
+    for index, t0_ms in enumerate(starts):
+        red, ir = pulse_batch(index)
+        estimator.add_samples('w1', RATE, t0_ms % 2 ** 32, np.stack([red, ir], axis=1))
+    return estimator
+
+
+def test_round_trip():
+    red, ir = pulse_batch(0)
+    watch_id, rate, t0_ms, samples = ppg.decode_batch(ppg.encode_batch('watch_7', RATE, 123456, red, ir))
+    assert (watch_id, rate, t0_ms) == ('watch_7', RATE, 123456)
+    assert (samples[:, 0] == red).all() and (samples[:, 1] == ir).all()
+
+
+def test_malformed_batches():
+    good = ppg.encode_batch('w1', RATE, 0, *pulse_batch(0))
+    for payload in (good[:10], b'XXXX' + good[4:], good[:-1], good[:6] + b'\x00\x00' + good[8:]):
+        try:
+            ppg.decode_batch(payload)
+        except ppg.PPGFormatError:
+            continue
+        raise AssertionError(f"accepted a malformed batch of {len(payload)} bytes")
+
+
+def test_jitter_keeps_window():
+    rng = np.random.default_rng(0)
+    estimator = feed([i * 1000 + int(rng.uniform(0, 320)) for i in range(12)])
+    assert estimator.resets.get('w1', 0) == 0
+    heart_rate, spo2, valid = estimator.run_once()['w1']
+    assert valid and abs(heart_rate - 60 * PULSE_HZ) <= 3
+
+
+def test_dropout_restarts_window():
+    # One batch (1 s of samples) lost after the fifth, just before millis() wraps
+    base = 2 ** 32 - 5500
+    estimator = feed([base + i * 1000 + (1000 if i >= 5 else 0) for i in range(12)])
+    assert estimator.resets['w1'] == 1
+    assert estimator.dropped['w1'] == BATCH
+
+
+def main():
+    print("🧪 ResQSense PPG Batch Check")
+    print("=" * 50)
+    ok = True
+    for name, check in (('binary batch round trip', test_round_trip),
+                        ('malformed batches rejected', test_malformed_batches),
+                        ('FIFO jitter keeps the window', test_jitter_keeps_window),
+                        ('dropout restarts the window', test_dropout_restarts_window)):
+        try:
+            check()
+            print(f"✅ {name}")
+        except AssertionError as e:
+            ok = False
+            print(f"❌ {name} {e}")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
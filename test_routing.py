@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Evacuation Routing Check for ResQSense
+Applies a random sequence of hazard changes to an EvacuationRouter on a
+synthetic tunnel grid and, after every change, compares the incrementally
+repaired routes with a full Dijkstra rebuild: same distance to exit for every
+node, and next-hop pointers that walk to an exit at exactly that cost.
+No server needed.
+"""
+
+import math
+import random
+import sys
+
+from routing import EvacuationRouter
+
+SIZE = 12
+CHANGES = 300
+
+
+def grid_spec(size=SIZE, seed=3):
+    """size x size junction grid, 10 m apart, with exits on two corners and a few missing tunnels"""
+    rng = random.Random(seed)
+    nodes = {f'n{x}_{y}': {'pos': [10 * x, -10 * y]} for x in range(size) for y in range(size)}
+    nodes['n0_0']['exit'] = True
+    nodes[f'n{size - 1}_{size - 1}']['exit'] = True
+    edges = []
+    for x in range(size):
+        for y in range(size):
+            for dx, dy in ((1, 0), (0, 1)):
+                if x + dx < size and y + dy < size and rng.random() > 0.15:
+                    edges.append([f'n{x}_{y}', f'n{x + dx}_{y + dy}'])
+    return {'nodes': nodes, 'edges': edges}
+
+
+def rebuilt(spec, hazards):
+    router = EvacuationRouter(spec)
+    router.hazard.update(hazards)
+    router._rebuild()
+    return router
+
+
+def mismatches(router, reference):
+    """Nodes whose repaired route disagrees with the full rebuild"""
+    wrong = []
+    for node in router.adj:
+        expected, actual = reference.dist[node], router.dist[node]
+        if math.isinf(expected) or math.isinf(actual):
+            if expected != actual:
+                wrong.append(node)
+            continue
+        if not math.isclose(expected, actual, rel_tol=1e-9, abs_tol=1e-9):
+            wrong.append(node)
+            continue
+        cost, hop, steps = 0.0, node, 0
+        while hop not in router.exits and steps <= len(router.adj):
+            nxt = router.next_hop[hop]
+            cost += router.cost(hop, nxt)
+            hop, steps = nxt, steps + 1
+        if hop not in router.exits or not math.isclose(cost, actual, rel_tol=1e-9, abs_tol=1e-9):
+            wrong.append(node)
+    return wrong
+
+
+def repair_matches_rebuild(changes=CHANGES, seed=4):
+    """Number of changes after which the repaired routes differed from a rebuild"""
+    rng = random.Random(seed)
+    spec = grid_spec()
+    router = EvacuationRouter(spec)
+    nodes = [node for node in router.adj if node not in router.exits]
+    failures = 0
+    for _ in range(changes):
+        node = rng.choice(nodes)
+        router.set_hazard(node, rng.choice([0.0, 0.0, 0.3, 0.6, 0.9, 1.0, 1.0]))
+        if mismatches(router, rebuilt(spec, router.hazard)):
+            failures += 1
+    return failures
+
+
+def test_repair_matches_rebuild():
+    assert repair_matches_rebuild() == 0
+
+
+def test_blocked_node_is_avoided():
+    router = EvacuationRouter(grid_spec())
+    before = router.route_to_exit('n1_1')
+    blocked = before['path'][1]
+    router.set_hazard(blocked, 1.0)
+    assert blocked not in router.route_to_exit('n1_1')['path']
+    router.set_hazard(blocked, 0.0)
+    # Equal-length alternatives exist on a grid, so compare costs, not paths
+    assert router.route_to_exit('n1_1')['cost'] == before['cost']
+
+
+def main():
+    print("🧪 ResQSense Evacuation Routing Check")
+    print("=" * 50)
+    failures = repair_matches_rebuild()
+    print(f"{'✅' if failures == 0 else '❌'} incremental repair vs full rebuild: "
+          f"{failures} of {CHANGES} hazard changes disagreed")
+    try:
+        test_blocked_node_is_avoided()
+        blocked_ok = True
+    except AssertionError:
+        blocked_ok = False
+    print(f"{'✅' if blocked_ok else '❌'} impassable node avoided, route restored when cleared")
+    return failures == 0 and blocked_ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
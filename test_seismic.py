@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Seismic Detector Check for ResQSense
+Feeds synthetic acceleration magnitudes through SeismicDetector. Quiet sensor
+noise must rarely trigger and 30 s of shaking must always trigger, whether a
+node reports every 0.5 s or every 10 s, and each trigger must end again.
+Triggers on several nodes must be correlated into one COINCIDENCE event
+listing the nodes in onset order.
+No server needed.
+"""
+
+import sys
+
+import numpy as np
+
+from seismic import SeismicDetector
+
+QUIET_S = 1800
+SHAKE_S = 30
+MAX_FALSE_TRIGGERS = 5      # Per node and half hour of quiet noise
+
+
+def shake_run(interval, seed=1):
+    """(triggers during quiet, triggers during shaking, trigger ends from then on) for one node"""
+    rng = np.random.default_rng(seed)
+    detector = SeismicDetector()
+    quiet = shaking = ends = 0
+    for t in np.arange(interval, QUIET_S + SHAKE_S + 300, interval):
+        shake = QUIET_S <= t < QUIET_S + SHAKE_S
+        magnitude = 9.8 + rng.normal(0, 0.05) + (rng.normal(0, 3) if shake else 0)
+        for event in detector.update('node_1', magnitude, now=t):
+            if event['kind'] == 'TRIGGER':
+                shaking += shake
+                quiet += not shake and t < QUIET_S
+            elif event['kind'] == 'TRIGGER_END' and t >= QUIET_S:
+                ends += 1
+    return quiet, shaking, ends
+
+
+def network_run(onsets, vibration=False):
+    """COINCIDENCE events when nodes start shaking at the given onsets (s)"""
+    rng = np.random.default_rng(2)
+    detector = SeismicDetector()
+    nodes = sorted(onsets)
+    events = []
+    for t in np.arange(1.0, 200.0, 1.0):
+        magnitudes = [9.8 + rng.normal(0, 0.05) + (rng.normal(0, 3) if onsets[n] <= t < onsets[n] + 20 else 0)
+                      for n in nodes]
+        events += detector.update_many(nodes, magnitudes, [vibration] * len(nodes), now=t)
+    return [event for event in events if event['kind'] == 'COINCIDENCE']
+
+
+def test_report_intervals():
+    for interval in (0.5, 2.0, 10.0):
+        quiet, shaking, ends = shake_run(interval)
+        assert quiet <= MAX_FALSE_TRIGGERS, f"{quiet} false triggers at {interval} s"
+        assert shaking >= 1, f"shaking missed at {interval} s"
+        assert ends >= 1, f"trigger never ended at {interval} s"
+
+
+def test_coincidence_order():
+    events = network_run({'node_1': 150, 'node_2': 152, 'node_3': 154})
+    assert events
+    assert events[-1]['nodes'] == ['node_1', 'node_2', 'node_3']
+    assert events[-1]['severity'] == 'COLLAPSE_RISK'
+
+
+def test_two_nodes_are_ground_movement():
+    events = network_run({'node_1': 150, 'node_2': 153, 'node_3': 10 ** 6})
+    assert [event['severity'] for event in events] == ['GROUND_MOVEMENT']
+    assert events[0]['nodes'] == ['node_1', 'node_2']
+
+
+def test_lone_node_is_no_coincidence():
+    assert network_run({'node_1': 150, 'node_2': 10 ** 6, 'node_3': 10 ** 6}) == []
+
+
+def main():
+    print("🧪 ResQSense Seismic Detector Check")
+    print("=" * 50)
+    ok = True
+    for name, check in (('0.5 s, 2 s and 10 s report intervals', test_report_intervals),
+                        ('coincidence in onset order', test_coincidence_order),
+                        ('two nodes are ground movement', test_two_nodes_are_ground_movement),
+                        ('one node is no coincidence', test_lone_node_is_no_coincidence)):
+        try:
+            check()
+            print(f"✅ {name}")
+        except AssertionError as e:
+            ok = False
+            print(f"❌ {name} {e}")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
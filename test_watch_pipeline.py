@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Watch Pipeline Check for ResQSense
+Feeds synthetic smartwatch posts through WatchPipeline and checks that SOS
+fires once per button press and stays latched for its hold time, and that a
+fall is raised once for an impact followed by stillness (caught through the
+held peak even when the point sample misses it) and never for an impact
+followed by movement.
+No server needed.
+"""
+
+import sys
+
+from watch_pipeline import GRAVITY, WatchPipeline
+
+STILL = {'x': 0.0, 'y': 0.0, 'z': GRAVITY}
+
+
+def post(pipeline, t, accelerometer=STILL, **extra):
+    return pipeline.process('w1', dict(extra, accelerometer=accelerometer), now=t)
+
+
+def alerts(events, kind):
+    return [payload for name, payload in events if name == 'watch_alert' and payload['type'] == kind]
+
+
+def sos_presses():
+    """(SOS alerts, state while latched, state after the hold) for two presses"""
+    pipeline = WatchPipeline(sos_hold_s=15.0)
+    events = []
+    for t, button in ((0, 0), (1, 1), (2, 1), (3, 1), (4, 0), (5, 1), (6, 0)):
+        events += post(pipeline, t, button=button)
+    latched = pipeline.states()['w1']['state']
+    post(pipeline, 25, button=0)
+    return len(alerts(events, 'SOS')), latched, pipeline.states()['w1']['state']
+
+
+def fall_then(after):
+    """(fall alerts, state at the end) for a held impact followed by `after` samples"""
+    pipeline = WatchPipeline()
+    events = []
+    t = 0.0
+    for _ in range(6):
+        events += post(pipeline, t)
+        t += 0.5
+    # The impact happened between posts: only the held peak shows it
+    events += post(pipeline, t, peak_accel=4 * GRAVITY, peak_age_ms=200)
+    for accelerometer in after:
+        t += 0.5
+        events += post(pipeline, t, accelerometer=accelerometer)
+    return len(alerts(events, 'FALL')), pipeline.states()['w1']['state']
+
+
+def test_sos_latches_on_press_edge():
+    count, latched, released = sos_presses()
+    assert count == 2
+    assert latched == 'SOS'
+    assert released == 'NORMAL'
+
+
+def test_fall_from_held_peak():
+    count, state = fall_then([STILL] * 10)
+    assert count == 1
+    assert state == 'FALL'
+
+
+def test_fall_clears_when_moving():
+    moving = [{'x': 6.0 * (-1) ** i, 'y': 3.0, 'z': GRAVITY + 4.0 * (-1) ** i} for i in range(4)]
+    _, state = fall_then([STILL] * 10 + moving)
+    assert state == 'NORMAL'
+
+
+def test_impact_then_movement_is_no_fall():
+    moving = [{'x': 5.0 * (-1) ** i, 'y': 2.0, 'z': GRAVITY + 5.0 * (-1) ** i} for i in range(10)]
+    count, _ = fall_then(moving)
+    assert count == 0
+
+
+def main():
+    print("🧪 ResQSense Watch Pipeline Check")
+    print("=" * 50)
+    ok = True
+    for name, check in (('SOS latches on the press edge', test_sos_latches_on_press_edge),
+                        ('fall from the held peak', test_fall_from_held_peak),
+                        ('fall clears when the wearer moves', test_fall_clears_when_moving),
+                        ('impact then movement is no fall', test_impact_then_movement_is_no_fall)):
+        try:
+            check()
+            print(f"✅ {name}")
+        except AssertionError:
+            ok = False
+            print(f"❌ {name}")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
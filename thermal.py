@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Thermal hotspot detection for ResQSense
+Thresholds each thermal frame, extracts connected hotspots, tracks their area
+and temperature over time and turns that into a fire-risk level. Only level
+changes are recorded, in the fire_risk table; they stay out of sensor_data so
+the node statistics and anomaly baselines never see the camera.
+
+The per-frame work is one vectorized threshold, one connected-component pass
+and a few bincounts, so it keeps up with the camera on a single core. It runs
+inside the thermal capture process (see video.py), or standalone on a recorded
+file:
+
+    python thermal.py recording.mp4 [--post http://localhost:5000/api/thermal/fire_risk]
+"""
+
+import argparse
+import time
+from collections import deque
+
+import numpy as np
+
+# 8-bit stand-in frames are mapped linearly onto this range; 16-bit radiometric
+# frames are read as centi-Kelvin (FLIR Lepton style)
+GRAY_RANGE_C = (20.0, 220.0)
+
+HOTSPOT_C = 60.0          # Pixels above this are part of a hotspot
+FIRE_C = 150.0            # Hotspot peak at which flame is considered likely
+MIN_HOTSPOT_AREA = 4      # Pixels; smaller blobs are treated as noise
+MAX_HOTSPOTS = 8          # Largest hotspots reported per frame
+
+THERMAL_NODE_ID = 'thermal_1'
+FIRE_LEVELS = ('NORMAL', 'WARNING', 'DANGER')
+
+
+def init_schema(conn):
+    """Create the fire_risk table if it doesn't exist"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS fire_risk (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            source TEXT NOT NULL,
+            level TEXT NOT NULL,
+            previous_level TEXT,
+            risk REAL,
+            peak_c REAL,
+            area_fraction REAL,
+            area_rate REAL,
+            temp_rate REAL
+        )
+    ''')
+
+
+def to_celsius(frame):
+    """Convert a raw thermal frame to a float32 temperature image"""
+    if frame.ndim == 3:
+        frame = frame[..., 0]
+    if frame.dtype == np.uint16:
+        return frame.astype(np.float32) / 100.0 - 273.15
+    low, high = GRAY_RANGE_C
+    return low + frame.astype(np.float32) * ((high - low) / 255.0)
+
+
+class HotspotDetector:
+    """Threshold + connected components + per-component stats for one frame"""
+
+    def __init__(self, hotspot_c=HOTSPOT_C, min_area=MIN_HOTSPOT_AREA,
+                 max_hotspots=MAX_HOTSPOTS):
+        import cv2
+        self._cv2 = cv2
+        self.hotspot_c = hotspot_c
+        self.min_area = min_area
+        self.max_hotspots = max_hotspots
+
+    def analyze(self, frame):
+        temps = to_celsius(frame)
+        mask = (temps > self.hotspot_c).astype(np.uint8)
+        result = {'time': time.time(), 'max_c': float(temps.max()),
+                  'mean_c': float(temps.mean()), 'hot_area': 0, 'hotspots': [],
+                  'frame_area': int(temps.size)}
+        if not mask.any():
+            return result
+
+        count, labels, stats, centroids = self._cv2.connectedComponentsWithStats(mask, connectivity=8)
+        # Per-label peak and mean temperature in one pass over the image
+        flat_labels = labels.ravel()
+        flat_temps = temps.ravel()
+        peak = np.full(count, -np.inf, dtype=np.float32)
+        np.maximum.at(peak, flat_labels[flat_temps > self.hotspot_c],
+                      flat_temps[flat_temps > self.hotspot_c])
+        mean = np.bincount(flat_labels, weights=flat_temps, minlength=count) / np.maximum(
+            stats[:, self._cv2.CC_STAT_AREA], 1)
+
+        areas = stats[1:, self._cv2.CC_STAT_AREA]
+        keep = np.flatnonzero(areas >= self.min_area) + 1
+        keep = keep[np.argsort(-stats[keep, self._cv2.CC_STAT_AREA])]
+
+        result['hot_area'] = int(stats[keep, self._cv2.CC_STAT_AREA].sum())
+        for label in keep[:self.max_hotspots]:
+            x, y, w, h, area = (int(v) for v in stats[label])
+            result['hotspots'].append({
+                'area': area, 'peak_c': round(float(peak[label]), 1),
+                'mean_c': round(float(mean[label]), 1),
+                'centroid': [round(float(c), 1) for c in centroids[label]],
+                'bbox': [x, y, w, h],
+            })
+        return result
+
+
+class FireRiskTracker:
+    """Tracks hotspot area and peak temperature over a sliding time window"""
+
+    def __init__(self, window_s=10.0, fire_c=FIRE_C):
+        self.window_s = window_s
+        self.fire_c = fire_c
+        self.history = deque()
+
+    def update(self, analysis):
+        """Add one frame analysis; return (risk 0..1, level, trend dict)"""
+        now = analysis['time']
+        peak = max((h['peak_c'] for h in analysis['hotspots']), default=analysis['max_c'])
+        area_frac = analysis['hot_area'] / max(analysis['frame_area'], 1)
+        self.history.append((now, area_frac, peak))
+        while self.history and self.history[0][0] < now - self.window_s:
+            self.history.popleft()
+
+        samples = np.array(self.history)
+        area_rate = temp_rate = 0.0
+        if len(samples) >= 3 and samples[-1, 0] > samples[0, 0]:
+            t = samples[:, 0] - samples[0, 0]
+            area_rate, temp_rate = np.polyfit(t, samples[:, 1:], 1)[0]
+
+        # Heat level dominates; growth and heating rate raise risk before the peak gets there
+        heat = np.clip((peak - HOTSPOT_C) / (self.fire_c - HOTSPOT_C), 0, 1)
+        growth = np.clip(area_rate * 100, 0, 1)        # +1% of frame per second
+        heating = np.clip(temp_rate / 10.0, 0, 1)     # +10 C per second
+        risk = float(np.clip(0.6 * heat + 0.2 * growth + 0.2 * heating, 0, 1))
+        if peak >= self.fire_c:
+            risk = max(risk, 0.9)
+
+        level = 'DANGER' if risk >= 0.7 else 'WARNING' if risk >= 0.35 else 'NORMAL'
+        trend = {'area_fraction': round(area_frac, 4), 'area_rate': round(float(area_rate), 5),
+                 'temp_rate': round(float(temp_rate), 2), 'peak_c': round(float(peak), 1)}
+        return round(risk, 3), level, trend
+
+
+def fire_event(risk, level, previous, trend, source=THERMAL_NODE_ID):
+    """A fire_risk row (without timestamp) for a change of level"""
+    return {
+        'source': source,
+        'level': level,
+        'previous_level': previous,
+        'risk': risk,
+        'peak_c': trend['peak_c'],
+        'area_fraction': trend['area_fraction'],
+        'area_rate': trend['area_rate'],
+        'temp_rate': trend['temp_rate'],
+    }
+
+
+class FireRiskBridge:
+    """Turns per-frame analyses into fire-risk level changes
+
+    `record` is called with a fire_event() dict whenever the level changes,
+    including the first level after start.
+    """
+
+    def __init__(self, record):
+        self.record = record
+        self.tracker = FireRiskTracker()
+        self.level = None
+        self.latest = None
+
+    def __call__(self, analysis):
+        risk, level, trend = self.tracker.update(analysis)
+        self.latest = dict(analysis, risk=risk, level=level, trend=trend)
+        if level != self.level:
+            self.record(fire_event(risk, level, self.level, trend))
+            self.level = level
+        return self.latest
+
+
+def main():
+    """Analyze a recorded thermal file, optionally posting readings to a server"""
+    import cv2
+
+    parser = argparse.ArgumentParser(description='ResQSense thermal hotspot analysis')
+    parser.add_argument('source', help='Thermal video file (or camera index)')
+    parser.add_argument('--post', help='Server /api/thermal/fire_risk URL to post level changes to')
+    args = parser.parse_args()
+
+    if args.post:
+        import requests
+
+        def record(event):
+            requests.post(args.post, json=event, timeout=5)
+    else:
+        def record(event):
+            print(event)
+
+    capture = cv2.VideoCapture(int(args.source) if args.source.isdigit() else args.source)
+    detector = HotspotDetector()
+    bridge = FireRiskBridge(record)
+    frames = 0
+    started = time.monotonic()
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        analysis = detector.analyze(frame)
+        if capture.get(cv2.CAP_PROP_FPS) > 0:
+            # Use video time so recordings replay with their real dynamics
+            analysis['time'] = frames / capture.get(cv2.CAP_PROP_FPS)
+        bridge(analysis)
+        frames += 1
+    elapsed = time.monotonic() - started
+    print(f"Analyzed {frames} frames in {elapsed:.2f}s "
+          f"({frames / max(elapsed, 1e-9):.0f} fps)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,491 @@
+"""
+Video feed service for ResQSense
+Serves /video_feed/normal and /video_feed/thermal as MJPEG streams.
+
+Each feed is captured in its own process, which encodes every frame to JPEG
+exactly once into a shared-memory slot. A single pump thread in the server
+copies new frames out of the slot and hands the same bytes object to every
+MJPEG subscriber, so extra viewers cost no extra encoding. Person detection
+with the bundled YOLOv5n runs in a separate CPU process on whatever frame is
+newest when it is free, backing off to stay within a CPU budget; its boxes are
+drawn by the capture process before encoding.
+
+The thermal capture process also runs hotspot analysis (thermal.py) on every
+raw frame before colouring it. Analysis needs to run with nobody watching, so
+when RESQSENSE_THERMAL_SOURCE is set that feed is started at server start and
+kept alive. Without it there is no thermal feed.
+
+OpenCV is needed for capture; PyTorch/YOLOv5 are optional and detection is
+simply skipped without them.
+"""
+
+import atexit
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+
+from flask import Blueprint, Response, request, jsonify
+
+import assets
+from realtime import socketio
+from storage import get_storage, timestamp_now
+from thermal import FIRE_LEVELS
+
+video_bp = Blueprint('video', __name__)
+
+# Camera device index or video file path per feed; files loop as a camera stand-in
+VIDEO_SOURCES = {
+    'normal': os.environ.get('RESQSENSE_NORMAL_SOURCE', '0'),
+    'thermal': os.environ.get('RESQSENSE_THERMAL_SOURCE'),    # Unset: no thermal camera
+}
+DETECTION_WEIGHTS = os.environ.get('RESQSENSE_YOLO_WEIGHTS', 'yolov5n.pt')
+DETECTION_CPU_BUDGET = 0.5       # Fraction of one core the detector may use
+THERMAL_ANALYSIS = os.environ.get('RESQSENSE_THERMAL_ANALYSIS', '1') == '1'
+JPEG_QUALITY = 80
+MAX_FPS = 15
+IDLE_TIMEOUT = 30.0              # Stop capturing this long after the last viewer leaves
+SLOT_SIZE = 2 * 1024 * 1024      # Largest encoded frame the shared slot can hold
+
+BOUNDARY = b'frame'
+
+
+class SharedFrame:
+    """One JPEG frame in shared memory, guarded by a sequence counter and lock"""
+
+    def __init__(self, ctx=None, size=SLOT_SIZE, name=None, seq=None, length=None, lock=None):
+        self.size = size
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size)
+        if self.owner:
+            seq = ctx.Value('Q', 0, lock=False)
+            length = ctx.Value('I', 0, lock=False)
+            lock = ctx.Lock()
+        self.seq = seq
+        self.length = length
+        self.lock = lock
+
+    def handle(self):
+        """Arguments that let another process attach to the same slot"""
+        return (self.size, self.shm.name, self.seq, self.length, self.lock)
+
+    @classmethod
+    def attach(cls, handle):
+        size, name, seq, length, lock = handle
+        return cls(size=size, name=name, seq=seq, length=length, lock=lock)
+
+    def write(self, data):
+        if len(data) > self.size:
+            return False
+        with self.lock:
+            self.shm.buf[:len(data)] = data
+            self.length.value = len(data)
+            self.seq.value += 1
+        return True
+
+    def read(self, after=0):
+        """Return (seq, bytes) if a frame newer than `after` exists, else (after, None)"""
+        if self.seq.value == after:
+            return after, None
+        with self.lock:
+            return self.seq.value, bytes(self.shm.buf[:self.length.value])
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _open_source(source):
+    import cv2
+    return cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+
+
+def _is_grayscale(frame):
+    """Raw thermal sensors (and recorded stand-ins) deliver single-intensity frames"""
+    if frame.ndim == 2 or frame.shape[2] == 1:
+        return True
+    sample = frame[::16, ::16]
+    return bool((sample[..., 0] == sample[..., 1]).all() and (sample[..., 1] == sample[..., 2]).all())
+
+
+def capture_main(source, slot_handle, stop, boxes_queue, results_queue, thermal, analyze):
+    """Capture process: read, analyze, annotate, encode once, publish to the shared slot"""
+    import cv2
+
+    detector = None
+    if analyze:
+        from thermal import HotspotDetector
+        detector = HotspotDetector()
+
+    slot = SharedFrame.attach(slot_handle)
+    capture = _open_source(source)
+    params = [int(cv2.IMWRITE_JPEG_QUALITY), JPEG_QUALITY]
+    boxes = []
+    min_period = 1.0 / MAX_FPS
+    try:
+        while not stop.is_set():
+            started = time.monotonic()
+            ok, frame = capture.read()
+            if not ok:
+                # Loop recorded files; retry devices after a short pause
+                capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ok, frame = capture.read()
+                if not ok:
+                    time.sleep(0.5)
+                    capture.release()
+                    capture = _open_source(source)
+                    continue
+
+            if thermal and _is_grayscale(frame):
+                if frame.ndim == 3:
+                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                if detector is not None:
+                    analysis = detector.analyze(frame)
+                    try:
+                        results_queue.put_nowait(analysis)
+                    except queue.Full:
+                        pass
+                    boxes = [(x, y, x + w, y + h, spot['peak_c'])
+                             for spot in analysis['hotspots'] for x, y, w, h in [spot['bbox']]]
+                frame = cv2.applyColorMap(frame, cv2.COLORMAP_INFERNO)
+
+            if boxes_queue is not None:
+                try:
+                    while True:
+                        boxes = boxes_queue.get_nowait()
+                except queue.Empty:
+                    pass
+            for x1, y1, x2, y2, value in boxes:
+                label = f'{value:.0f}C' if thermal else f'person {value:.2f}'
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
+                cv2.putText(frame, label, (x1, max(y1 - 5, 10)),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 1)
+
+            ok, encoded = cv2.imencode('.jpg', frame, params)
+            if ok:
+                slot.write(encoded.tobytes())
+
+            elapsed = time.monotonic() - started
+            if elapsed < min_period:
+                time.sleep(min_period - elapsed)
+    finally:
+        capture.release()
+        slot.shm.close()
+
+
+def load_detector(weights):
+    """Load YOLOv5n on CPU restricted to the person class"""
+    import torch
+    torch.set_num_threads(1)
+    try:
+        import yolov5
+        model = yolov5.load(weights, device='cpu')
+    except ImportError:
+        model = torch.hub.load('ultralytics/yolov5', 'custom', path=weights, device='cpu')
+    model.classes = [0]
+    model.conf = 0.4
+    return model
+
+
+def detector_main(slot_handle, stop, boxes_queue, results_queue, weights, cpu_budget):
+    """Detector process: always infer on the newest frame, then back off
+
+    After an inference taking d seconds the detector idles d * (1/budget - 1)
+    seconds, so it uses about `cpu_budget` of a core whatever the camera rate.
+    Frames that arrive meanwhile are skipped.
+    """
+    import cv2
+    import numpy as np
+
+    try:
+        model = load_detector(weights)
+    except Exception as e:
+        results_queue.put({'error': f'Detection disabled: {e}'})
+        return
+
+    slot = SharedFrame.attach(slot_handle)
+    seq = 0
+    try:
+        while not stop.is_set():
+            latest, data = slot.read(seq)
+            if data is None:
+                time.sleep(0.01)
+                continue
+            skipped = max(latest - seq - 1, 0) if seq else 0
+            seq = latest
+
+            frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            started = time.monotonic()
+            detections = model(frame[:, :, ::-1], size=320).xyxy[0].tolist()
+            duration = time.monotonic() - started
+
+            boxes = [(int(x1), int(y1), int(x2), int(y2), round(conf, 2))
+                     for x1, y1, x2, y2, conf, _ in detections]
+            try:
+                boxes_queue.put_nowait(boxes)
+            except queue.Full:
+                pass
+            results_queue.put({'seq': seq, 'time': time.time(), 'people': len(boxes),
+                               'boxes': boxes, 'inference_ms': round(duration * 1000, 1),
+                               'skipped': skipped})
+            stop.wait(duration * (1.0 / cpu_budget - 1.0))
+    finally:
+        slot.shm.close()
+
+
+class VideoFeed:
+    """Capture/detector processes for one feed plus in-process fan-out
+
+    Results from the detector or the thermal analysis are passed to each of
+    `listeners` in the pump thread; a listener may return an enriched result,
+    which is what gets stored as `latest_result` and emitted as `event`.
+    """
+
+    def __init__(self, name, source, detect=False, analyze=False, event=None):
+        self.name = name
+        self.source = source
+        self.detect = detect
+        self.analyze = analyze
+        self.event = event
+        self.listeners = []
+        self.keep_alive = False
+        self.subscribers = 0
+        self.frames = 0
+        self.latest_result = None
+        self._frame = None          # Pre-built multipart chunk shared by every subscriber
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._lock = threading.Lock()
+        self._processes = []
+        self._slot = None
+        self._stop = None
+        self._boxes = None
+        self._results = None
+        self._last_viewer = time.monotonic()
+
+    def _start(self):
+        ctx = mp.get_context('spawn')
+        self._slot = SharedFrame(ctx)
+        self._stop = ctx.Event()
+        # Keep queues referenced here so they outlive the children's startup
+        self._boxes = ctx.Queue(maxsize=4) if self.detect else None
+        self._results = ctx.Queue(maxsize=64) if (self.detect or self.analyze) else None
+        self._processes = [ctx.Process(
+            target=capture_main, name=f'video-{self.name}', daemon=True,
+            args=(self.source, self._slot.handle(), self._stop, self._boxes, self._results,
+                  self.name == 'thermal', self.analyze))]
+        if self.detect:
+            self._processes.append(ctx.Process(
+                target=detector_main, name=f'detector-{self.name}', daemon=True,
+                args=(self._slot.handle(), self._stop, self._boxes, self._results,
+                      DETECTION_WEIGHTS, DETECTION_CPU_BUDGET)))
+        for process in self._processes:
+            process.start()
+        threading.Thread(target=self._pump, args=(self._slot,), name=f'pump-{self.name}',
+                         daemon=True).start()
+
+    @property
+    def configured(self):
+        return self.source is not None
+
+    def start(self, keep_alive=False):
+        """Start capturing without a viewer; keep_alive disables the idle stop"""
+        if not self.configured:
+            return
+        with self._lock:
+            self.keep_alive = self.keep_alive or keep_alive
+            if not self._processes:
+                self._start()
+
+    def close(self):
+        with self._lock:
+            detached = self._detach()
+        self._reap(*detached)
+
+    def _detach(self):
+        """Signal the children to stop and take them off the feed; call with _lock held"""
+        processes, slot = self._processes, self._slot
+        if processes:
+            self._stop.set()
+        self._processes = []
+        self._slot = None
+        return processes, slot
+
+    @staticmethod
+    def _reap(processes, slot):
+        """Join detached children and free their slot; call without _lock, joins can take seconds"""
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        if slot is not None:
+            slot.close()
+
+    def _pump(self, slot):
+        """Copy each new frame out of shared memory once and wake subscribers"""
+        seq = 0
+        while True:
+            with self._lock:
+                # Reading under the lock keeps close() from unmapping the slot mid-copy;
+                # a restarted feed has a new slot and its own pump
+                if self._slot is not slot:
+                    return
+                if (self.subscribers == 0 and not self.keep_alive
+                        and time.monotonic() - self._last_viewer > IDLE_TIMEOUT):
+                    detached = self._detach()
+                    break
+                seq, data = self._slot.read(seq)
+                if self._results is not None:
+                    self._drain_results()
+
+            if data is not None:
+                chunk = (b'--' + BOUNDARY + b'\r\nContent-Type: image/jpeg\r\n'
+                         b'Content-Length: ' + str(len(data)).encode() + b'\r\n\r\n'
+                         + data + b'\r\n')
+                with self._cond:
+                    self._frame = chunk
+                    self._seq += 1
+                    self.frames += 1
+                    self._cond.notify_all()
+            else:
+                time.sleep(0.005)
+        self._reap(*detached)
+
+    def _drain_results(self):
+        while True:
+            try:
+                result = self._results.get_nowait()
+            except queue.Empty:
+                return
+            for listener in self.listeners:
+                try:
+                    result = listener(result) or result
+                except Exception as e:
+                    print(f"Error in {self.name} feed listener: {e}")
+            self.latest_result = result
+            if self.event:
+                socketio.emit(self.event, dict(result, feed=self.name))
+
+    def stream(self):
+        """Generator of multipart MJPEG chunks for one subscriber"""
+        with self._lock:
+            self.subscribers += 1
+            if not self._processes:
+                self._start()
+        seq = 0
+        try:
+            while True:
+                with self._cond:
+                    if not self._cond.wait_for(lambda: self._seq != seq, timeout=5):
+                        continue
+                    seq, chunk = self._seq, self._frame
+                yield chunk
+        finally:
+            with self._lock:
+                self.subscribers -= 1
+                self._last_viewer = time.monotonic()
+
+    def stats(self):
+        return {'source': None if self.source is None else str(self.source), 'running': bool(self._processes),
+                'subscribers': self.subscribers, 'frames': self.frames,
+                'latest_result': self.latest_result}
+
+
+feeds = {
+    'normal': VideoFeed('normal', VIDEO_SOURCES['normal'], detect=True,
+                        event='person_detections'),
+    'thermal': VideoFeed('thermal', VIDEO_SOURCES['thermal'], analyze=THERMAL_ANALYSIS,
+                         event='thermal_hotspots'),
+}
+
+
+@atexit.register
+def close_feeds():
+    for feed in feeds.values():
+        feed.close()
+
+
+@video_bp.route('/surveillance')
+def surveillance_dashboard():
+    """Dashboard with the live camera feeds"""
+    return assets.render_page('ex.html')
+
+
+@video_bp.route('/video_feed/<name>')
+def video_feed(name):
+    feed = feeds.get(name)
+    if feed is None:
+        return jsonify({"status": "error", "message": f"Unknown feed '{name}'"}), 404
+    if not feed.configured:
+        return jsonify({"status": "error", "message": f"No {name} camera configured (set RESQSENSE_{name.upper()}_SOURCE)"}), 404
+    try:
+        import cv2  # noqa: F401
+    except ImportError:
+        return jsonify({"status": "error", "message": "Video capture requires opencv-python"}), 503
+    return Response(feed.stream(),
+                    mimetype='multipart/x-mixed-replace; boundary=' + BOUNDARY.decode(),
+                    headers={'Cache-Control': 'no-cache'})
+
+
+@video_bp.route('/api/video/stats')
+def video_stats():
+    return jsonify({"status": "success", "data": {name: feed.stats()
+                                                  for name, feed in feeds.items()}}), 200
+
+
+@video_bp.route('/api/video/detections')
+def video_detections():
+    """Latest person detections on the normal feed"""
+    return jsonify({"status": "success", "data": feeds['normal'].latest_result}), 200
+
+
+@video_bp.route('/api/thermal/hotspots')
+def thermal_hotspots():
+    """Latest hotspot analysis and fire risk from the thermal feed"""
+    return jsonify({"status": "success", "data": feeds['thermal'].latest_result}), 200
+
+
+# Called with every recorded fire_risk event (hazard consumers: routing, workers)
+fire_risk_listeners = []
+
+
+def record_fire_risk(storage, event):
+    """Store a fire-risk level change, push it to dashboards and pass it to the listeners"""
+    row = dict(event, timestamp=timestamp_now())
+    storage.insert('fire_risk', row)
+    socketio.emit('fire_risk', row)
+    for listener in fire_risk_listeners:
+        try:
+            listener(row)
+        except Exception as e:
+            print(f"Error in fire risk listener: {e}")
+
+
+@video_bp.route('/api/thermal/fire_risk', methods=['GET'])
+def get_fire_risk():
+    """Recent fire-risk level changes, newest first"""
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+    except ValueError:
+        limit = 50
+    try:
+        rows = get_storage().query('SELECT * FROM fire_risk ORDER BY id DESC LIMIT ?', (limit,))
+        return jsonify({"status": "success", "data": [dict(row) for row in rows]}), 200
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@video_bp.route('/api/thermal/fire_risk', methods=['POST'])
+def receive_fire_risk():
+    """Level change from a standalone `python thermal.py --post` run"""
+    event = request.get_json(silent=True)
+    if not isinstance(event, dict) or event.get('level') not in FIRE_LEVELS:
+        return jsonify({"status": "error", "message": f"A fire-risk event with level in {', '.join(FIRE_LEVELS)} is required."}), 400
+    columns = ('source', 'level', 'previous_level', 'risk', 'peak_c', 'area_fraction', 'area_rate', 'temp_rate')
+    event = {column: event.get(column) for column in columns}
+    event['source'] = event['source'] or 'thermal_1'
+    record_fire_risk(get_storage(), event)
+    return jsonify({"status": "success", "message": "Fire risk recorded"}), 200
@@ -0,0 +1,277 @@
+"""
+Smartwatch blueprint for ResQSense
+Telemetry from the worker smartwatch (`resqsense_watch.ino`), formerly the
+standalone `test_for_watch.py` app, rendered by `watch.html`.
+
+Every sample goes through the fall/SOS/vitals pipeline before it is stored.
+Alerts and state changes are broadcast to everyone; the raw stream only goes
+to clients that subscribed to the telemetry room.
+"""
+
+from flask import Blueprint, request, jsonify
+from flask_socketio import emit, join_room
+
+import assets
+from ppg import PPGEstimator, PPGFormatError, decode_batch
+from realtime import socketio
+from storage import get_storage, timestamp_now, wall_time
+from watch_pipeline import WatchPipeline
+
+watch_bp = Blueprint('watch', __name__)
+
+pipeline = WatchPipeline()
+ppg_estimator = PPGEstimator()
+
+TELEMETRY_ROOM = 'watch_telemetry'
+DEFAULT_WATCH_ID = 'watch_1'
+
+
+def init_schema(conn):
+    """Create the watch_data table if it doesn't exist
+
+    The old SQLAlchemy model mapped to `sensor_data`, which collides with the
+    node table, so watch telemetry now has its own table.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS watch_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            watch_id TEXT NOT NULL DEFAULT 'watch_1',
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            accelerometer_x REAL,
+            accelerometer_y REAL,
+            accelerometer_z REAL,
+            heart_rate INTEGER,
+            spo2 INTEGER,
+            button INTEGER,
+            buzzer INTEGER
+        )
+    ''')
+    columns = [column[1] for column in conn.execute("PRAGMA table_info(watch_data)")]
+    if 'watch_id' not in columns:
+        conn.execute("ALTER TABLE watch_data ADD COLUMN watch_id TEXT NOT NULL DEFAULT 'watch_1'")
+
+    # Fall, SOS and vital-sign transitions raised by the pipeline
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS watch_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            watch_id TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            event TEXT NOT NULL,
+            state TEXT,
+            detail TEXT
+        )
+    ''')
+
+    # Raw red/IR batches as uploaded (little-endian uint32 pairs) and the
+    # vitals the server estimated from them
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ppg_batches (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            watch_id TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            first_sample_ms INTEGER,
+            sample_rate INTEGER,
+            sample_count INTEGER,
+            samples BLOB
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ppg_estimates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            watch_id TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            heart_rate INTEGER,
+            spo2 INTEGER,
+            valid INTEGER
+        )
+    ''')
+
+
+def watch_row(data):
+    """Map a watch JSON payload onto watch_data columns"""
+    accelerometer = data.get('accelerometer') or {}
+    return {
+        'watch_id': data.get('watch_id', DEFAULT_WATCH_ID),
+        'timestamp': timestamp_now(),
+        'accelerometer_x': accelerometer.get('x'),
+        'accelerometer_y': accelerometer.get('y'),
+        'accelerometer_z': accelerometer.get('z'),
+        'heart_rate': data.get('heart_rate'),
+        'spo2': data.get('spo2'),
+        'button': data.get('button'),
+        'buzzer': data.get('buzzer'),
+    }
+
+
+def format_watch_reading(row):
+    return {
+        'id': row['id'],
+        'watch_id': row['watch_id'],
+        'timestamp': row['timestamp'],
+        'accelerometer': {
+            'x': row['accelerometer_x'],
+            'y': row['accelerometer_y'],
+            'z': row['accelerometer_z']
+        },
+        'heart_rate': row['heart_rate'],
+        'spo2': row['spo2'],
+        'button': row['button'],
+        'buzzer': row['buzzer']
+    }
+
+
+def event_row(watch_id, name, payload):
+    """Map a pipeline event onto a watch_events row"""
+    if name == 'watch_alert':
+        return {'watch_id': watch_id, 'timestamp': timestamp_now(),
+                'event': payload['type'], 'state': None, 'detail': None}
+    detail = ','.join(f"{key}={payload[key]}" for key in ('fall', 'sos', 'heart_rate', 'spo2'))
+    return {'watch_id': watch_id, 'timestamp': timestamp_now(),
+            'event': 'STATE', 'state': payload['state'], 'detail': detail}
+
+
+@watch_bp.route('/watch')
+def watch_dashboard():
+    """Serves the smartwatch dashboard"""
+    return assets.render_page('watch.html')
+
+
+@watch_bp.route('/watchdata', methods=['POST'])
+def receive_data():
+    """Receives and processes sensor data from the ESP8266."""
+    if not request.is_json:
+        return jsonify({"status": "error", "message": "Request must be JSON"}), 400
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"status": "error", "message": "Request body must be a JSON object"}), 400
+    # Checked before the pipeline runs, so no alert is raised for a sample that can't be stored
+    if not isinstance(data.get('accelerometer') or {}, dict):
+        return jsonify({"status": "error", "message": "accelerometer must be an object with x, y and z"}), 400
+    watch_id = data.get('watch_id', DEFAULT_WATCH_ID)
+    if not isinstance(watch_id, str):
+        return jsonify({"status": "error", "message": "watch_id must be a string"}), 400
+
+    # Alerts go out before the write is even queued, so storage never delays them
+    events = pipeline.process(watch_id, data, now=wall_time())
+    for name, payload in events:
+        socketio.emit(name, payload)
+
+    storage = get_storage()
+    if events:
+        storage.insert_many('watch_events', [event_row(watch_id, name, payload)
+                                             for name, payload in events])
+    try:
+        storage.insert('watch_data', watch_row(data)).result(timeout=10)
+    except Exception as e:
+        print(f"Error saving to database: {e}")
+        return jsonify({"status": "error", "message": "Failed to save data"}), 500
+
+    socketio.emit('sensor_update', dict(data, watch_id=watch_id), to=TELEMETRY_ROOM)
+
+    return jsonify({"status": "success", "message": "Data received",
+                    "state": pipeline.states().get(watch_id)}), 201
+
+
+def publish_ppg_estimates(storage, results):
+    """Store batched PPG estimates and feed them into the alert pipeline"""
+    rows = []
+    for watch_id, (heart_rate, spo2, valid) in results.items():
+        rows.append({'watch_id': watch_id, 'timestamp': timestamp_now(),
+                     'heart_rate': heart_rate, 'spo2': spo2, 'valid': int(valid)})
+        for name, payload in pipeline.update_vitals(watch_id, heart_rate, spo2):
+            socketio.emit(name, payload)
+        socketio.emit('ppg_update', {'watch_id': watch_id, 'heart_rate': heart_rate,
+                                     'spo2': spo2, 'valid': valid}, to=TELEMETRY_ROOM)
+    storage.insert_many('ppg_estimates', rows)
+
+
+@watch_bp.route('/watchdata/ppg', methods=['POST'])
+def receive_ppg_batch():
+    """Receives a binary batch of raw red/IR samples (see ppg.py for the format)"""
+    try:
+        watch_id, sample_rate, t0_ms, samples = decode_batch(request.get_data())
+    except PPGFormatError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+
+    storage = get_storage()
+    dropped = ppg_estimator.add_samples(watch_id, sample_rate, t0_ms, samples)
+    if dropped:
+        print(f"⚠️ PPG gap from {watch_id}: about {dropped} samples lost, window restarted")
+    ppg_estimator.start(lambda results: publish_ppg_estimates(storage, results))
+
+    try:
+        storage.insert('ppg_batches', {
+            'watch_id': watch_id, 'timestamp': timestamp_now(),
+            'first_sample_ms': t0_ms, 'sample_rate': sample_rate,
+            'sample_count': len(samples), 'samples': samples.tobytes(),
+        }).result(timeout=10)
+    except Exception as e:
+        print(f"Error saving PPG batch: {e}")
+        return jsonify({"status": "error", "message": "Failed to save data"}), 500
+
+    # The watch shows these on its OLED instead of computing them itself
+    heart_rate, spo2, _ = ppg_estimator.latest(watch_id) or (-1, -1, False)
+    return jsonify({"status": "success", "samples": len(samples), "dropped": dropped,
+                    "heart_rate": heart_rate, "spo2": spo2}), 201
+
+
+@watch_bp.route('/api/watch/ppg', methods=['GET'])
+def get_ppg_estimates():
+    """Recent server-side heart rate / SpO2 estimates for one wearer"""
+    watch_id = request.args.get('watch', DEFAULT_WATCH_ID)
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+    except ValueError:
+        limit = 50
+
+    try:
+        rows = get_storage().query(
+            'SELECT * FROM ppg_estimates WHERE watch_id = ? ORDER BY id DESC LIMIT ?',
+            (watch_id, limit))
+        return jsonify({"status": "success", "data": [dict(row) for row in rows],
+                        "dropped_samples": ppg_estimator.dropped.get(watch_id, 0),
+                        "window_resets": ppg_estimator.resets.get(watch_id, 0)}), 200
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@watch_bp.route('/api/watch/state', methods=['GET'])
+def get_watch_state():
+    """Current fall/SOS/vitals state for every wearer"""
+    return jsonify({"status": "success", "data": pipeline.states()}), 200
+
+
+@watch_bp.route('/api/watch/events', methods=['GET'])
+def get_watch_events():
+    """Recent alert and state-change events, optionally for one wearer"""
+    watch_id = request.args.get('watch')
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+    except ValueError:
+        limit = 50
+
+    try:
+        if watch_id:
+            rows = get_storage().query(
+                'SELECT * FROM watch_events WHERE watch_id = ? ORDER BY id DESC LIMIT ?',
+                (watch_id, limit))
+        else:
+            rows = get_storage().query(
+                'SELECT * FROM watch_events ORDER BY id DESC LIMIT ?', (limit,))
+        return jsonify({"status": "success", "data": [dict(row) for row in rows]}), 200
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@socketio.on('watch_subscribe')
+def handle_watch_subscribe():
+    """Join the raw telemetry room and send the last 20 records plus current states"""
+    join_room(TELEMETRY_ROOM)
+    try:
+        rows = get_storage().query('SELECT * FROM watch_data ORDER BY id DESC LIMIT 20')
+        emit('initial_data', [format_watch_reading(row) for row in reversed(rows)])
+        for watch_id, status in pipeline.states().items():
+            emit('watch_state', dict(status, watch_id=watch_id))
+    except Exception as e:
+        print(f"Error fetching initial data: {e}")
@@ -0,0 +1,251 @@
+"""
+Smartwatch telemetry pipeline for ResQSense
+Keeps a NumPy ring buffer per wearer and runs fall detection (impact spike
+followed by stillness) and vital-sign checks on every sample. Only state
+changes and SOS/fall events come out, so alerts don't depend on how many
+dashboards are watching the raw stream.
+"""
+
+import threading
+import time
+
+import numpy as np
+
+GRAVITY = 9.81
+
+# Ring buffer columns: motion rows are (t, ax, ay, az, peak, peak_t), vitals rows
+# are (t, hr, spo2). `peak` is the largest |a| the watch saw since its previous
+# post and `peak_t` when it saw it; both are NaN from firmware that doesn't send them.
+T, AX, AY, AZ, PEAK, PEAK_T = range(6)
+HR, SPO2 = 1, 2
+
+
+class RingBuffer:
+    """Fixed-size NumPy ring buffer of telemetry rows, read back in time order"""
+
+    def __init__(self, capacity=512, width=4):
+        self.data = np.full((capacity, width), np.nan)
+        self.capacity = capacity
+        self.index = 0
+        self.count = 0
+
+    def append(self, row):
+        self.data[self.index] = row
+        self.index = (self.index + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def ordered(self):
+        """Return the buffered rows oldest first"""
+        if self.count < self.capacity:
+            return self.data[:self.count]
+        return np.concatenate((self.data[self.index:], self.data[:self.index]))
+
+
+class WearerState:
+    """Per-wearer buffer plus the last reported alert state"""
+
+    def __init__(self, capacity):
+        self.buffer = RingBuffer(capacity, width=6)
+        self.vitals = RingBuffer(capacity, width=3)
+        self.lock = threading.Lock()
+        self.status = {'state': 'NORMAL', 'fall': False, 'sos': False,
+                       'heart_rate': 'NORMAL', 'spo2': 'NORMAL'}
+        self.last_fall_time = 0.0
+        self.fall_active = False
+        self.sos_until = 0.0
+        self.last_button = 0
+
+
+class WatchPipeline:
+    """Streaming fall/SOS/vital-sign detector for all wearers"""
+
+    def __init__(self, capacity=512,
+                 impact_g=2.5, settle_s=0.5, stillness_s=2.0,
+                 still_std=0.6, still_band=2.0, min_still_samples=2,
+                 vitals_window_s=15.0, min_vital_samples=3,
+                 hr_limits=(50, 140), spo2_min=92, sos_hold_s=15.0):
+        self.capacity = capacity
+        self.impact = impact_g * GRAVITY
+        self.settle_s = settle_s
+        self.stillness_s = stillness_s
+        self.still_std = still_std
+        self.still_band = still_band
+        self.min_still_samples = min_still_samples
+        self.vitals_window_s = vitals_window_s
+        self.min_vital_samples = min_vital_samples
+        self.hr_limits = hr_limits
+        self.spo2_min = spo2_min
+        self.sos_hold_s = sos_hold_s
+
+        self._wearers = {}
+        self._lock = threading.Lock()
+
+    def _wearer(self, wearer_id):
+        with self._lock:
+            state = self._wearers.get(wearer_id)
+            if state is None:
+                state = self._wearers[wearer_id] = WearerState(self.capacity)
+            return state
+
+    def process(self, wearer_id, data, now=None):
+        """Feed one watch payload; return a list of (event_name, payload) to emit"""
+        now = time.time() if now is None else now
+        accelerometer = data.get('accelerometer') or {}
+        row = (now,
+               _number(accelerometer.get('x')),
+               _number(accelerometer.get('y')),
+               _number(accelerometer.get('z')),
+               _number(data.get('peak_accel')),
+               now - np.nan_to_num(_number(data.get('peak_age_ms'))) / 1000.0)
+        button = 1 if data.get('button') else 0
+
+        wearer = self._wearer(wearer_id)
+        events = []
+        with wearer.lock:
+            wearer.buffer.append(row)
+            rows = wearer.buffer.ordered()
+            self._append_vitals(wearer, now, data.get('heart_rate'), data.get('spo2'))
+
+            # SOS fires on the press edge and stays latched for sos_hold_s
+            if button and not wearer.last_button:
+                wearer.sos_until = now + self.sos_hold_s
+                events.append(('watch_alert', {'watch_id': wearer_id, 'type': 'SOS',
+                                               'time': now}))
+            wearer.last_button = button
+
+            fall_time = self.detect_fall(rows)
+            if fall_time is not None and fall_time > wearer.last_fall_time:
+                wearer.last_fall_time = fall_time
+                wearer.fall_active = True
+                events.append(('watch_alert', {'watch_id': wearer_id, 'type': 'FALL',
+                                               'time': fall_time}))
+
+            status = {
+                'fall': self._fall_active(wearer, rows),
+                'sos': now < wearer.sos_until,
+            }
+            events.extend(self._update_status(wearer_id, wearer, status, now))
+        return events
+
+    def update_vitals(self, wearer_id, heart_rate, spo2, now=None):
+        """Feed vitals estimated elsewhere (e.g. from raw PPG); return events to emit"""
+        now = time.time() if now is None else now
+        wearer = self._wearer(wearer_id)
+        with wearer.lock:
+            self._append_vitals(wearer, now, heart_rate, spo2)
+            status = {'fall': wearer.status['fall'], 'sos': now < wearer.sos_until}
+            return self._update_status(wearer_id, wearer, status, now)
+
+    def _append_vitals(self, wearer, now, heart_rate, spo2):
+        # The firmware reports -1 for an invalid HR/SpO2 reading
+        hr = _number(heart_rate)
+        spo2 = _number(spo2)
+        if hr > 0 or spo2 > 0:
+            wearer.vitals.append((now, hr if hr > 0 else np.nan, spo2 if spo2 > 0 else np.nan))
+
+    def _update_status(self, wearer_id, wearer, status, now):
+        status.update(self.check_vitals(wearer.vitals.ordered(), now))
+        status['state'] = _overall_state(status)
+        if status == wearer.status:
+            return []
+        wearer.status = status
+        return [('watch_state', dict(status, watch_id=wearer_id, time=now))]
+
+    def detect_fall(self, rows):
+        """Return the time of the latest confirmed fall in the buffer, or None
+
+        A fall is an acceleration magnitude above the impact threshold followed,
+        after a short settle period, by a window whose magnitude stays close to
+        1 g with little variation. An impact lasts tens of milliseconds, far
+        shorter than the posting interval, so impacts are found in the peak
+        the watch held since its last post (the point sample where there is
+        none); stillness is judged on the point samples. Window sums come from
+        cumulative sums, so all candidate impacts are checked in one
+        vectorized pass.
+        """
+        if len(rows) < 3:
+            return None
+        t = rows[:, T]
+        magnitude = np.sqrt(np.nansum(rows[:, AX:AZ + 1] ** 2, axis=1))
+        peak = np.fmax(rows[:, PEAK], magnitude)
+        peak_t = np.where(np.isnan(rows[:, PEAK]) | (magnitude >= peak), t, rows[:, PEAK_T])
+
+        impacts = np.flatnonzero(peak > self.impact)
+        if impacts.size == 0:
+            return None
+        # Only impacts whose stillness window is already complete can be judged
+        impact_t = peak_t[impacts]
+        impact_t = impact_t[impact_t + self.settle_s + self.stillness_s <= t[-1]]
+        if impact_t.size == 0:
+            return None
+
+        start = np.searchsorted(t, impact_t + self.settle_s, side='left')
+        end = np.searchsorted(t, impact_t + self.settle_s + self.stillness_s, side='right')
+        counts = end - start
+
+        csum = np.concatenate(([0.0], np.cumsum(magnitude)))
+        csq = np.concatenate(([0.0], np.cumsum(magnitude ** 2)))
+        safe = np.maximum(counts, 1)
+        mean = (csum[end] - csum[start]) / safe
+        var = np.maximum((csq[end] - csq[start]) / safe - mean ** 2, 0.0)
+
+        confirmed = ((counts >= self.min_still_samples)
+                     & (np.sqrt(var) < self.still_std)
+                     & (np.abs(mean - GRAVITY) < self.still_band))
+        if not confirmed.any():
+            return None
+        return float(impact_t[confirmed].max())
+
+    def _fall_active(self, wearer, rows):
+        """A fall stays active until the wearer moves again"""
+        if not wearer.fall_active:
+            return False
+        since = rows[rows[:, T] > wearer.last_fall_time + self.settle_s]
+        if len(since) >= 2:
+            recent = since[-(self.min_still_samples + 1):]
+            magnitude = np.sqrt(np.nansum(recent[:, AX:AZ + 1] ** 2, axis=1))
+            if (np.std(magnitude) > 2 * self.still_std
+                    or np.abs(magnitude - GRAVITY).max() > 2 * self.still_band):
+                wearer.fall_active = False
+        return wearer.fall_active
+
+    def check_vitals(self, rows, now):
+        """Classify the median heart rate and SpO2 over the recent vitals window"""
+        recent = rows[rows[:, T] >= now - self.vitals_window_s]
+        result = {'heart_rate': 'NORMAL', 'spo2': 'NORMAL'}
+
+        hr = recent[:, HR][~np.isnan(recent[:, HR])]
+        if hr.size >= self.min_vital_samples:
+            median = np.median(hr)
+            if median < self.hr_limits[0]:
+                result['heart_rate'] = 'LOW'
+            elif median > self.hr_limits[1]:
+                result['heart_rate'] = 'HIGH'
+
+        spo2 = recent[:, SPO2][~np.isnan(recent[:, SPO2])]
+        if spo2.size >= self.min_vital_samples and np.median(spo2) < self.spo2_min:
+            result['spo2'] = 'LOW'
+        return result
+
+    def states(self):
+        """Current alert state for every wearer seen so far"""
+        with self._lock:
+            wearers = list(self._wearers.items())
+        return {wearer_id: dict(state.status) for wearer_id, state in wearers}
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _overall_state(status):
+    if status['sos']:
+        return 'SOS'
+    if status['fall']:
+        return 'FALL'
+    if status['heart_rate'] != 'NORMAL' or status['spo2'] != 'NORMAL':
+        return 'VITALS_ALERT'
+    return 'NORMAL'
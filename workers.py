@@ -0,0 +1,314 @@
+"""
+Worker positions for ResQSense
+Server-side ingest of worker positions (metres, same frame as the tunnel graph
+in routing.py), kept in a uniform-grid spatial index so that radius and
+nearest-neighbour queries only touch the cells around the query point.
+
+Whenever a sensor node enters, leaves or changes WARNING/DANGER, the set of
+workers within HAZARD_RADIUS of every hazardous node is recomputed and pushed
+to subscribers as `hazard_proximity`. Each position update is also checked
+against the current hazard zones, and workers entering or leaving one are
+pushed as `worker_exposure`. A worker that hasn't reported for POSITION_TTL_S
+is dropped (their lamp or tag is off, or they left the mine), so stale positions
+don't stay in proximity alerts.
+"""
+
+import math
+import threading
+import time
+from collections import defaultdict
+
+from flask import Blueprint, request, jsonify
+from flask_socketio import emit, join_room
+
+import routing
+from realtime import socketio
+
+workers_bp = Blueprint('workers', __name__)
+
+WORKERS_ROOM = 'worker_positions'
+CELL_SIZE = 25.0          # Grid cell edge in metres
+HAZARD_RADIUS = 30.0      # Workers this close to a hazardous node are at risk
+WARNING_HAZARD = 0.2      # routing.node_hazard() levels for WARNING / DANGER
+DANGER_HAZARD = 0.9
+POSITION_TTL_S = 120.0    # Workers silent for longer are dropped
+
+
+def hazard_level(hazard):
+    if hazard >= DANGER_HAZARD:
+        return 'DANGER'
+    if hazard >= WARNING_HAZARD:
+        return 'WARNING'
+    return 'NORMAL'
+
+
+class UniformGrid:
+    """Point set bucketed into square cells keyed by integer coordinates"""
+
+    def __init__(self, cell=CELL_SIZE):
+        self.cell = cell
+        self.cells = defaultdict(set)
+        self.points = {}          # id -> (x, y, cell key)
+
+    def __len__(self):
+        return len(self.points)
+
+    def _key(self, x, y):
+        return (math.floor(x / self.cell), math.floor(y / self.cell))
+
+    def insert(self, item, x, y):
+        key = self._key(x, y)
+        old = self.points.get(item)
+        if old is not None and old[2] != key:
+            bucket = self.cells[old[2]]
+            bucket.discard(item)
+            if not bucket:
+                del self.cells[old[2]]
+        self.cells[key].add(item)
+        self.points[item] = (x, y, key)
+
+    def remove(self, item):
+        old = self.points.pop(item, None)
+        if old is not None:
+            bucket = self.cells[old[2]]
+            bucket.discard(item)
+            if not bucket:
+                del self.cells[old[2]]
+
+    def within(self, x, y, radius):
+        """[(id, distance)] for points within `radius` of (x, y)"""
+        cx0, cy0 = self._key(x - radius, y - radius)
+        cx1, cy1 = self._key(x + radius, y + radius)
+        found = []
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                for item in self.cells.get((cx, cy), ()):
+                    px, py, _ = self.points[item]
+                    distance = math.hypot(px - x, py - y)
+                    if distance <= radius:
+                        found.append((item, distance))
+        return found
+
+    def nearest(self, x, y, k=1):
+        """The k closest points, searching outward ring by ring"""
+        if not self.points:
+            return []
+        k = min(k, len(self.points))
+        cx, cy = self._key(x, y)
+        span = max(max(abs(key[0] - cx), abs(key[1] - cy)) for key in self.cells)
+        found = []
+        for ring in range(span + 1):
+            for gx in range(cx - ring, cx + ring + 1):
+                for gy in (range(cy - ring, cy + ring + 1)
+                           if gx in (cx - ring, cx + ring) else (cy - ring, cy + ring)):
+                    for item in self.cells.get((gx, gy), ()):
+                        px, py, _ = self.points[item]
+                        found.append((math.hypot(px - x, py - y), item))
+            # Anything beyond this ring is at least `ring * cell` away
+            if len(found) >= k:
+                found.sort()
+                if found[k - 1][0] <= ring * self.cell:
+                    break
+        found.sort()
+        return [(item, distance) for distance, item in found[:k]]
+
+
+class WorkerTracker:
+    """Worker positions plus hazard-zone membership"""
+
+    def __init__(self, router=None, radius=HAZARD_RADIUS, ttl=POSITION_TTL_S):
+        self.router = router or routing.router
+        self.radius = radius
+        self.ttl = ttl
+        self.grid = UniformGrid()
+        self.seen = {}                          # worker_id -> last update time
+        self.node_levels = {}                   # hazardous node -> level
+        self.exposure = defaultdict(dict)       # worker_id -> {node: distance}
+        self.exits = UniformGrid()
+        for node in self.router.exits:
+            self.exits.insert(node, *self.router.pos[node])
+        self.updates = 0
+        self._lock = threading.Lock()
+
+    def update_positions(self, positions, now=None):
+        """Apply (worker_id, x, y) updates; returns exposure changes"""
+        now = time.time() if now is None else now
+        with self._lock:
+            changes = self._expire(now)
+            zones = [(node, self.router.pos[node]) for node in self.node_levels]
+            for worker_id, x, y in positions:
+                self.grid.insert(worker_id, x, y)
+                self.seen[worker_id] = now
+                if not zones and not self.exposure.get(worker_id):
+                    continue
+                current = {}
+                for node, (nx, ny) in zones:
+                    distance = math.hypot(x - nx, y - ny)
+                    if distance <= self.radius:
+                        current[node] = round(distance, 1)
+                previous = self.exposure.get(worker_id, {})
+                if current.keys() != previous.keys():
+                    changes.append({'worker_id': worker_id, 'x': x, 'y': y,
+                                    'entered': sorted(current.keys() - previous.keys()),
+                                    'left': sorted(previous.keys() - current.keys())})
+                if current:
+                    self.exposure[worker_id] = current
+                else:
+                    self.exposure.pop(worker_id, None)
+            self.updates += len(positions)
+        return changes
+
+    def _expire(self, now):
+        """Drop workers not seen for `ttl` seconds; returns exposure changes for those in a zone"""
+        changes = []
+        for worker_id in [w for w, seen in self.seen.items() if now - seen > self.ttl]:
+            x, y, _ = self.grid.points[worker_id]
+            left = sorted(self.exposure.pop(worker_id, {}))
+            if left:
+                changes.append({'worker_id': worker_id, 'x': x, 'y': y,
+                                'entered': [], 'left': left, 'expired': True})
+            self.grid.remove(worker_id)
+            del self.seen[worker_id]
+        return changes
+
+    def remove(self, worker_id):
+        with self._lock:
+            self.grid.remove(worker_id)
+            self.seen.pop(worker_id, None)
+            self.exposure.pop(worker_id, None)
+
+    def set_node_hazard(self, node, hazard):
+        """Record a node's hazard; returns the new proximity result if its level changed"""
+        if node not in self.router.pos:
+            return None
+        level = hazard_level(hazard)
+        with self._lock:
+            if self.node_levels.get(node, 'NORMAL') == level:
+                return None
+            if level == 'NORMAL':
+                self.node_levels.pop(node, None)
+            else:
+                self.node_levels[node] = level
+            return self._proximity()
+
+    def _proximity(self, radius=None):
+        """Workers within the radius of each hazardous node.
+
+        With the default radius this also resyncs the per-worker exposure.
+        """
+        radius = self.radius if radius is None else radius
+        zones = {}
+        exposure = defaultdict(dict)
+        for node, level in self.node_levels.items():
+            hits = sorted(self.grid.within(*self.router.pos[node], radius),
+                          key=lambda hit: hit[1])
+            zones[node] = {'level': level,
+                           'workers': [{'worker_id': w, 'distance_m': round(d, 1)} for w, d in hits]}
+            for worker_id, distance in hits:
+                exposure[worker_id][node] = round(distance, 1)
+        if radius == self.radius:
+            self.exposure = exposure
+        return {'radius_m': radius, 'zones': zones,
+                'workers_at_risk': sorted(exposure), 'time': time.time()}
+
+    def proximity(self, radius=None):
+        with self._lock:
+            self._expire(time.time())
+            return self._proximity(radius)
+
+    def nearest_exits(self, worker_id, k=1):
+        with self._lock:
+            self._expire(time.time())
+            point = self.grid.points.get(worker_id)
+            if point is None:
+                return None
+            return [{'exit': node, 'distance_m': round(d, 1)}
+                    for node, d in self.exits.nearest(point[0], point[1], k)]
+
+    def snapshot(self):
+        with self._lock:
+            self._expire(time.time())
+            return {worker_id: {'x': x, 'y': y, 'updated': self.seen[worker_id],
+                                'exposure': self.exposure.get(worker_id, {})}
+                    for worker_id, (x, y, _) in self.grid.points.items()}
+
+
+tracker = WorkerTracker()
+
+
+def on_reading(storage, data):
+    """Reading listener: re-evaluate proximity when a node's hazard level changes"""
+    node = data.get('node_id', 'unknown')
+    result = tracker.set_node_hazard(node, routing.node_hazard(node, data))
+    if result is not None:
+        socketio.emit('hazard_proximity', result, to=WORKERS_ROOM)
+
+
+def on_fire_risk(event):
+    """Fire-risk listener: a mapped camera's level counts as its node's hazard"""
+    node = routing.fire_risk_node(event)
+    result = None if node is None else tracker.set_node_hazard(node, routing.node_hazard(node))
+    if result is not None:
+        socketio.emit('hazard_proximity', result, to=WORKERS_ROOM)
+
+
+def parse_positions(data):
+    """Accept one {worker_id, x, y} object, a list of them, or {"positions": [...]}"""
+    if isinstance(data, dict):
+        data = data.get('positions', [data])
+    positions = [(str(item['worker_id']), float(item['x']), float(item['y'])) for item in data]
+    for worker_id, x, y in positions:
+        if not (math.isfinite(x) and math.isfinite(y)):
+            raise ValueError(f"coordinates of {worker_id} must be finite numbers")
+    return positions
+
+
+@workers_bp.route('/api/workers/positions', methods=['POST'])
+def receive_positions():
+    if not request.is_json:
+        return jsonify({"status": "error", "message": "Invalid data format: JSON required."}), 400
+    try:
+        positions = parse_positions(request.get_json())
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": f"Invalid position: {e}"}), 400
+
+    changes = tracker.update_positions(positions)
+    if changes:
+        socketio.emit('worker_exposure', changes, to=WORKERS_ROOM)
+    return jsonify({"status": "success", "updated": len(positions), "exposure_changes": changes}), 200
+
+
+@workers_bp.route('/api/workers/positions', methods=['GET'])
+def get_positions():
+    return jsonify({"status": "success", "data": tracker.snapshot()}), 200
+
+
+@workers_bp.route('/api/workers/at_risk', methods=['GET'])
+def get_workers_at_risk():
+    """Workers within ?radius= metres (default HAZARD_RADIUS) of a WARNING/DANGER node"""
+    try:
+        radius = float(request.args['radius']) if 'radius' in request.args else None
+    except ValueError:
+        radius = math.nan
+    if radius is not None and not (math.isfinite(radius) and radius > 0):
+        return jsonify({"status": "error", "message": "radius must be a positive number"}), 400
+    return jsonify({"status": "success", "data": tracker.proximity(radius)}), 200
+
+
+@workers_bp.route('/api/workers/<worker_id>/exits', methods=['GET'])
+def get_nearest_exits(worker_id):
+    try:
+        k = min(max(int(request.args.get('k', 1)), 1), 10)
+    except ValueError:
+        k = 1
+    exits = tracker.nearest_exits(worker_id, k)
+    if exits is None:
+        return jsonify({"status": "error", "message": f"No position for worker {worker_id}"}), 404
+    return jsonify({"status": "success", "worker_id": worker_id, "exits": exits}), 200
+
+
+@socketio.on('workers_subscribe')
+def workers_subscribe():
+    """Join the positions room and get the current hazard proximity"""
+    join_room(WORKERS_ROOM)
+    emit('hazard_proximity', tracker.proximity())